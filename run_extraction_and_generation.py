@@ -1,9 +1,25 @@
+import argparse
 import json
 import pathlib
-from src.extract_old_site.extract import run_extraction
+from src.extract_old_site.extract import run_extraction, compare_parsers
 from src.generate_new_site.generate import generate_site
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="extract the old Excavating Occaneechi Town site and generate the new one")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help=("number of processes used to run extraction steps and to write "
+              "pages (overrides config.json)"))
+    parser.add_argument(
+        "--no-parse-cache", action="store_true",
+        help=("extract every file again instead of reusing the results cached "
+              "by previous runs (overrides config.json)"))
+    parser.add_argument(
+        "--compare-parsers", metavar="PARSER", default=None,
+        help=("only run the extraction with the original HTML parsers and with "
+              "PARSER, and report any JSON output that differs"))
+    args = parser.parse_args()
+
     script_root_dir = pathlib.Path(__file__).parent
 
     config = None
@@ -16,15 +32,36 @@ if __name__ == "__main__":
     if config["generationOutputDirPath"] == "Default":
         config["generationOutputDirPath"] = str(script_root_dir / "newdig")
         (script_root_dir / "newdig").mkdir(parents=True, exist_ok=True)
+    # Compiled templates are kept in .cache in the output directory by default
+    if config.get("generationCacheDirPath", "Default") == "Default":
+        config["generationCacheDirPath"] = None
 
     # Set up for generating the site
     dig_dir = str((pathlib.Path(config["digParentDirPath"]) / "dig").as_posix())
     input_dir = config["extractionOutputDirPath"]
     output_dir = config["generationOutputDirPath"]
+    cache_dir = config["generationCacheDirPath"]
     overwrite_out = config["overwriteExistingGeneratedFiles"]
     copy_images = config["copyImages"]
     copy_videos = config["copyVideos"]
     copy_data = config["copyData"]
+    hash_copies = config.get("hashCopies", False)
+    jobs = args.jobs if args.jobs is not None else config.get("jobs", 1)
+    config["jobs"] = jobs
+    if args.no_parse_cache:
+        config["parseCache"] = False
+    incremental = config.get("incrementalGeneration", False)
+    # Bundling replaces the assets directory with only what pages use
+    bundle_assets = config.get("bundleAssets", True)
+    image_derivatives = config.get("imageDerivatives", True)
+    optimize_images = config.get("optimizeImages", False)
+    shared_nav = config.get("sharedNav", False)
+
+    if args.compare_parsers is not None:
+        print("\n-----------------------------------\n"
+              "Comparing extraction output between HTML parsers.\n")
+        compare_parsers(config, args.compare_parsers)
+        raise SystemExit
 
     # Run extraction and site generation
     if config['runExtraction']:
@@ -37,7 +74,20 @@ if __name__ == "__main__":
     if config['runGeneration']:
         print("\n-----------------------------------\n"
               "Generating new site files.\n")
-        generate_site(dig_dir, input_dir, output_dir, overwrite_out, copy_images, copy_videos, copy_data)
+        generate_site(
+            dig_dir, input_dir, output_dir,
+            overwrite_out=overwrite_out,
+            copy_images=copy_images,
+            copy_videos=copy_videos,
+            copy_data=copy_data,
+            jobs=jobs,
+            incremental=incremental,
+            bundle_assets=bundle_assets,
+            image_derivatives=image_derivatives,
+            optimize_images=optimize_images,
+            hash_copies=hash_copies,
+            cache_dir=cache_dir,
+            shared_nav=shared_nav)
     else:
         print("\n-----------------------------------\n"
               "SKIPPING generating new site files.\n")
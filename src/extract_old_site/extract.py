@@ -10,9 +10,308 @@ from .modules import (
     tables,
     artifacts
 )
-from .utilities import file_ops
+from .utilities import (
+    dig_inventory, file_ops, image_dimensions, manifest, parse_cache, parsers,
+    work_queue
+)
+from .utilities.frame_cache import FrameCache
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import functools
 import pathlib
 import json
+import tempfile
+import time
+
+
+def extract_text_part(partname, dig_parent_dir, readfile, frame_cache):
+    data = standard_text_chapter.extract_standard_part(partname, dig_parent_dir, frame_cache)
+    if partname == 'part0':
+        data = standard_text_chapter.reextract_title_page(data, dig_parent_dir, readfile)
+    return [(partname + ".json", data)]
+
+
+def extract_started(dig_parent_dir, readfile, frame_cache):
+    getting_started_data = getting_started.extract_getting_started(dig_parent_dir, frame_cache)
+    return [("started.json", getting_started_data)]
+
+
+def extract_primer(dig_parent_dir, readfile, frame_cache):
+    primer_data = archaeology_primer.extract_entire_primer(dig_parent_dir, readfile)
+    return [("primer.json", primer_data)]
+
+
+def extract_excavations(dig_parent_dir, readfile, frame_cache):
+    # Reuses the figures the images step extracted, in the same process
+    excavations_pages = excavation_details_page.extract_all_exc_pages(dig_parent_dir, frame_cache)
+    return [("excavationsElements.json", excavations_pages)]
+
+
+def extract_images(dig_parent_dir, readfile, frame_cache):
+    images = image_page.extract_all_images(dig_parent_dir, frame_cache)
+    image_metadata_dicts = image_page.generate_metadata_dicts(images)
+    outputs = [("images.json", images)]
+    for dict_name, data in image_metadata_dicts.items():
+        outputs.append((dict_name + ".json", data, True))
+    return outputs
+
+
+def extract_feature_descriptions(dig_parent_dir, readfile, frame_cache):
+    descriptions = feature_descriptions.extract_descriptions(dig_parent_dir, frame_cache)
+    return [("descriptions.json", descriptions, True)]
+
+
+def extract_references(dig_parent_dir, readfile, frame_cache):
+    refs = references.extract_all_references(dig_parent_dir, readfile)
+    return [("references.json", refs['refs'], True),
+            ("hrefsToRefs.json", refs['hrefsToRefs'], True)]
+
+
+def extract_data_downloads(dig_parent_dir, readfile, frame_cache):
+    data_downloads_data = data_downloads.extract_data_downloads(dig_parent_dir, frame_cache)
+    return [("dataChapter.json", data_downloads_data)]
+
+
+def extract_tables(dig_parent_dir, readfile, frame_cache):
+    table_info = tables.extract_all_tables(dig_parent_dir, frame_cache)
+    table_strings = table_info['tables']
+    table_html_paths_to_nums = table_info['htmlPathsToTableFileNums']
+    table_image_paths_to_figure_nums = tables.extract_all_table_image_htmls(dig_parent_dir, readfile)
+    return [("tables.json", table_strings),
+            ("tableHTMLPathsToNums.json", table_html_paths_to_nums),
+            ("tableImagePathsToFigureNums.json", table_image_paths_to_figure_nums)]
+
+
+def extract_artifacts(dig_parent_dir, readfile, frame_cache):
+    artifacts_summary = artifacts.extract_all_of_artifacts_dir(dig_parent_dir, frame_cache)
+    artifacts_details = artifacts.extract_appendix_b(dig_parent_dir, readfile)
+    art_images = artifacts.extract_all_artifacts_images(dig_parent_dir, readfile)
+    artifacts_by_cat_num = artifacts.generate_cat_num_to_artifacts_dict(artifacts_summary, artifacts_details, True)
+    artifacts_full = artifacts.insert_details_into_summary_dict(artifacts_summary, artifacts_by_cat_num)
+    artifacts_full = artifacts.replace_figure_paths_with_nums_in_summary_dict(artifacts_full, art_images)
+    # Ignore artifacts_summary as it's currently mutated by the insert_details call
+    # ("artifactsSummary.json", artifacts_summary)
+    return [("artifactsDetails.json", artifacts_details),
+            ("artifactsImages.json", art_images, True),
+            ("artifactsByCatNum.json", artifacts_by_cat_num, True),
+            ("artifactsByExcElementComplete.json", artifacts_full, True, True)]
+
+
+TEXT_DIRS = ["part0", "part1", "part2", "part3", "part4", "part5", "split"]
+
+# Extraction steps, in the order they are run. Each entry has:
+#     name: step name, used in the manifest
+#     description: printed when the step runs
+#     function: called with (dig_parent_dir, readfile, frame_cache), returns a
+#         list of (filename, data[, sort_keys[, prettify]]) outputs
+#     dirs: directories in /dig/html the step reads from, for prefetching
+#     extra_inputs: globs (relative to /dig/html) of files the step reads
+#         without going through readfile
+#     requires: names of the steps that must have finished before this one
+#         starts, when steps run in parallel
+EXTRACTION_STEPS = [
+    {
+        'name': partname,
+        'description': "text chapter " + partname,
+        'function': functools.partial(extract_text_part, partname),
+        'dirs': TEXT_DIRS,
+        'extra_inputs': [],
+        'requires': []
+    } for partname in ["part0", "part1", "part2", "part3", "part4", "part5"]
+] + [
+    {'name': "started", 'description': "Getting Started",
+     'function': extract_started, 'dirs': ["started"], 'extra_inputs': [], 'requires': []},
+    {'name': "primer", 'description': "Archaeology Primer",
+     'function': extract_primer, 'dirs': ["primer"], 'extra_inputs': [], 'requires': []},
+    {'name': "images", 'description': "image pages",
+     'function': extract_images, 'dirs': ["excavations"],
+     'extra_inputs': ["images/**/*"], 'requires': []},
+    # After the images, whose dimensions are then cached
+    {'name': "excavations", 'description': "excavations element pages",
+     'function': extract_excavations, 'dirs': ["excavations"],
+     'extra_inputs': ["images/**/*"], 'requires': ["images"]},
+    {'name': "descriptions", 'description': "feature descriptions",
+     'function': extract_feature_descriptions, 'dirs': ["descriptions"],
+     'extra_inputs': [], 'requires': []},
+    {'name': "references", 'description': "references",
+     'function': extract_references, 'dirs': ["split/report28*b.html"],
+     'extra_inputs': [], 'requires': []},
+    {'name': "data", 'description': "data for download chapter",
+     'function': extract_data_downloads, 'dirs': ["data"], 'extra_inputs': [], 'requires': []},
+    {'name': "tables", 'description': "tables",
+     'function': extract_tables, 'dirs': ["tables"], 'extra_inputs': [], 'requires': []},
+    {'name': "artifacts", 'description': "artifacts",
+     'function': extract_artifacts, 'dirs': ["artifacts", "dbs"],
+     'extra_inputs': [], 'requires': []},
+]
+
+EXTRACTION_STEPS_BY_NAME = {step['name']: step for step in EXTRACTION_STEPS}
+
+
+class StepRunner:
+    """
+    Runs extraction steps within one process, recording what they read.
+
+    Attributes
+    ----------
+    dig_parent_dir : str
+        Directory containing /dig.
+    prefetcher : PrefetchReader or None
+        Reader prefetching each step's directories, if enabled.
+    frame_cache : FrameCache
+        Reader caching the topbar and sidebar frames shared between pages,
+        on top of the prefetcher or of file_ops.readfile.
+    dimension_cache : DimensionCache
+        Dimensions of the images, shared with other processes and runs
+        through its file, if given.
+    inventory : DigInventory
+        Listing of /dig/html, taken once and queried by every step instead
+        of listing directories again.
+    parse_cache : ParseCache or None
+        On disk cache of the results of the pure extraction functions, if
+        enabled.
+    queue : WorkQueue or None
+        Pool the large extractors run their per-file work on, when given
+        more than one job.
+    """
+
+    def __init__(self, dig_parent_dir, prefetch=False, prefetch_limit_mb=256,
+                 dimension_cache_path=None, parse_cache=None, jobs=1):
+        self.dig_parent_dir = dig_parent_dir
+        self.html_dir_path = pathlib.Path(dig_parent_dir) / "dig/html"
+        self.readfile = file_ops.readfile
+        self.prefetcher = None
+        if prefetch:
+            self.prefetcher = file_ops.PrefetchReader(
+                max_bytes=int(prefetch_limit_mb * 2**20))
+            self.readfile = self.prefetcher
+        self.prefetched_dirs = None
+        self.frame_cache = FrameCache(self.readfile)
+        self.dimension_cache = image_dimensions.DimensionCache(dimension_cache_path)
+        self.inventory = dig_inventory.DigInventory.scan(self.html_dir_path)
+        self.parse_cache = parse_cache
+        self.queue = None
+        if jobs > 1:
+            self.queue = work_queue.WorkQueue(jobs, dimension_cache_path, parse_cache)
+
+    def run(self, step):
+        """
+        Run an extraction step.
+
+        Returns
+        -------
+        outputs : list of tuple
+            (filename, data[, sort_keys[, prettify]]) outputs of the step.
+        input_paths : set of str
+            Paths of every file the step read.
+        seconds : float
+            Time the step took.
+        """
+        start_time = time.perf_counter()
+        if self.prefetcher is not None and step['dirs'] != self.prefetched_dirs:
+            self.prefetcher.clear()
+            for dir_name in step['dirs']:
+                self.prefetcher.prefetch(self.html_dir_path / dir_name, self.inventory)
+            self.prefetched_dirs = step['dirs']
+
+        recorder = manifest.InputRecorder(self.readfile)
+        self.frame_cache.paths_read.clear()
+        self.dimension_cache.refresh()
+        image_dimensions.use_cache(self.dimension_cache)
+        dig_inventory.use_inventory(self.inventory)
+        parse_cache.use_cache(self.parse_cache)
+        work_queue.use_queue(self.queue)
+        try:
+            outputs = step['function'](self.dig_parent_dir, recorder, self.frame_cache)
+        finally:
+            image_dimensions.use_cache(None)
+            dig_inventory.use_inventory(None)
+            parse_cache.use_cache(None)
+            work_queue.use_queue(None)
+
+        input_paths = recorder.paths | self.frame_cache.paths_read
+        if self.queue is not None:
+            input_paths |= self.queue.paths_read
+            self.dimension_cache.merge(self.queue.dimension_records)
+            self.queue.clear()
+        self.dimension_cache.write()
+
+        for pattern in step['extra_inputs']:
+            input_paths.update(manifest.path_key(path) for path in
+                               self.html_dir_path.glob(pattern) if path.is_file())
+        return outputs, input_paths, time.perf_counter() - start_time
+
+    def close(self):
+        """Print the readers' statistics and stop the prefetcher."""
+        print("Frame cache: " + self.frame_cache.stats())
+        print("Image dimensions: " + self.dimension_cache.stats())
+        print("Inventory: " + self.inventory.stats())
+        if self.parse_cache is not None:
+            print("Parse cache: " + self.parse_cache.stats())
+        if self.queue is not None:
+            print("Work queue: " + self.queue.stats())
+            self.queue.close()
+        if self.prefetcher is not None:
+            print("File reads: " + self.prefetcher.stats())
+            self.prefetcher.close()
+
+
+def run_steps_parallel(steps, jobs, worker_args, step_done):
+    """
+    Run extraction steps over a pool of 'jobs' processes.
+
+    Steps start in order as soon as the steps they require have finished
+    (steps that aren't in 'steps', e.g. skipped ones, count as finished).
+
+    Parameters
+    ----------
+    steps : list of dict
+        Steps from EXTRACTION_STEPS to run.
+    jobs : int
+        Number of worker processes.
+    worker_args : tuple
+        Arguments for _init_extraction_worker().
+    step_done : function
+        Called in this process with (step, outputs, input_paths, seconds)
+        as each step finishes, see StepRunner.run().
+    """
+    pending = list(steps)
+    unfinished = {step['name'] for step in steps}
+    running = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_extraction_worker,
+                             initargs=worker_args) as executor:
+        while pending or running:
+            for step in list(pending):
+                if unfinished.isdisjoint(step['requires']):
+                    pending.remove(step)
+                    running[executor.submit(_run_step, step['name'])] = step
+            if not running:
+                raise ValueError("Extraction steps with circular requirements: "
+                                 + ", ".join(step['name'] for step in pending))
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            # Handle simultaneously finished steps in order
+            for future in sorted(finished, key=lambda future: steps.index(running[future])):
+                step = running.pop(future)
+                step_done(step, *future.result())
+                unfinished.remove(step['name'])
+
+
+_worker_runner = None
+
+
+def _init_extraction_worker(dig_parent_dir, parser, parser_overrides,
+                            prefetch, prefetch_limit_mb, dimension_cache_path=None,
+                            parse_cache=None):
+    """Set up the parser configuration and readers of a worker process."""
+    global _worker_runner
+    parsers.configure(parser, parser_overrides)
+    _worker_runner = StepRunner(dig_parent_dir, prefetch, prefetch_limit_mb,
+                                dimension_cache_path, parse_cache)
+
+
+def _run_step(step_name):
+    """Run an extraction step in a worker process."""
+    return _worker_runner.run(EXTRACTION_STEPS_BY_NAME[step_name])
 
 
 def run_extraction(config):
@@ -27,6 +326,7 @@ def run_extraction(config):
         output_dir_path_obj = pathlib.Path(output_dir_path)
     output_dir_path_obj.mkdir(parents=True, exist_ok=True)
     overwrite_files = config['overwriteExistingExtractedData']
+    parsers.configure(config.get('htmlParser'), config.get('htmlParserOverrides'))
 
     def write_file(data, filename_path_obj, sort_keys=False, prettify=True):
         if not overwrite_files and filename_path_obj.is_file():
@@ -38,81 +338,144 @@ def run_extraction(config):
             with open(filename_path_obj, 'w') as f:
                 json.dump(data, f, sort_keys=sort_keys, indent=indent)
 
-    # Run text chapter extraction
-    print("Extracting text chapters... ...")
-    text_partnames = ['part0', 'part1', 'part2', 'part3', 'part4', 'part5']
-    for partname in text_partnames:
-        print("    Extracting " + partname)
-        output_filename = output_dir_path_obj / (partname + ".json")
-        data = standard_text_chapter.extract_standard_part(partname, dig_parent_dir, file_ops.readfile)
-        if partname == 'part0':
-            data = standard_text_chapter.reextract_title_page(data, dig_parent_dir, file_ops.readfile)
-        write_file(data, output_filename)
-
-    # Run getting started extraction
-    print("Extracting Getting Started... ...")
-    getting_started_data = getting_started.extract_getting_started(dig_parent_dir, file_ops.readfile)
-    write_file(getting_started_data, output_dir_path_obj / "started.json")
-
-    # Run archaeology primer extraction
-    print("Extracting Archaeology Primer... ...")
-    primer_data = archaeology_primer.extract_entire_primer(dig_parent_dir, file_ops.readfile)
-    write_file(primer_data, output_dir_path_obj / "primer.json")
-
-    # Run excavations element pages extraction
-    print("Extracting excavations element pages... ...")
-    excavations_pages = excavation_details_page.extract_all_exc_pages(dig_parent_dir, file_ops.readfile)
-    excavations_output_filename = output_dir_path_obj / "excavationsElements.json"
-    write_file(excavations_pages, excavations_output_filename)
-
-    # Run image pages extraction
-    print("Extracting image pages... ...")
-    images = image_page.extract_all_images(dig_parent_dir, file_ops.readfile)
-    image_metadata_dicts = image_page.generate_metadata_dicts(images)
-    images_output_filename = output_dir_path_obj / "images.json"
-    write_file(images, images_output_filename)
-    for dict_name, data in image_metadata_dicts.items():
-        output_filename = output_dir_path_obj / (dict_name + ".json")
-        write_file(data, output_filename, True)
-
-    # Run feature description extraction
-    print("Extracting feature descriptions... ...")
-    descriptions = feature_descriptions.extract_descriptions(dig_parent_dir, file_ops.readfile)
-    descriptions_output_filename = output_dir_path_obj / "descriptions.json"
-    write_file(descriptions, descriptions_output_filename, True)
-
-    # Run references extraction
-    print("Extracting references... ...")
-    refs = references.extract_all_references(dig_parent_dir, file_ops.readfile)
-    write_file(refs['refs'], output_dir_path_obj / "references.json", True)
-    write_file(refs['hrefsToRefs'], output_dir_path_obj / "hrefsToRefs.json", True)
-
-    # Run data downloads chapter extraction
-    print("Extracting data for download chapter... ...")
-    data_downloads_data = data_downloads.extract_data_downloads(dig_parent_dir, file_ops.readfile)
-    write_file(data_downloads_data, output_dir_path_obj / "dataChapter.json")
-
-    # Run tables extraction
-    print("Extracting tables... ...")
-    table_info = tables.extract_all_tables(dig_parent_dir, file_ops.readfile)
-    table_strings = table_info['tables']
-    table_html_paths_to_nums = table_info['htmlPathsToTableFileNums']
-    table_image_paths_to_figure_nums = tables.extract_all_table_image_htmls(dig_parent_dir, file_ops.readfile)
-    write_file(table_strings, output_dir_path_obj / "tables.json")
-    write_file(table_html_paths_to_nums, output_dir_path_obj / "tableHTMLPathsToNums.json")
-    write_file(table_image_paths_to_figure_nums, output_dir_path_obj / "tableImagePathsToFigureNums.json")
-
-    # Run artifacts extraction
-    print("Extracting artifacts... ...")
-    artifacts_summary = artifacts.extract_all_of_artifacts_dir(dig_parent_dir, file_ops.readfile)
-    artifacts_details = artifacts.extract_appendix_b(dig_parent_dir, file_ops.readfile)
-    art_images = artifacts.extract_all_artifacts_images(dig_parent_dir, file_ops.readfile)
-    artifacts_by_cat_num = artifacts.generate_cat_num_to_artifacts_dict(artifacts_summary, artifacts_details, True)
-    artifacts_full = artifacts.insert_details_into_summary_dict(artifacts_summary, artifacts_by_cat_num)
-    artifacts_full = artifacts.replace_figure_paths_with_nums_in_summary_dict(artifacts_full, art_images)
-    # Ignore artifacts_summary as it's currently mutated by the insert_details call
-    # write_file(artifacts_summary, output_dir_path_obj / "artifactsSummary.json")
-    write_file(artifacts_details, output_dir_path_obj / "artifactsDetails.json")
-    write_file(art_images, output_dir_path_obj / "artifactsImages.json", True)
-    write_file(artifacts_by_cat_num, output_dir_path_obj / "artifactsByCatNum.json", True)
-    write_file(artifacts_full, output_dir_path_obj / "artifactsByExcElementComplete.json", True, True)
+    # Skip steps whose inputs are unchanged since they last ran, unless
+    # incremental extraction is turned off
+    incremental = config.get('incrementalExtraction', True)
+    code_version = manifest.hash_code(pathlib.Path(__file__).parent)
+    extraction_manifest = manifest.ExtractionManifest(
+        output_dir_path_obj / manifest.MANIFEST_FILENAME,
+        {
+            'code': code_version,
+            'digParentDirPath': manifest.path_key(dig_parent_dir),
+            'htmlParser': config.get('htmlParser'),
+            'htmlParserOverrides': config.get('htmlParserOverrides'),
+            'shrinkExtractionJsons': shrinkJsons
+        })
+
+    # Image dimensions are kept between runs, along with the images' hashes
+    dimension_cache_path = output_dir_path_obj / image_dimensions.CACHE_FILENAME
+
+    # Results of the functions extracting from single files are kept between
+    # runs too, so a step rerun for one edited file only extracts that file
+    cache = None
+    if config.get('parseCache', True):
+        cache = parse_cache.ParseCache(
+            output_dir_path_obj / parse_cache.CACHE_DIRNAME, code_version,
+            int(config.get('parseCacheLimitMB', 256) * 2**20))
+
+    def step_done(step, outputs, input_paths, seconds):
+        for output in outputs:
+            write_file(output[1], output_dir_path_obj / output[0], *output[2:])
+        extraction_manifest.record(step['name'], input_paths,
+                                   [output[0] for output in outputs],
+                                   image_dimensions.read_records(dimension_cache_path))
+        extraction_manifest.write()
+        print("    Extracted {} in {:.2f}s".format(step['description'], seconds))
+
+    steps = []
+    skipped_steps = []
+    for step in EXTRACTION_STEPS:
+        if incremental and extraction_manifest.is_fresh(step['name'], output_dir_path_obj):
+            skipped_steps.append(step['name'])
+        else:
+            steps.append(step)
+    if skipped_steps:
+        print("Skipping steps with unchanged inputs: " + ", ".join(skipped_steps))
+
+    # Optionally read each step's files ahead of time on a thread pool, which
+    # helps when /dig is on a slow (e.g. network) drive
+    prefetch = config.get('prefetchReads', False)
+    prefetch_limit_mb = config.get('prefetchMemoryLimitMB', 256)
+    jobs = config.get('jobs', 1)
+    if jobs > 1 and len(steps) > 1:
+        # Steps read disjoint files and write separate JSON files, so they
+        # can run in any order; outputs are written from this process
+        print("Extracting {} steps using {} processes... ...".format(len(steps), jobs))
+        run_steps_parallel(steps, jobs, (
+            dig_parent_dir, config.get('htmlParser'),
+            config.get('htmlParserOverrides'), prefetch, prefetch_limit_mb,
+            dimension_cache_path, cache
+        ), step_done)
+    else:
+        # A single process runs the steps, and fans the large ones out
+        # over 'jobs' processes
+        runner = StepRunner(dig_parent_dir, prefetch, prefetch_limit_mb,
+                            dimension_cache_path, cache, jobs)
+        for step in steps:
+            print("Extracting " + step['description'] + "... ...")
+            step_done(step, *runner.run(step))
+        runner.close()
+    if cache is not None and steps:
+        cache.evict()
+        if cache.evicted:
+            print("Evicted {} results from the parse cache.".format(cache.evicted))
+
+
+def compare_parsers(config, parser):
+    """Run the extraction twice and report output that depends on the parser.
+
+    The first run uses each function's original parser, the second uses
+    'parser' (with the usual per function overrides). Both write to
+    temporary directories, and every JSON file that differs is reported.
+
+    Returns
+    -------
+    differences : dict
+        Differing locations within each differing JSON file, keyed by file
+        name. Empty if the outputs are identical.
+    """
+    parsers.check_parser(parser)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_dirs = []
+        for run_parser in ["Default", parser]:
+            output_dir = pathlib.Path(tmp_dir) / run_parser.replace('.', '_')
+            print("Extracting with parser: " + run_parser)
+            run_extraction(dict(
+                config,
+                htmlParser=run_parser,
+                extractionOutputDirPath=str(output_dir),
+                overwriteExistingExtractedData=True,
+                incrementalExtraction=False,
+                parseCache=False
+            ))
+            output_dirs.append(output_dir)
+
+        differences = {}
+        filenames = sorted({path.name for output_dir in output_dirs
+                            for path in output_dir.glob('*.json')
+                            if path.name not in (manifest.MANIFEST_FILENAME,
+                                                 image_dimensions.CACHE_FILENAME)})
+        for filename in filenames:
+            data = []
+            for output_dir in output_dirs:
+                path = output_dir / filename
+                data.append(json.loads(path.read_text()) if path.is_file() else None)
+            locations = list(json_differences(data[0], data[1]))
+            if locations:
+                differences[filename] = locations
+
+    if differences:
+        print("Output differing between the original parsers and " + parser + ":")
+        for filename, locations in differences.items():
+            print("    {}: {} difference(s), e.g. at {}".format(
+                filename, len(locations), ", ".join(locations[:5])))
+    else:
+        print("Output is identical with the original parsers and " + parser + ".")
+    return differences
+
+
+def json_differences(a, b, location="$"):
+    """Yield the locations (e.g. "$['pages']['3']") where a and b differ."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in sorted(set(a) | set(b)):
+            sub_location = "{}[{!r}]".format(location, key)
+            if key not in a or key not in b:
+                yield sub_location
+            else:
+                yield from json_differences(a[key], b[key], sub_location)
+    elif isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+        for i, (item_a, item_b) in enumerate(zip(a, b)):
+            yield from json_differences(item_a, item_b,
+                                        "{}[{}]".format(location, i))
+    elif a != b:
+        yield location
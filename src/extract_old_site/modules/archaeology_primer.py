@@ -1,12 +1,13 @@
-from bs4 import BeautifulSoup
 from pathlib import Path
 import os
+from ..utilities import dig_inventory
+from ..utilities.parsers import make_soup
 
 # NOTE: tab0.html can be safely ignored
 
 def extract_primer_page(html_string, dig_parent_dir, current_page_name, readfile):
     # primer*.html, including subpages like 14a, 13b, 23a, etc.
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'archaeology_primer.extract_primer_page')
     page_num = soup.div.b.text.replace("Page ", "").split(" of")[0]
     title = soup.center.h1.text
     content = []
@@ -57,7 +58,7 @@ def extract_primer_page(html_string, dig_parent_dir, current_page_name, readfile
             return table_tag.name == 'table' and table_tag.has_attr('align') and table_tag['align'] == 'right'
         for filename in files:
             file_html = readfile(filename, Path(dig_parent_dir) / "dig/html/primer")
-            new_soup = BeautifulSoup(file_html, 'html5lib')
+            new_soup = make_soup(file_html, 'archaeology_primer.extract_primer_page')
             table_for_image = new_soup.find(is_image_caption_table)
             if table_for_image.td.has_attr('valign'):
                 # Primer 14 or 23
@@ -137,7 +138,7 @@ def extract_entire_primer(dig_parent_dir, readfile):
     }
     videos = {}
     primer_htmls_by_page_num = {}
-    for filepath in primer_dir.iterdir():
+    for filepath in dig_inventory.files(primer_dir):
         if filepath.name == 'contents.html':
             primer["modules"] = extract_table_of_contents(readfile(filepath.name, filepath.parent))
         elif filepath.name == 'tab0.html':
@@ -162,7 +163,7 @@ def extract_entire_primer(dig_parent_dir, readfile):
 
 def extract_video_page(html_string):
     # pits, plowzone, trowel, wtrscrn, feature.html
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'archaeology_primer.extract_video_page')
     link = soup.embed['src']
     caption = soup.b.text.strip()
     return {
@@ -172,7 +173,7 @@ def extract_video_page(html_string):
 
 def extract_table_of_contents(html_string):
     # contents.html
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'archaeology_primer.extract_table_of_contents')
     contents_table = soup.find_all('table')[1]
 
     modules = []
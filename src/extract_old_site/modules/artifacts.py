@@ -1,11 +1,14 @@
-from bs4 import BeautifulSoup
 import pathlib
 import os
+from ..utilities import dig_inventory, work_queue
+from ..utilities.frame_cache import frame_sources
+from ..utilities.parse_cache import persistent
+from ..utilities.parsers import make_soup
 
 # Functions for /dig/html/artifacts
 def extract_artifacts_image(html_string):
     """Get all information from an img.html in the artifacts folder."""
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'artifacts.extract_artifacts_image')
     path = pathlib.Path("/dig/html/artifacts") / soup.body.img['src']
     path = str(pathlib.Path(os.path.normpath(path)).as_posix())
     soup.body.center.a.decompose()
@@ -23,18 +26,17 @@ def extract_all_artifacts_images(dig_parent_dir, readfile):
     """Get info from all img.html pages in the artifacts folder."""
     artifacts_dir = pathlib.Path(dig_parent_dir) / "dig/html/artifacts"
     images = {}
-    for filename in artifacts_dir.iterdir():
-        if 'img' in filename.name:
-            html_string = readfile(filename.name, filename.parent)
-            image = extract_artifacts_image(html_string)
-            images[filename.name] = image
+    for filename in dig_inventory.files(artifacts_dir, 'img'):
+        html_string = readfile(filename.name, filename.parent)
+        image = extract_artifacts_image(html_string)
+        images[filename.name] = image
     return images
 
 def extract_excavation_zones(html_string, dig_parent_dir):
     """Extract the list of zones with artifacts from the ctrl_**.html page."""
     # TODO: Get the Appendix A page number
 
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'artifacts.extract_excavation_zones')
     exc_element_name = soup.body.center.b.text.strip()
     appendix_a_page_num = str(soup.body.center).split("Page ")[-1].replace("<br/></center>", "")
     if appendix_a_page_num == "?":
@@ -60,9 +62,10 @@ def extract_excavation_zones(html_string, dig_parent_dir):
         "zones": zones
     }
 
+@persistent
 def extract_artifacts_list(html_string, dig_parent_dir):
     """Extract a list of artifacts from a info_***.html page."""
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'artifacts.extract_artifacts_list')
     artifact_trs = soup.table.find_all('tr')
     ths = artifact_trs.pop(0).find_all('th')
     fields = []
@@ -88,9 +91,8 @@ def extract_artifacts_list(html_string, dig_parent_dir):
 def extract_art_html_page(html_string, dig_parent_dir, readfile):
     """Extract all info from a art_***.html page."""
     artifacts_dir = pathlib.Path(dig_parent_dir) / "dig/html/artifacts"
-    soup = BeautifulSoup(html_string, 'html5lib')
-    frames = soup.find_all('frame')
-    ctrl_html_string = readfile(frames[0]['src'], artifacts_dir)
+    frames = frame_sources(readfile, html_string)
+    ctrl_html_string = readfile(frames[0], artifacts_dir)
 
     ctrl_extracted = extract_excavation_zones(ctrl_html_string, dig_parent_dir)
     for zone in ctrl_extracted['zones']:
@@ -100,6 +102,11 @@ def extract_art_html_page(html_string, dig_parent_dir, readfile):
 
     return ctrl_extracted
 
+def extract_art_file(filename, dig_parent_dir, readfile):
+    """Extract an art_***.html page, given its name, and its zones' pages."""
+    artifacts_dir = pathlib.Path(dig_parent_dir) / "dig/html/artifacts"
+    return extract_art_html_page(readfile(filename, artifacts_dir), dig_parent_dir, readfile)
+
 def extract_all_of_artifacts_dir(dig_parent_dir, readfile):
     """Extract all artifacts info (but not images) from /dig/html/artifacts.
 
@@ -112,22 +119,22 @@ def extract_all_of_artifacts_dir(dig_parent_dir, readfile):
     # Ensure that similarly named files like art_aa0.html or art_aa1.html
     # and art_ab0.html or art_ab2.html are extracted only once.
     dict_by_letters = {}
-    for filename in artifacts_dir.iterdir():
-        if 'art' in filename.name:
-            letters = filename.name.split('_')[1][0:2]
-            if letters not in dict_by_letters:
-                dict_by_letters[letters] = filename.name
+    for filename, match in sorted(dig_inventory.matches(artifacts_dir, 'art'),
+                                  key=lambda file_match: file_match[0]):
+        letters = match.group('letters')
+        if letters not in dict_by_letters:
+            dict_by_letters[letters] = filename.name
 
-    for filename in dict_by_letters.values():
-        html_string = readfile(filename, artifacts_dir)
-        extracted = extract_art_html_page(html_string, dig_parent_dir, readfile)
+    for extracted in work_queue.map_files(extract_art_file, dict_by_letters.values(),
+                                          dig_parent_dir, readfile):
         artifacts[extracted['parentExcPage']] = extracted
     return artifacts
 
 # Functions for /dig/html/dbs
+@persistent
 def extract_db_frame(html_string):
     """Extract artifact details from a db*_*.html frame in appendix B."""
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'artifacts.extract_db_frame')
     trs = soup.body.table.find_all('tr')
     ths = trs.pop(0).find_all('th')
     fields = []
@@ -151,12 +158,12 @@ def extract_appendix_b_page(page_num, dig_parent_dir, readfile):
     # Makes an assumption, already tested elsewhere, that for a given number x,
     # dbx_*.html all belong to the same page in Appendix B.
     dbs_path_obj = pathlib.Path(dig_parent_dir) / "dig/html/dbs"
-    name = BeautifulSoup(readfile("head" + str(page_num) + ".html", dbs_path_obj),
-                         'html5lib').i.string
+    name = make_soup(readfile("head" + str(page_num) + ".html", dbs_path_obj),
+                     'artifacts.extract_appendix_b_page').i.string
     artifacts = []
     fields = None
-    for filename in dbs_path_obj.iterdir():
-        if "db" + str(page_num) in filename.name:
+    for filename, match in dig_inventory.matches(dbs_path_obj, 'db'):
+        if match.group('page') == str(page_num):
             extracted_frame = extract_db_frame(readfile(filename.name, filename.parent))
             artifacts += extracted_frame["artifacts"]
             fields = extracted_frame["fields"]
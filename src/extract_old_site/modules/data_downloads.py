@@ -1,4 +1,6 @@
 from . import standard_text_chapter
+from ..utilities import dig_inventory
+from ..utilities.frame_cache import parse_frame
 from bs4 import BeautifulSoup
 from pathlib import Path
 import os
@@ -31,15 +33,17 @@ def process_tab_html_contents(
         "body3_10.html": "Data 16",
     }
     page_num = page_num_map[current_body_page_name]
-    sidebar_info = standard_text_chapter.extract_sidebar(
+    sidebar_info = parse_frame(
+        readfile, standard_text_chapter.extract_sidebar,
         html_strings['sidebar_html'],
         current_dir_path,
         html_strings['body_page_name']
     )
-    topbar_info = standard_text_chapter.extract_topbar(
+    topbar_info = parse_frame(
+        readfile, standard_text_chapter.extract_topbar,
         html_strings['topbar_html'],
         current_dir_path,
-        current_tab_page_name
+        standard_text_chapter.module_tab_page_name(current_tab_page_name)
     )
 
     processed = {
@@ -72,10 +76,11 @@ def extract_full_module(module_file_names, current_dir_path, dig_parent_dir_path
     full_current_dir_path = dig_parent_dir_path / ("." + current_dir_path)
     processed_pages = []
     tab_html_str = readfile(module_file_names[0], full_current_dir_path)
-    associated_body_page_names = []
-    for filename in (Path(dig_parent_dir_path) / ('.' + current_dir_path)).iterdir():
-        if filename.name.replace('body', '')[0] == module_file_names[0].replace('tab', '')[0]:
-            associated_body_page_names.append(filename)
+    module_num = dig_inventory.PATTERNS['tab'].fullmatch(module_file_names[0]).group('module')
+    associated_body_page_names = [
+        filename for filename, match in dig_inventory.matches(full_current_dir_path, 'body')
+        if match.group('module') == module_num
+    ]
     for filename in associated_body_page_names:
         body_html_contents = standard_text_chapter.get_body_page_html_contents(
             readfile(filename.name, filename.parent),
@@ -128,10 +133,8 @@ def extract_full_module(module_file_names, current_dir_path, dig_parent_dir_path
 
 def extract_data_downloads(dig_parent_dir, readfile):
     started_dir_path_obj = Path(dig_parent_dir) / "./dig/html/data"
-    tab_filenames = []
-    for filepath in started_dir_path_obj.iterdir():
-        if "tab" in filepath.name and "tabs" not in filepath.name:
-            tab_filenames.append(filepath.name)
+    tab_filenames = [filepath.name for filepath
+                     in dig_inventory.files(started_dir_path_obj, 'tab')]
     return standard_text_chapter.extract_full_chapter(
         tab_filenames,
         "/dig/html/data",
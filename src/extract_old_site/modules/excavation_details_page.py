@@ -1,14 +1,16 @@
 from .image_page import extract_image_page
-from bs4 import BeautifulSoup
 from pathlib import Path
 import os
+from ..utilities import dig_inventory, work_queue
+from ..utilities.frame_cache import frame_sources, parse_frame
+from ..utilities.parsers import make_soup
 
 # Because all the pages are stored in the "/dig/html/excavations" folder,
 # those are hardcoded into this module.
 
 def extract_zoom_to(html_string):
     """Extract related elements to a feature from a zoom_**.html file."""
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'excavation_details_page.extract_zoom_to')
     links = soup.body.find_all('a')
     related_elements = []
     for link in links:
@@ -29,7 +31,7 @@ def extract_info_page(
         path = os.path.normpath(Path('/dig/html/excavations') / filename)
         return Path(path).as_posix()
 
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'excavation_details_page.extract_info_page')
     name = str(soup.body.big.b.string).strip()
     exc_area_icon_path = remove_dots_and_make_posix(soup.body.img['src'])
     main_paragraph = soup.body.find_all('p')[0]
@@ -59,8 +61,10 @@ def extract_info_page(
             return
         else:
             image_page_html = readfile(link['href'], full_current_dir_path)
-            image = extract_image_page(image_page_html, current_dir_path,
-                                       dig_parent_dir_path, link['href'])
+            # Extracted once for the image pages and every element linking to
+            # them, when readfile is a FrameCache
+            image = parse_frame(readfile, extract_image_page, image_page_html,
+                                current_dir_path, dig_parent_dir_path, link['href'])
             images.append(image)
     
     artifacts_path = None
@@ -83,11 +87,10 @@ def get_ctrl_page_contents(html_string, current_dir_path, dig_parent_dir_path, r
     """Extract the html contents linked to from within a ctrl_**.html file."""
     full_current_dir_path = Path(dig_parent_dir_path) / ("." + current_dir_path)
     
-    soup = BeautifulSoup(html_string, 'html5lib')
-    frames = soup.find_all('frame')
+    frames = frame_sources(readfile, html_string)
 
-    info_page_html = readfile(frames[0]['src'], full_current_dir_path)
-    zoom_page_html = readfile(frames[1]['src'], full_current_dir_path)
+    info_page_html = readfile(frames[0], full_current_dir_path)
+    zoom_page_html = readfile(frames[1], full_current_dir_path)
 
     extracted = extract_info_page(info_page_html, current_dir_path, dig_parent_dir_path, readfile)
     extracted['relatedElements'] = extract_zoom_to(zoom_page_html)
@@ -97,18 +100,19 @@ def get_exc_page_contents(html_string, current_dir_path, dig_parent_dir_path, re
     """Extract the html contents linked to from within a exc_**.html file."""
     full_current_dir_path = Path(dig_parent_dir_path) / ("." + current_dir_path)
 
-    frames = BeautifulSoup(html_string, 'html5lib').find_all('frame')
-    ctrl_html_string = readfile(frames[1]['src'], full_current_dir_path)
+    frames = frame_sources(readfile, html_string)
+    ctrl_html_string = readfile(frames[1], full_current_dir_path)
     return get_ctrl_page_contents(ctrl_html_string, current_dir_path, dig_parent_dir_path, readfile)
 
+def extract_exc_page(filepath, dig_parent_dir, readfile):
+    """Extract an exc_**.html page and its frames."""
+    html_string = readfile(filepath.name, filepath.parent)
+    page_contents = get_exc_page_contents(html_string, "/dig/html/excavations", dig_parent_dir, readfile)
+    page_contents['path'] = (Path("/dig/html/excavations") / filepath.name).as_posix()
+    return page_contents
+
 def extract_all_exc_pages(dig_parent_dir, readfile):
     excavations_dir = Path(dig_parent_dir) / "./dig/html/excavations"
-    excavations_pages = []
-    for filepath in excavations_dir.iterdir():
-        if 'exc' in filepath.name:
-            html_string = readfile(filepath.name, filepath.parent)
-            page_contents = get_exc_page_contents(html_string, "/dig/html/excavations", dig_parent_dir, readfile)
-            page_contents['path'] = (Path("/dig/html/excavations") / filepath.name).as_posix()
-            excavations_pages.append(page_contents)
-
-    return excavations_pages
+    return work_queue.map_files(
+        extract_exc_page, sorted(dig_inventory.files(excavations_dir, 'exc')),
+        dig_parent_dir, readfile)
@@ -1,12 +1,14 @@
-from bs4 import BeautifulSoup
 from pathlib import Path
 import os
 from . import standard_text_chapter
+from ..utilities import dig_inventory
+from ..utilities.frame_cache import parse_frame
+from ..utilities.parsers import make_soup
 
 # Inelegant in the interest of time
 
 def extract_sidebar_sections(html_string):
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'feature_descriptions.extract_sidebar_sections')
     section_links = soup.find_all('a')
     sections = []
     for link in section_links:
@@ -22,7 +24,7 @@ def extract_sidebar_sections(html_string):
 
 def extract_page_title(html_string):
     """Extract the page title from a report*a.html file."""
-    soup = BeautifulSoup(html_string, 'html.parser')
+    soup = make_soup(html_string, 'feature_descriptions.extract_page_title', 'html.parser')
     return str(soup.body.center.b.string)
 
 def extract_descriptions(dig_parent_dir, readfile):
@@ -32,58 +34,58 @@ def extract_descriptions(dig_parent_dir, readfile):
 
     processed_pages = []
     sections_name_changes = {}
-    for filename in full_current_dir_path.iterdir():
-        if 'tab' in filename.name and 'tabs' not in filename.name:
-            tab_page_content = readfile(filename, full_current_dir_path)
-            html_strings = standard_text_chapter.get_tab_page_html_contents(
-                tab_page_content, current_dir_path,
-                dig_parent_dir_path, readfile
-            )
-            title = extract_page_title(html_strings['reporta_html'])
-            content = standard_text_chapter.extract_page_content(
-                html_strings['reportb_html'], "/dig/html/descriptions"
-            )
-            page_num = standard_text_chapter.extract_page_number(html_strings['reportc_html'])
-            sidebar_info_sections = extract_sidebar_sections(html_strings['sidebar_html'])
-            author = str(BeautifulSoup(html_strings['reportb_html'], 'html5lib').body.contents[0]).strip()
-            content.insert(0, {
-                "type": "paragraph",
-                "content": author
-            })
+    for filename in dig_inventory.files(full_current_dir_path, 'tab'):
+        tab_page_content = readfile(filename, full_current_dir_path)
+        html_strings = standard_text_chapter.get_tab_page_html_contents(
+            tab_page_content, current_dir_path,
+            dig_parent_dir_path, readfile
+        )
+        title = extract_page_title(html_strings['reporta_html'])
+        content = standard_text_chapter.extract_page_content(
+            html_strings['reportb_html'], "/dig/html/descriptions"
+        )
+        page_num = standard_text_chapter.extract_page_number(html_strings['reportc_html'])
+        sidebar_info_sections = parse_frame(readfile, extract_sidebar_sections,
+                                            html_strings['sidebar_html'])
+        author = str(make_soup(html_strings['reportb_html'], 'feature_descriptions.extract_descriptions').body.contents[0]).strip()
+        content.insert(0, {
+            "type": "paragraph",
+            "content": author
+        })
 
-            current_section = None
-            for section in sidebar_info_sections:
-                if section['name'] == title:
+        current_section = None
+        for section in sidebar_info_sections:
+            if section['name'] == title:
+                current_section = section
+                break
+            if '(' in title:
+                parts = title.split('(')
+                no_parentheses_title = ' '.join([parts[0].strip(), parts[1].split(')')[1].strip()])
+                if section['name'] == no_parentheses_title:
                     current_section = section
+                    sections_name_changes[section['name']] = title
                     break
-                if '(' in title:
-                    parts = title.split('(')
-                    no_parentheses_title = ' '.join([parts[0].strip(), parts[1].split(')')[1].strip()])
-                    if section['name'] == no_parentheses_title:
-                        current_section = section
-                        sections_name_changes[section['name']] = title
-                        break
-            if current_section == None:
-                raise Exception("Couldn't find the proper section for title " + title)
-            processed_pages.append({
-                "page": {
-                    "parentModuleShortTitle": "Feature Descriptions",
-                    "pageNum": page_num,
-                    "pageTitle": title,
-                    "content": content,
-                },
-                "module": {
-                    "path": "/dig/html/descriptions/tab0.html",
-                    "shortTitle": "Feature Descriptions",
-                    "fullTitle": "Feature Descriptions",
-                    "author": None,
-                    "sections": sidebar_info_sections
-                },
-                "additionalSectionInfo": {
-                    "currentSection": current_section,
-                    "pageNum": page_num,
-                }
-            })
+        if current_section == None:
+            raise Exception("Couldn't find the proper section for title " + title)
+        processed_pages.append({
+            "page": {
+                "parentModuleShortTitle": "Feature Descriptions",
+                "pageNum": page_num,
+                "pageTitle": title,
+                "content": content,
+            },
+            "module": {
+                "path": "/dig/html/descriptions/tab0.html",
+                "shortTitle": "Feature Descriptions",
+                "fullTitle": "Feature Descriptions",
+                "author": None,
+                "sections": sidebar_info_sections
+            },
+            "additionalSectionInfo": {
+                "currentSection": current_section,
+                "pageNum": page_num,
+            }
+        })
 
     if not standard_text_chapter.validate_tab_html_extraction_results(processed_pages):
         return "Failed: inconsistency in pages within module Feature Descriptions."
@@ -1,4 +1,6 @@
 from . import standard_text_chapter
+from ..utilities import dig_inventory
+from ..utilities.frame_cache import parse_frame
 from bs4 import BeautifulSoup
 from pathlib import Path
 import os
@@ -13,15 +15,17 @@ def process_tab_html_contents(
         html_strings['reportb_html'], current_dir_path
     )
     page_num = "GS" + str(int(current_tab_page_name.split(".")[0].replace("tab", ""))+1)
-    sidebar_info = standard_text_chapter.extract_sidebar(
+    sidebar_info = parse_frame(
+        readfile, standard_text_chapter.extract_sidebar,
         html_strings['sidebar_html'],
         current_dir_path,
         html_strings['body_page_name']
     )
-    topbar_info = standard_text_chapter.extract_topbar(
+    topbar_info = parse_frame(
+        readfile, standard_text_chapter.extract_topbar,
         html_strings['topbar_html'],
         current_dir_path,
-        current_tab_page_name
+        standard_text_chapter.module_tab_page_name(current_tab_page_name)
     )
 
     processed = {
@@ -94,10 +98,8 @@ def extract_full_module(module_file_names, current_dir_path, dig_parent_dir_path
 
 def extract_getting_started(dig_parent_dir, readfile):
     started_dir_path_obj = Path(dig_parent_dir) / "./dig/html/started"
-    tab_filenames = []
-    for filepath in started_dir_path_obj.iterdir():
-        if "tab" in filepath.name and "tabs" not in filepath.name:
-            tab_filenames.append(filepath.name)
+    tab_filenames = [filepath.name for filepath
+                     in dig_inventory.files(started_dir_path_obj, 'tab')]
     return standard_text_chapter.extract_full_chapter(
         tab_filenames,
         "/dig/html/started",
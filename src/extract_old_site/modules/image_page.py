@@ -1,24 +1,39 @@
-from bs4 import BeautifulSoup
-from PIL import Image
 from pathlib import Path
 import os
+from ..utilities import dig_inventory, image_dimensions, work_queue
+from ..utilities.frame_cache import parse_frame
+from ..utilities.parse_cache import persistent
+from ..utilities.parsers import make_soup
 
 def extract_image_page(
     html_string, img_page_parent_dir, dig_parent_dir, current_page_name
 ):
     """Extract an image and its clickable map from a slid_***.html file."""
-    soup = BeautifulSoup(html_string, 'html5lib')
+    image = extract_image_page_html(html_string, img_page_parent_dir, current_page_name)
+    full_path = (Path(dig_parent_dir) / ("." + image["path"])).as_posix()
+    img_dimensions = get_image_dimensions(full_path)
+    image["originalDimensions"] = {
+        "width": int(img_dimensions["width"]),
+        "height": int(img_dimensions["height"])
+    }
+    return image
+
+@persistent
+def extract_image_page_html(html_string, img_page_parent_dir, current_page_name):
+    """
+    Extract everything but the image's dimensions from a slid_***.html
+    file, which only depends on the file.
+    """
+    soup = make_soup(html_string, 'image_page.extract_image_page')
 
     # Assumes no symlinks in any file path found in an <a> tag,
     # so uses os.path.normpath to resolve ".." patterns
     path = Path(img_page_parent_dir) / soup.body.img['src']
     path = Path(os.path.normpath(path)).as_posix()
     html_page_path = (Path(img_page_parent_dir) / current_page_name).as_posix()
-    full_path = (Path(dig_parent_dir) / ("." + path)).as_posix()
     figure_num_and_caption = soup.body.center.text.strip().split('.', 1)
     figure_num = figure_num_and_caption[0].replace("Figure", "").strip()
     caption = figure_num_and_caption[1].strip()
-    img_dimensions = get_image_dimensions(full_path)
 
     map_coords = soup.body.map.find_all('area')
     clickable_areas = []
@@ -38,16 +53,15 @@ def extract_image_page(
         "htmlPagePath": html_page_path,
         "figureNum": figure_num,
         "caption": caption,
-        "clickableAreas": clickable_areas,
-        "originalDimensions": {
-            "width": int(img_dimensions["width"]),
-            "height": int(img_dimensions["height"])
-        }
+        "clickableAreas": clickable_areas
     }
 
 def get_image_dimensions(img_path):
-    """Extract image dimensions given the complete path to the image."""
-    width, height = Image.open(Path(img_path)).size
+    """
+    Extract image dimensions given the complete path to the image, reading
+    only its header (or nothing, if the dimension cache knows the image).
+    """
+    width, height = image_dimensions.dimensions(img_path)
     return {
         "width": width,
         "height": height
@@ -55,7 +69,7 @@ def get_image_dimensions(img_path):
 
 def extract_video_image_page(html_string, img_page_parent_dir, current_page_name):
     """Extract info from a slid_***.mov.html or slid_***.mpg.html file."""
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'image_page.extract_video_image_page')
     path = Path(img_page_parent_dir) / soup.body.embed['src']
     path = Path(os.path.normpath(path)).as_posix()
     html_page_path = (Path(img_page_parent_dir) / current_page_name).as_posix()
@@ -77,18 +91,24 @@ def extract_video_image_page(html_string, img_page_parent_dir, current_page_name
 def extract_all_images(dig_parent_dir, readfile):
     """Return a dictionary of images and their metadata by file path."""
     extracted_images = {}
-    for filepath in (Path(dig_parent_dir) / "dig/html/excavations").iterdir():
-        if 'slid' in filepath.name and '.mpg' not in filepath.name and '.mov' not in filepath.name:
-            html_string = readfile(filepath.name, filepath.parent)
-            image_details = extract_image_page(html_string, "/dig/html/excavations", dig_parent_dir, filepath.name)
-            extracted_images[image_details['path']] = image_details
-        elif 'slid' in filepath.name and '.mpg' in filepath.name or '.mov' in filepath.name:
-            # Just slid_agr and slid_ags.mov.html and .mpg.html
-            html_string = readfile(filepath.name, filepath.parent)
-            image_details = extract_video_image_page(html_string, "/dig/html/excavations", filepath.name)
-            extracted_images[image_details['path']] = image_details
+    excavations_dir = Path(dig_parent_dir) / "dig/html/excavations"
+    slide_paths = [filepath for filepath in dig_inventory.files(excavations_dir)
+                   if dig_inventory.kind(filepath.name) in ('slide', 'video_slide')]
+    for image_details in work_queue.map_files(extract_slide_page, sorted(slide_paths),
+                                              dig_parent_dir, readfile):
+        extracted_images[image_details['path']] = image_details
     return extracted_images
 
+def extract_slide_page(filepath, dig_parent_dir, readfile):
+    """Extract a slid_***.html page, or a .mov.html or .mpg.html one."""
+    html_string = readfile(filepath.name, filepath.parent)
+    if dig_inventory.kind(filepath.name) == 'video_slide':
+        # Just slid_agr and slid_ags.mov.html and .mpg.html
+        return extract_video_image_page(html_string, "/dig/html/excavations", filepath.name)
+    # Shared with the excavation element pages through a FrameCache
+    return parse_frame(readfile, extract_image_page, html_string,
+                       "/dig/html/excavations", dig_parent_dir, filepath.name)
+
 def generate_metadata_dicts(extracted_images):
     image_path_to_figure_num = {}
     slid_path_to_figure_num = {}
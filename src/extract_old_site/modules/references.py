@@ -1,5 +1,6 @@
-from bs4 import BeautifulSoup, NavigableString
+from bs4 import NavigableString
 from pathlib import Path
+from ..utilities.parsers import make_soup
 
 def extract_references_page(html_string):
     """Extract the references in report282b, 283b, or 284b.html.
@@ -11,7 +12,7 @@ def extract_references_page(html_string):
     html_string = html_string.replace("<blockquote>", "<blockquote><p>")
     # Fix the two broken refs of McCollough et al. and MacCord
     html_string = html_string.replace("Lenhardt<p>", "Lenhardt<blockquote><p>")
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'references.extract_references_page')
     references = {}
     hrefs_to_refs = {}
 
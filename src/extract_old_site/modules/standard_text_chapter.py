@@ -1,7 +1,11 @@
-from bs4 import BeautifulSoup
 from pathlib import Path
 import os
+from ..utilities import dig_inventory
+from ..utilities.frame_cache import frame_sources, parse_frame
+from ..utilities.parse_cache import persistent
+from ..utilities.parsers import make_soup
 
+@persistent
 def extract_page_content(html_string, folder_path_str):
     """Extract contents of a page from a report*b.html file.
 
@@ -17,7 +21,7 @@ def extract_page_content(html_string, folder_path_str):
     extracted_paragraphs : list
         List of objects representing paragraphs, each with a type and content.
     """
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'standard_text_chapter.extract_page_content')
     folder_path = Path(folder_path_str)
 
     extracted_paragraphs = []
@@ -99,9 +103,10 @@ def extract_page_title(html_string):
     str
         Page title as a string, without any HTML tags.
     """
-    soup = BeautifulSoup(html_string, 'html.parser')
+    soup = make_soup(html_string, 'standard_text_chapter.extract_page_title', 'html.parser')
     return str(soup.body.center.i.string)
 
+@persistent
 def extract_page_number(html_string):
     """Extract the page number from a report*c.html file.
 
@@ -115,9 +120,10 @@ def extract_page_number(html_string):
     str
         Page number as a string, to cover both Arabic and Roman numerals.
     """
-    soup = BeautifulSoup(html_string, 'html.parser')
+    soup = make_soup(html_string, 'standard_text_chapter.extract_page_number', 'html.parser')
     return str(soup.body.center.string).replace('Page ', '')
 
+@persistent
 def extract_sidebar(html_string, folder_path_str, parent_body_page_name):
     """Extract sidebar info from a "index*_*.html" file.
 
@@ -137,7 +143,7 @@ def extract_sidebar(html_string, folder_path_str, parent_body_page_name):
     """
     # Note: because the original html content did not have any closing </p>
     # tags, this function depends on using html5lib for proper parsing.
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'standard_text_chapter.extract_sidebar')
     folder_path = Path(folder_path_str)
     # Get lines/sections from the sidebar, which are contained in <p> tags
     paragraphs = soup.body.find_all('p')
@@ -236,17 +242,25 @@ def extract_sidebar(html_string, folder_path_str, parent_body_page_name):
         'currentSection': current_section
     }
 
+def module_tab_page_name(tab_page_name):
+    """Return the name of the first page of a tab*_*.html page's module.
+
+    The topbar extraction always uses the first page of a module (tab0.html,
+    tab1.html, etc.), rather than pages like tab0_3.html, when recording the
+    module's path.
+    """
+    part_nums = tab_page_name.split('_')
+    if len(part_nums) > 1:
+        return part_nums[0] + ".html"
+    return tab_page_name
+
+@persistent
 def extract_topbar(html_string, folder_path_str, parent_tab_page_name):
     """Extract info on the modules of a chapter from a tabs*.html file."""
-    soup = BeautifulSoup(html_string, 'html5lib')
+    soup = make_soup(html_string, 'standard_text_chapter.extract_topbar')
     folder_path = Path(folder_path_str)
     links_contents = soup.body.b.contents
-    # Change the parent_tab_page_name so the extraction always uses the first
-    # page of a module (tab0.html, tab1.html, etc.), rather than pages like
-    # tab0_3.html, when recording the module's path.
-    part_nums = parent_tab_page_name.split('_')
-    if len(part_nums) > 1:
-        parent_tab_page_name = part_nums[0] + ".html"
+    parent_tab_page_name = module_tab_page_name(parent_tab_page_name)
 
     modules = []
     current_module = None
@@ -281,11 +295,9 @@ def extract_topbar(html_string, folder_path_str, parent_tab_page_name):
 
 def extract_frames(html_string, full_current_dir_path, readfile):
     """Read in data from the contained frames in a report#.html page."""
-    soup = BeautifulSoup(html_string, 'html.parser')
     data = []
-    frames = soup.frameset.find_all(['frame'])
-    for frame in frames:
-        data.append(readfile(frame['src'], full_current_dir_path))
+    for frame_src in frame_sources(readfile, html_string):
+        data.append(readfile(frame_src, full_current_dir_path))
     return data
 
 def get_body_page_html_contents(html_string, current_dir_path, dig_parent_dir_path, readfile, has_page_num=True):
@@ -306,12 +318,11 @@ def get_body_page_html_contents(html_string, current_dir_path, dig_parent_dir_pa
         Function to read any file based on the file name or folder path.
     """
 
-    soup = BeautifulSoup(html_string, 'html5lib')
-    frames = soup.find_all('frame')
+    frames = frame_sources(readfile, html_string)
     full_current_dir_path = dig_parent_dir_path / ("." + current_dir_path)
-    sidebar_html_string = readfile(frames[0]['src'], full_current_dir_path)
-    report_html_string = readfile(frames[1]['src'], full_current_dir_path)
-    report_folder_path = (full_current_dir_path / frames[1]['src']).parent
+    sidebar_html_string = readfile(frames[0], full_current_dir_path)
+    report_html_string = readfile(frames[1], full_current_dir_path)
+    report_folder_path = (full_current_dir_path / frames[1]).parent
     report_abc_content = extract_frames(report_html_string, report_folder_path, readfile)
 
     extracted_html_strs = {
@@ -325,12 +336,11 @@ def get_body_page_html_contents(html_string, current_dir_path, dig_parent_dir_pa
 
 def get_tab_page_html_contents(html_string, current_dir_path, dig_parent_dir_path, readfile, has_page_num=True):
     """Extract all parts of a tab*.html or tab*_*.html page and its frames."""
-    soup = BeautifulSoup(html_string, 'html5lib')
-    frames = soup.find_all('frame')
+    frames = frame_sources(readfile, html_string)
     full_current_dir_path = dig_parent_dir_path / ("." + current_dir_path)
-    topbar_html_string = readfile(frames[0]['src'], full_current_dir_path)
+    topbar_html_string = readfile(frames[0], full_current_dir_path)
     body_html_content = get_body_page_html_contents(
-        readfile(frames[1]['src'], full_current_dir_path),
+        readfile(frames[1], full_current_dir_path),
         current_dir_path,
         dig_parent_dir_path,
         readfile,
@@ -341,7 +351,7 @@ def get_tab_page_html_contents(html_string, current_dir_path, dig_parent_dir_pat
         'sidebar_html': body_html_content['sidebar_html'],
         'reporta_html': body_html_content['reporta_html'],
         'reportb_html': body_html_content['reportb_html'],
-        'body_page_name': frames[1]['src']
+        'body_page_name': frames[1]
     }
 
     if has_page_num:
@@ -356,12 +366,14 @@ def process_tab_html_contents(
     title = extract_page_title(html_strings['reporta_html'])
     content = extract_page_content(html_strings['reportb_html'], current_dir_path)
     page_num = extract_page_number(html_strings['reportc_html'])
-    sidebar_info = extract_sidebar(html_strings['sidebar_html'],
-                                   current_dir_path,
-                                   html_strings['body_page_name'])
-    topbar_info = extract_topbar(html_strings['topbar_html'],
-                                 current_dir_path,
-                                 current_tab_page_name)
+    sidebar_info = parse_frame(readfile, extract_sidebar,
+                               html_strings['sidebar_html'],
+                               current_dir_path,
+                               html_strings['body_page_name'])
+    topbar_info = parse_frame(readfile, extract_topbar,
+                              html_strings['topbar_html'],
+                              current_dir_path,
+                              module_tab_page_name(current_tab_page_name))
 
     processed = {
         "page": {
@@ -454,8 +466,11 @@ def extract_full_chapter(
     # to the "modules" array first.
     module_start_tab_names = sorted(module_start_tab_names)
     for tab_name in module_start_tab_names:
-        current_module_file_names = [filename for filename in filenames
-                                     if tab_name.split('.')[0] in filename]
+        module_num = dig_inventory.PATTERNS['tab'].fullmatch(tab_name).group('module')
+        current_module_file_names = [
+            filename for filename in filenames
+            if dig_inventory.PATTERNS['tab'].fullmatch(filename).group('module') == module_num
+        ]
         module_object = extract_full_module(current_module_file_names,
                                             current_dir_path, dig_parent_path, readfile)
         extracted['modules'].append(module_object)
@@ -471,10 +486,8 @@ def extract_standard_part(part_folder_name, dig_parent_dir, readfile):
     # Get all tab*.html or tab*_*.html files, which are starting points for
     # the extraction process
     folder_to_extract_full_path = Path(dig_parent_dir) / "./dig/html" / part_folder_name
-    tab_filenames = []
-    for filepath in folder_to_extract_full_path.iterdir():
-        if "tab" in filepath.name and "tabs" not in filepath.name:
-            tab_filenames.append(filepath.name)
+    tab_filenames = [filepath.name for filepath
+                     in dig_inventory.files(folder_to_extract_full_path, 'tab')]
     return extract_full_chapter(tab_filenames,
                                 "/dig/html/" + part_folder_name,
                                 Path(dig_parent_dir),
@@ -483,7 +496,7 @@ def extract_standard_part(part_folder_name, dig_parent_dir, readfile):
 def reextract_title_page(part_0_data, dig_parent_dir, readfile):
     """Extract the actual title page from part 0 and put it in the dict."""
     title_page_html_str = readfile("report0b.html", Path(dig_parent_dir) / "./dig/html/split")
-    soup = BeautifulSoup(title_page_html_str, 'html5lib')
+    soup = make_soup(title_page_html_str, 'standard_text_chapter.reextract_title_page')
     part_0_data["pages"]["i"]["content"].append({
         "type": "paragraph",
         "content": str(soup.center)
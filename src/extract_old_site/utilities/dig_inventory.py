@@ -0,0 +1,144 @@
+import os
+import pathlib
+import re
+
+# Kinds of files in /dig/html, by the exact pattern of their names
+PATTERNS = {
+    'tab': r'tab(?P<module>\d+)(?:_(?P<page>\d+))?\.html',
+    'tabs': r'tabs(?P<module>\d+)\.html',
+    'body': r'body(?P<module>\d+)(?:_(?P<page>\d+))?\.html',
+    'index': r'index(?P<module>\d+)(?:_(?P<page>\d+))?\.html',
+    'report_a': r'report(?P<page>\d+)a\.html',
+    'report_b': r'report(?P<page>\d+)b\.html',
+    'report_c': r'report(?P<page>\d+)c\.html',
+    'slide': r'slid_(?P<name>\w+)\.html',
+    'video_slide': r'slid_(?P<name>\w+)\.(?:mov|mpg)\.html',
+    'exc': r'exc_(?P<letters>\w+)\.html',
+    'art': r'art_(?P<letters>\w\w)\w*\.html',
+    'info': r'info_(?P<letters>\w\w)\w*\.html',
+    'ctrl': r'ctrl_(?P<letters>\w+)\.html',
+    'img': r'img_\w+\.html',
+    'db': r'db(?P<page>\d+)_(?P<frame>\d+)\.html',
+    'table': r'table(?P<table>\d+)(?:_\w+)?\.html',
+    'primer': r'primer(?P<page>\d+)\.html'
+}
+PATTERNS = {kind: re.compile(pattern) for kind, pattern in PATTERNS.items()}
+
+# Inventory queried by files() and matches() while an extraction step runs,
+# see use_inventory()
+_inventory = None
+
+
+class DigInventory:
+    """
+    Listing of the files in /dig/html, taken once and shared by the
+    extraction modules instead of each of them listing directories.
+
+    Files are listed in the order the file system lists them, which is the
+    order Path.iterdir() (and so the extraction before this) walked them in,
+    and are classified into kinds by the patterns in PATTERNS, matched
+    against the whole name ('tab1' doesn't match tab10.html, and 'tab' no
+    longer matches tabs0.html or table3.html).
+
+    Attributes
+    ----------
+    dirs : dict
+        Maps the normalized path of every directory listed to the names of
+        the files in it.
+    """
+
+    def __init__(self):
+        self.dirs = {}
+
+    @classmethod
+    def scan(cls, html_dir):
+        """List every directory under html_dir, with one os.scandir() each."""
+        inventory = cls()
+        pending = [os.path.normpath(str(html_dir))]
+        while pending:
+            dir_path = pending.pop()
+            names = []
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            pending.append(entry.path)
+                        else:
+                            names.append(entry.name)
+            except OSError:
+                continue
+            inventory.dirs[dir_path] = names
+        return inventory
+
+    @classmethod
+    def from_paths(cls, dir_path, paths):
+        """Inventory of a single directory, given the paths in it."""
+        inventory = cls()
+        inventory.dirs[_dir_key(dir_path)] = [path.name for path in paths]
+        return inventory
+
+    def covers(self, dir_path):
+        return _dir_key(dir_path) in self.dirs
+
+    def files(self, dir_path, kind=None):
+        """Paths of the files in a directory, or only those of a kind."""
+        dir_path = pathlib.Path(dir_path)
+        names = self.dirs.get(_dir_key(dir_path), [])
+        if kind is not None:
+            pattern = PATTERNS[kind]
+            names = [name for name in names if pattern.fullmatch(name)]
+        return [dir_path / name for name in names]
+
+    def matches(self, dir_path, kind):
+        """(path, match object) of the files of a kind in a directory."""
+        dir_path = pathlib.Path(dir_path)
+        pattern = PATTERNS[kind]
+        found = []
+        for name in self.dirs.get(_dir_key(dir_path), []):
+            match = pattern.fullmatch(name)
+            if match:
+                found.append((dir_path / name, match))
+        return found
+
+    def stats(self):
+        return "{} files in {} directories".format(
+            sum(len(names) for names in self.dirs.values()), len(self.dirs))
+
+
+def kind(name):
+    """The kind of file a name is in PATTERNS, or None."""
+    for file_kind, pattern in PATTERNS.items():
+        if pattern.fullmatch(name):
+            return file_kind
+    return None
+
+
+def _dir_key(dir_path):
+    return os.path.normpath(str(dir_path))
+
+
+def use_inventory(inventory):
+    """Make files() and matches() use 'inventory', or none if None."""
+    global _inventory
+    _inventory = inventory
+
+
+def inventory_of(dir_path):
+    """
+    The inventory in use if it lists dir_path, or else one of dir_path
+    alone, listed now.
+    """
+    if _inventory is not None and _inventory.covers(dir_path):
+        return _inventory
+    dir_path = pathlib.Path(dir_path)
+    return DigInventory.from_paths(dir_path, dir_path.iterdir())
+
+
+def files(dir_path, kind=None):
+    """Paths of the files in a directory, or only those of a kind."""
+    return inventory_of(dir_path).files(dir_path, kind)
+
+
+def matches(dir_path, kind):
+    """(path, match object) of the files of a kind in a directory."""
+    return inventory_of(dir_path).matches(dir_path, kind)
@@ -1,4 +1,9 @@
+from collections import deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+import glob
+import os
 import pathlib
+import threading
 
 def readfile(filename, current_dir_path):
     """Return the contents of a file as a string given a Path object to it.
@@ -12,3 +17,158 @@ def readfile(filename, current_dir_path):
     file_path = current_dir_path / filename
     with open(file_path, 'r', encoding='ISO-8859-1') as f:
         return f.read()
+
+
+class PrefetchReader:
+    """Readfile replacement that reads files ahead of time on a thread pool.
+
+    Files queued with prefetch() are read in the background, in queue order,
+    while no more than max_bytes of their contents are held in memory. Files
+    are only looked at by the reader threads, so the calling thread never
+    waits on the file system for files it hasn't asked for yet. Their sizes
+    are only known once read, so the cap can be exceeded by the files being
+    read at the time (at most max_workers). A read is served from memory
+    (waiting for it if it is still in flight) and then dropped, which makes
+    room for the next queued files. When the cap is reached and a file is
+    asked for before its turn, the files read ahead of it and never asked
+    for are dropped too, rather than holding the cap until clear().
+    Anything that wasn't prefetched, or failed to be, is read directly.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Cap on the size of the files held in memory at once.
+    max_workers : int
+        Number of reader threads.
+    readfile : function
+        Function used to actually read files.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, max_workers=8, readfile=readfile):
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.readfile = readfile
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Reader threads update the state below when they finish a file
+        self.lock = threading.RLock()
+        self.queue = deque()
+        self.queued = {}
+        self.waiting = set()
+        self.pending = {}
+        self.held = {}
+        self.in_flight = set()
+        self.held_bytes = 0
+        self.prefetched_reads = 0
+        self.direct_reads = 0
+        self.released = 0
+
+    def __call__(self, filename, current_dir_path):
+        """Return the contents of a file, like readfile()."""
+        key = _path_key(current_dir_path / filename)
+        with self.lock:
+            future = self.pending.pop(key, None)
+            self.held_bytes -= self.held.pop(key, 0)
+            if key in self.waiting and self.held_bytes >= self.max_bytes:
+                # Asked for before its turn with the cap reached; whatever
+                # was read ahead of it was skipped
+                self._release_before(self.queued[key])
+            self._fill()
+        if future is not None:
+            try:
+                text = future.result()
+                self.prefetched_reads += 1
+                return text
+            except (OSError, CancelledError):
+                pass
+        self.direct_reads += 1
+        return self.readfile(filename, current_dir_path)
+
+    def prefetch(self, path, inventory=None):
+        """
+        Queue the files in a directory, or matching a glob, for reading.
+        Directories listed in 'inventory' (a DigInventory) aren't listed
+        again.
+        """
+        path = pathlib.Path(path)
+        listed = inventory is not None and inventory.covers(path)
+        if listed:
+            paths = inventory.files(path)
+        elif path.is_dir():
+            paths = path.iterdir()
+        else:
+            paths = (pathlib.Path(p) for p in glob.glob(str(path), recursive=True))
+        with self.lock:
+            for file_path in sorted(paths):
+                key = _path_key(file_path)
+                if key not in self.queued:
+                    self.queued[key] = len(self.queued)
+                    self.queue.append((key, file_path))
+                    self.waiting.add(key)
+            self._fill()
+
+    def clear(self):
+        """Forget all queued and prefetched files."""
+        with self.lock:
+            pending = list(self.pending.values())
+            self.queue.clear()
+            self.queued.clear()
+            self.waiting.clear()
+            self.pending.clear()
+            self.held.clear()
+            self.held_bytes = 0
+        for future in pending:
+            future.cancel()
+
+    def close(self):
+        """Stop the reader threads."""
+        self.clear()
+        self.executor.shutdown()
+
+    def stats(self):
+        """Return a one-line summary of how reads were served."""
+        return "{} reads prefetched, {} read directly, {} never asked for".format(
+            self.prefetched_reads, self.direct_reads, self.released)
+
+    def _fill(self):
+        """Start reading queued files until the memory cap is reached."""
+        while (self.queue and len(self.in_flight) < self.max_workers
+               and (self.held_bytes < self.max_bytes or not self.held)):
+            key, file_path = self.queue.popleft()
+            self.waiting.discard(key)
+            future = self.executor.submit(self._read, file_path)
+            self.pending[key] = future
+            self.in_flight.add(future)
+            future.add_done_callback(
+                lambda future, key=key: self._done(key, future))
+
+    def _read(self, file_path):
+        """Read a file (in a reader thread), skipping anything but files."""
+        if not file_path.is_file():
+            raise FileNotFoundError(str(file_path))
+        return self.readfile(file_path.name, file_path.parent)
+
+    def _done(self, key, future):
+        """Count a finished file towards the cap, unless already served."""
+        with self.lock:
+            self.in_flight.discard(future)
+            if self.pending.get(key) is future and not future.cancelled():
+                if future.exception() is None:
+                    self.held[key] = len(future.result())
+                    self.held_bytes += self.held[key]
+                else:
+                    del self.pending[key]
+            self._fill()
+
+    def _release_before(self, position):
+        """Drop the files read ahead of queue 'position' and not asked for."""
+        for key in [key for key in self.held if self.queued[key] < position]:
+            del self.pending[key]
+            self.held_bytes -= self.held.pop(key)
+            self.released += 1
+        while self.queue and self.queued[self.queue[0][0]] <= position:
+            self.waiting.discard(self.queue.popleft()[0])
+
+
+def _path_key(path):
+    """Normalized absolute path string, so differently written paths match."""
+    return os.path.normpath(os.path.abspath(path))
@@ -0,0 +1,167 @@
+from html.parser import HTMLParser
+import copy
+import os
+from .parsers import parser_for
+
+
+class FrameCache:
+    """
+    Memoizing file reader for the frame files shared between pages.
+
+    Every tab*_*.html page of a module loads the same tabs*.html topbar, and
+    pages may share an index*.html sidebar. A FrameCache can be passed anywhere
+    a readfile function is expected: it reads each file once, and remembers
+    which text came from which file so that the results of parsing that text
+    can be reused as well.
+
+    Attributes
+    ----------
+    readfile : function
+        Function used to actually read files, see file_ops.readfile.
+    texts : dict
+        Raw file contents, keyed by resolved file path.
+    results : dict
+        Parse results, keyed by (resolved file path, parser, function name,
+        extra arguments).
+    paths_read : set of str
+        Resolved paths of every file requested, cached or not. Callers may
+        clear it to find out which files a given piece of work depended on.
+    frame_graph : dict
+        Frame graph of the old site: the sources of the frames of every
+        frameset page resolved, in order, keyed by resolved file path (or
+        by contents, for strings not read through this cache).
+    text_hits, text_misses, parse_hits, parse_misses : int
+        Counters for how often a read or a parse was served from the cache.
+    frameset_hits, frameset_misses : int
+        Counters for how often a frameset's sources came from the frame graph
+        or were resolved. Either way, no full parse of the page was needed.
+    """
+
+    def __init__(self, readfile):
+        self.readfile = readfile
+        self.texts = {}
+        self.results = {}
+        # Texts are kept alive by self.texts, so their ids stay unique
+        self.paths_by_text_id = {}
+        self.paths_read = set()
+        self.frame_graph = {}
+        self.text_hits = 0
+        self.text_misses = 0
+        self.parse_hits = 0
+        self.parse_misses = 0
+        self.frameset_hits = 0
+        self.frameset_misses = 0
+
+    def __call__(self, filename, current_dir_path):
+        """Return the contents of a file, reading it only the first time."""
+        path = os.path.normpath(os.path.abspath(current_dir_path / filename))
+        self.paths_read.add(path)
+        if path in self.texts:
+            self.text_hits += 1
+            return self.texts[path]
+
+        self.text_misses += 1
+        text = self.readfile(filename, current_dir_path)
+        self.texts[path] = text
+        self.paths_by_text_id[id(text)] = path
+        return text
+
+    def parse(self, func, html_string, *args, parser='html5lib'):
+        """
+        Return func(html_string, *args), computing it only the first time.
+
+        Strings not read through this cache are keyed by their contents.
+        Callers get their own copy of the result, since extraction code
+        modifies the dicts it is given.
+        """
+        source = self.paths_by_text_id.get(id(html_string), html_string)
+        key = (source, parser, func.__module__ + '.' + func.__name__, args)
+        if key in self.results:
+            self.parse_hits += 1
+        else:
+            self.parse_misses += 1
+            self.results[key] = func(html_string, *args)
+        return copy.deepcopy(self.results[key])
+
+    def frames(self, html_string):
+        """
+        Return the sources of the frames of a frameset page, resolving them
+        only the first time.
+        """
+        source = self.paths_by_text_id.get(id(html_string), html_string)
+        if source in self.frame_graph:
+            self.frameset_hits += 1
+        else:
+            self.frameset_misses += 1
+            self.frame_graph[source] = resolve_frameset(html_string)
+        return list(self.frame_graph[source])
+
+    def stats(self):
+        """Return a one-line summary of the hit/miss counters."""
+        return ("file reads: {} cached, {} from disk; "
+                "frame parses: {} cached, {} parsed; "
+                "framesets: {} cached, {} resolved, {} full parses avoided").format(
+                    self.text_hits, self.text_misses,
+                    self.parse_hits, self.parse_misses,
+                    self.frameset_hits, self.frameset_misses,
+                    self.frameset_hits + self.frameset_misses)
+
+
+class FramesetParser(HTMLParser):
+    """
+    Collects the src of every <frame> tag of a page as it is tokenized,
+    without building a tree of the page.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sources = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'frame':
+            src = dict(attrs).get('src')
+            if src is not None:
+                self.sources.append(src)
+
+
+def resolve_frameset(html_string):
+    """Return the sources of the frames of a frameset page, in order."""
+    parser = FramesetParser()
+    parser.feed(html_string)
+    parser.close()
+    return parser.sources
+
+
+def parse_frame(readfile, func, html_string, *args):
+    """
+    Run func(html_string, *args), memoized if readfile is a FrameCache.
+
+    Parameters
+    ----------
+    readfile : function or FrameCache
+        The readfile passed through the extraction functions.
+    func : function
+        Extraction function taking an html string as its first argument. The
+        frame extraction functions were all written against html5lib, the
+        parser actually used is looked up with parsers.parser_for().
+    html_string : str
+        Contents of the frame to extract from.
+    """
+    if isinstance(readfile, FrameCache):
+        caller = func.__module__.split('.')[-1] + '.' + func.__name__
+        return readfile.parse(func, html_string, *args,
+                              parser=parser_for(caller, 'html5lib'))
+    return func(html_string, *args)
+
+
+def frame_sources(readfile, html_string):
+    """
+    Return the sources of the frames of a frameset page, in order, through
+    the frame graph if readfile is a FrameCache.
+
+    Pages that are nothing but a <frameset> only need their frames' sources,
+    which are read with a tokenizer instead of a full parse of the page.
+    """
+    if isinstance(readfile, FrameCache):
+        return readfile.frames(html_string)
+    return resolve_frameset(html_string)
@@ -0,0 +1,174 @@
+from PIL import Image
+import hashlib
+import io
+import json
+import os
+import pathlib
+from .manifest import path_key
+
+CACHE_FILENAME = "imageDimensions.json"
+CACHE_VERSION = 1
+
+# Cache used by dimensions() while an extraction step runs, see use_cache()
+_cache = None
+
+
+class DimensionCache:
+    """
+    Dimensions of the site's images, kept between extraction runs.
+
+    Every image is recorded with its size, mtime and sha1. An image whose
+    size and mtime match its record isn't opened at all, and one whose
+    contents still hash the same isn't probed again. Otherwise the image is
+    read once: its contents are hashed, and its dimensions are probed from
+    the header in memory (Pillow doesn't decode an image to report its
+    size).
+
+    The records double as file records for the extraction manifest, which
+    then doesn't read the images again to hash them.
+
+    Attributes
+    ----------
+    path : Path
+        File the records are kept in, next to the extracted JSON files, or
+        None to keep them in memory only.
+    records : dict
+        {'size', 'mtime', 'sha1', 'width', 'height'} of every image, keyed
+        by manifest.path_key() of its path.
+    updated : dict
+        Records added or changed since take_updated_records() last took
+        them.
+    cached, rehashed, probed : int
+        Number of lookups answered from a record without reading the image,
+        after hashing it, and by probing it.
+    bytes_read : int
+        Size of the images read.
+    """
+
+    def __init__(self, path=None):
+        self.path = pathlib.Path(path) if path is not None else None
+        self.read_mtime = None
+        self.records = {}
+        self.refresh()
+        self.changed = False
+        self.updated = {}
+        self.cached = 0
+        self.rehashed = 0
+        self.probed = 0
+        self.bytes_read = 0
+
+    def refresh(self):
+        """Add the records written by other processes since the cache was read."""
+        if self.path is not None:
+            self.read_mtime = _mtime(self.path)
+            records = read_records(self.path)
+            records.update(self.records)
+            self.records = records
+
+    def refresh_if_written(self):
+        """refresh(), if the file was written since the cache last read it."""
+        if self.path is not None and _mtime(self.path) != self.read_mtime:
+            self.refresh()
+
+    def dimensions(self, img_path):
+        """Return the (width, height) of an image."""
+        key = path_key(img_path)
+        stat = os.stat(key)
+        record = self.records.get(key)
+        if (record is not None and record['size'] == stat.st_size
+                and record['mtime'] == stat.st_mtime_ns):
+            self.cached += 1
+            return record['width'], record['height']
+
+        with open(key, 'rb') as f:
+            data = f.read()
+        self.bytes_read += len(data)
+        sha1 = hashlib.sha1(data).hexdigest()
+        if record is not None and record['sha1'] == sha1:
+            self.rehashed += 1
+            width, height = record['width'], record['height']
+        else:
+            self.probed += 1
+            width, height = probe(io.BytesIO(data))
+        self.records[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                             'sha1': sha1, 'width': width, 'height': height}
+        self.updated[key] = self.records[key]
+        self.changed = True
+        return width, height
+
+    def merge(self, records):
+        """Add records found by another process, e.g. a WorkQueue worker."""
+        if records:
+            self.records.update(records)
+            self.changed = True
+
+    def write(self):
+        """Save the records, if any changed, replacing the file atomically."""
+        if self.path is None or not self.changed:
+            return
+        self.refresh()
+        tmp_path = self.path.with_name(self.path.name + ".{}.tmp".format(os.getpid()))
+        with tmp_path.open('w') as f:
+            json.dump({'version': CACHE_VERSION, 'images': self.records}, f,
+                      indent=1, sort_keys=True)
+        os.replace(str(tmp_path), str(self.path))
+        self.changed = False
+
+    def stats(self):
+        """Return a one-line summary of the counters."""
+        return ("{} from cache, {} unchanged by hash, {} probed; "
+                "{:.1f} MB read").format(self.cached, self.rehashed, self.probed,
+                                         self.bytes_read / 2**20)
+
+
+def _mtime(path):
+    try:
+        return os.stat(str(path)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def read_records(path):
+    """Records of a cache file, or none if it's missing or outdated."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != CACHE_VERSION:
+        return {}
+    return data.get('images', {})
+
+
+def probe(file):
+    """Return the (width, height) of an image file or file object."""
+    with Image.open(file) as image:
+        return image.size
+
+
+def use_cache(cache):
+    """Make dimensions() use 'cache' (a DimensionCache), or none if None."""
+    global _cache
+    _cache = cache
+
+
+def refresh_cache():
+    """Add the records written by other processes to the cache in use."""
+    if _cache is not None:
+        _cache.refresh_if_written()
+
+
+def take_updated_records():
+    """Return and forget the records the cache in use added or changed."""
+    if _cache is None:
+        return {}
+    updated = _cache.updated
+    _cache.updated = {}
+    return updated
+
+
+def dimensions(img_path):
+    """Return the (width, height) of an image, through the cache in use."""
+    if _cache is None:
+        return probe(pathlib.Path(img_path))
+    return _cache.dimensions(img_path)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import pathlib
+
+MANIFEST_FILENAME = "extractionManifest.json"
+MANIFEST_VERSION = 1
+
+
+class InputRecorder:
+    """
+    Readfile wrapper recording the path of every file read through it.
+
+    Attributes
+    ----------
+    readfile : function
+        Function used to actually read files.
+    paths : set of str
+        Normalized absolute paths of the files read so far.
+    """
+
+    def __init__(self, readfile):
+        self.readfile = readfile
+        self.paths = set()
+
+    def __call__(self, filename, current_dir_path):
+        self.paths.add(path_key(current_dir_path / filename))
+        return self.readfile(filename, current_dir_path)
+
+
+class ExtractionManifest:
+    """
+    Record of the source files each extraction step read, to skip steps
+    whose inputs haven't changed since their outputs were written.
+
+    A step's entry stores the size, mtime and sha1 of every file it read,
+    a hash of the listing of each directory those files are in (so added or
+    removed files are noticed), a hash of the extraction code and the config
+    values affecting the output. Files whose size and mtime are unchanged
+    are trusted without being hashed again.
+
+    Attributes
+    ----------
+    path : Path
+        Location of the manifest file, next to the extracted JSON files.
+    fingerprint : dict
+        Code hash and config values the entries are valid for.
+    steps : dict
+        Entries for each step, keyed by step name.
+    records : dict
+        Latest record of every file, keyed by path, from any step's entry
+        or hashed since. Steps reading the same files share their hashes.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = pathlib.Path(path)
+        self.fingerprint = fingerprint
+        self.steps = {}
+        self.records = {}
+        if self.path.is_file():
+            try:
+                with self.path.open() as f:
+                    data = json.load(f)
+            except ValueError:
+                data = {}
+            if data.get('version') == MANIFEST_VERSION:
+                self.steps = data.get('steps', {})
+        for entry in self.steps.values():
+            self.records.update(entry['files'])
+
+    def is_fresh(self, step_name, output_dir_path):
+        """
+        Return True if step_name can be skipped: its outputs all exist in
+        output_dir_path, and nothing it read (or the code and config) changed
+        since it last ran.
+        """
+        entry = self.steps.get(step_name)
+        if entry is None or entry['fingerprint'] != self.fingerprint:
+            return False
+        output_dir_path = pathlib.Path(output_dir_path)
+        if not all((output_dir_path / name).is_file() for name in entry['outputs']):
+            return False
+        for dir_path, listing_hash in entry['dirs'].items():
+            if hash_listing(dir_path) != listing_hash:
+                return False
+        for file_path, record in entry['files'].items():
+            if not file_unchanged(file_path, record):
+                return False
+        return True
+
+    def record(self, step_name, paths, output_names, known_records=None):
+        """
+        Store the state of the files at 'paths' as step_name's inputs, and
+        the names of the JSON files it wrote.
+
+        Files are only hashed if their size or mtime differ from their
+        latest record, or from their entry in 'known_records' (records with
+        at least 'size', 'mtime' and 'sha1' keyed by path, e.g. from the
+        image dimension cache).
+        """
+        known_records = known_records or {}
+        files = {}
+        for file_path in sorted(paths):
+            if os.path.isfile(file_path):
+                files[file_path] = self.file_record(file_path, known_records.get(file_path))
+        dirs = sorted({os.path.dirname(file_path) for file_path in files})
+        self.steps[step_name] = {
+            'fingerprint': self.fingerprint,
+            'outputs': sorted(output_names),
+            'files': files,
+            'dirs': {dir_path: hash_listing(dir_path) for dir_path in dirs}
+        }
+
+    def file_record(self, file_path, known_record=None):
+        """Record of a file, reusing a record matching its size and mtime."""
+        stat = os.stat(file_path)
+        for record in [self.records.get(file_path), known_record]:
+            if (record is not None and record['size'] == stat.st_size
+                    and record['mtime'] == stat.st_mtime_ns):
+                break
+        else:
+            record = file_record(file_path)
+        record = {key: record[key] for key in ('size', 'mtime', 'sha1')}
+        self.records[file_path] = record
+        return record
+
+    def write(self):
+        with self.path.open('w') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'steps': self.steps
+            }, f, indent=1, sort_keys=True)
+
+
+def path_key(path):
+    """Normalized absolute path string, so differently written paths match."""
+    return os.path.normpath(os.path.abspath(path))
+
+
+def hash_file(file_path):
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def file_record(file_path):
+    stat = os.stat(file_path)
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'sha1': hash_file(file_path)
+    }
+
+
+def file_unchanged(file_path, record):
+    """Compare a file to its record, hashing it only if size/mtime differ."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return False
+    if stat.st_size != record['size']:
+        return False
+    if stat.st_mtime_ns == record['mtime']:
+        return True
+    return hash_file(file_path) == record['sha1']
+
+
+def hash_listing(dir_path):
+    """Hash of the sorted file names in a directory, None if it's missing."""
+    try:
+        names = sorted(os.listdir(dir_path))
+    except OSError:
+        return None
+    return hashlib.sha1('\n'.join(names).encode('utf-8')).hexdigest()
+
+
+def hash_code(package_dir):
+    """Hash of all the Python source files under package_dir."""
+    sha1 = hashlib.sha1()
+    for source_path in sorted(pathlib.Path(package_dir).rglob('*.py')):
+        sha1.update(source_path.relative_to(package_dir).as_posix().encode('utf-8'))
+        sha1.update(source_path.read_bytes())
+    return sha1.hexdigest()
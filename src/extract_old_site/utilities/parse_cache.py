@@ -0,0 +1,147 @@
+import functools
+import hashlib
+import os
+import pathlib
+import pickle
+from . import parsers
+
+CACHE_DIRNAME = "parseCache"
+CACHE_VERSION = 1
+
+# Cache used by the functions decorated with persistent() while an
+# extraction step runs, see use_cache()
+_cache = None
+
+
+class ParseCache:
+    """
+    Results of the extraction functions that only depend on the html they
+    are given, kept on disk between extraction runs.
+
+    A result is keyed by the function's name, the version of the extraction
+    code, the hash of the html, the function's other arguments and the
+    parser configuration, so an edited file misses the cache while every
+    other file of its step is served from it. Each result is pickled to its
+    own file, written atomically, so processes running steps in parallel
+    can share the cache. Once a run is over, the least recently used
+    results are evicted down to max_bytes.
+
+    Attributes
+    ----------
+    dir_path : Path
+        Directory the results are kept in.
+    code_version : str
+        Hash of the extraction code, see manifest.hash_code().
+    max_bytes : int
+        Size the cache is evicted down to.
+    hits, misses, evicted : int
+        Number of results read from the cache, computed, and evicted.
+    """
+
+    def __init__(self, dir_path, code_version, max_bytes=256 * 2**20):
+        self.dir_path = pathlib.Path(dir_path)
+        self.code_version = code_version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def key(self, func, html_string, args):
+        """Return the hash keying the result of func(html_string, *args)."""
+        parser, overrides = parsers.configuration()
+        key = hashlib.sha1(repr((
+            CACHE_VERSION, func.__module__, func.__qualname__, self.code_version,
+            parser, sorted(overrides.items()), args
+        )).encode('utf-8'))
+        key.update(html_string.encode('utf-8', 'surrogatepass'))
+        return key.hexdigest()
+
+    def path(self, key):
+        return self.dir_path / key[:2] / (key + ".pickle")
+
+    def call(self, func, html_string, *args):
+        """Return func(html_string, *args), from the cache if it's there."""
+        path = self.path(self.key(func, html_string, args))
+        try:
+            with path.open('rb') as f:
+                result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        else:
+            self.hits += 1
+            try:
+                os.utime(str(path))  # Recently used, see evict()
+            except OSError:
+                pass
+            return result
+
+        self.misses += 1
+        result = func(html_string, *args)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".{}.tmp".format(os.getpid()))
+        with tmp_path.open('wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(str(tmp_path), str(path))
+        return result
+
+    def evict(self):
+        """Delete the least recently used results beyond max_bytes."""
+        entries = []
+        total = 0
+        for subdir in _scandir(self.dir_path):
+            if subdir.is_dir():
+                for entry in _scandir(subdir.path):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evicted += 1
+        return total
+
+    def stats(self):
+        """Return a one-line summary of the counters."""
+        return "{} cached, {} parsed, {} evicted".format(
+            self.hits, self.misses, self.evicted)
+
+
+def _scandir(dir_path):
+    try:
+        with os.scandir(dir_path) as entries:
+            return list(entries)
+    except OSError:
+        return []
+
+
+def use_cache(cache):
+    """Make the persistent() functions use 'cache' (a ParseCache), or none."""
+    global _cache
+    _cache = cache
+
+
+def counts():
+    """Return the (hits, misses) of the cache in use, if any."""
+    if _cache is None:
+        return 0, 0
+    return _cache.hits, _cache.misses
+
+
+def persistent(func):
+    """
+    Decorator keeping the results of an extraction function in the parse
+    cache in use, if any. The function must take the html it extracts from
+    as its first argument, and depend on nothing else than its arguments
+    (and the extraction code and parser configuration).
+    """
+    @functools.wraps(func)
+    def wrapper(html_string, *args):
+        if _cache is None:
+            return func(html_string, *args)
+        return _cache.call(func, html_string, *args)
+    return wrapper
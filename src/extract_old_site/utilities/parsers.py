@@ -0,0 +1,87 @@
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+PARSERS = ('html5lib', 'lxml', 'html.parser')
+
+# Functions that depend on html5lib's tree building, e.g. its recovery of the
+# unclosed <p> tags in the old site, or on it always adding <html>/<body>.
+# They keep using html5lib whatever parser is configured, unless overridden
+# per function.
+HTML5LIB_FUNCTIONS = {
+    'excavation_details_page.extract_info_page',
+    'feature_descriptions.extract_descriptions',
+    'references.extract_references_page',
+    'standard_text_chapter.extract_page_content',
+    'standard_text_chapter.extract_sidebar',
+}
+
+# Parser used everywhere (None keeps each function's original parser), and
+# per function overrides, see configure()
+_parser = None
+_overrides = {}
+
+
+def configure(parser=None, overrides=None):
+    """Choose the parser used by make_soup().
+
+    Parameters
+    ----------
+    parser : str, optional
+        One of PARSERS, used by every extraction function except those in
+        HTML5LIB_FUNCTIONS. None, or "Default", keeps the parser each function
+        was written against.
+    overrides : dict, optional
+        Parser to use for specific functions, keyed by "module.function"
+        names (e.g. "standard_text_chapter.extract_sidebar"). Overrides take
+        precedence over everything else.
+    """
+    global _parser, _overrides
+    if parser == "Default":
+        parser = None
+    overrides = dict(overrides or {})
+    for name in [parser] + list(overrides.values()):
+        if name is not None:
+            check_parser(name)
+    _parser = parser
+    _overrides = overrides
+
+
+def configuration():
+    """Return the (parser, overrides) set by configure()."""
+    return _parser, dict(_overrides)
+
+
+def check_parser(parser):
+    """Raise a ValueError if 'parser' is unknown or not installed."""
+    if parser not in PARSERS:
+        raise ValueError("Unknown HTML parser '{}', expected one of: {}"
+                         .format(parser, ", ".join(PARSERS)))
+    if builder_registry.lookup(parser) is None:
+        raise ValueError("HTML parser '{}' is not installed, install it with "
+                         "'pip install {}' or choose another parser"
+                         .format(parser, parser))
+
+
+def parser_for(caller, parser):
+    """Return the parser that 'caller', written against 'parser', should use."""
+    if caller in _overrides:
+        return _overrides[caller]
+    if _parser is None or caller in HTML5LIB_FUNCTIONS:
+        return parser
+    return _parser
+
+
+def make_soup(html_string, caller, parser='html5lib'):
+    """Parse html_string with the parser configured for 'caller'.
+
+    Parameters
+    ----------
+    html_string : str
+        HTML to parse.
+    caller : str
+        "module.function" name of the extraction function doing the parsing.
+    parser : str
+        Parser the function was written against, used unless configured
+        otherwise.
+    """
+    return BeautifulSoup(html_string, parser_for(caller, parser))
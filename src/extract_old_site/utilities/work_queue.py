@@ -0,0 +1,144 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from . import file_ops, image_dimensions, parse_cache, parsers
+from .frame_cache import FrameCache
+
+# Queue used by map_files() while an extraction step runs, see use_queue()
+_queue = None
+# Fewer files than this are extracted in the calling process, since
+# starting the workers would take longer
+MIN_QUEUED_FILES = 16
+# Files are sent to the workers in about this many batches per worker, few
+# enough to keep the cost of passing them around low, and enough to even out
+# batches that take longer than others
+BATCHES_PER_JOB = 4
+
+
+class WorkQueue:
+    """
+    Bounded queue running per-file extraction work on a pool of processes.
+
+    The large extractors (excavation elements, images, artifacts, tables)
+    hand the files of their directory to map_files(), which runs the work for
+    each file in a worker and returns the results in the order the files
+    were given, so the output doesn't depend on which worker finished
+    first. Files are sent to the workers in batches of consecutive files,
+    a few per worker, and no more than max_pending batches are in flight
+    at once.
+
+    Workers read files themselves, through a FrameCache of their own, and
+    report back the paths they read and the image dimensions they probed,
+    which the step's StepRunner merges into its own records.
+
+    Attributes
+    ----------
+    jobs : int
+        Number of worker processes, started on the first map().
+    max_pending : int
+        Cap on the number of batches submitted and not yet merged.
+    paths_read : set of str
+        Resolved paths of every file the workers read, until cleared.
+    dimension_records : dict
+        Image dimension records the workers added, until cleared, see
+        DimensionCache.updated.
+    """
+
+    def __init__(self, jobs, dimension_cache_path=None, parse_cache=None,
+                 max_pending=None):
+        self.jobs = jobs
+        self.max_pending = max_pending or 2 * jobs
+        self.worker_args = (parsers.configuration(), dimension_cache_path, parse_cache)
+        self.executor = None
+        self.paths_read = set()
+        self.dimension_records = {}
+        self.files_done = 0
+        self.parse_hits = 0
+        self.parse_misses = 0
+
+    def map(self, func, items, dig_parent_dir):
+        """Return [func(item, dig_parent_dir, readfile) for item in items]."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.jobs, initializer=_init_worker,
+                initargs=self.worker_args)
+        items = list(items)
+        batch_size = max(1, len(items) // (BATCHES_PER_JOB * self.jobs))
+        results = [None] * len(items)
+        pending = {}
+        next_index = 0
+        while next_index < len(items) or pending:
+            while next_index < len(items) and len(pending) < self.max_pending:
+                batch = items[next_index:next_index + batch_size]
+                future = self.executor.submit(_run, func, batch, dig_parent_dir)
+                pending[future] = next_index
+                next_index += len(batch)
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = pending.pop(future)
+                (batch_results, paths_read, dimension_records,
+                 parse_hits, parse_misses) = future.result()
+                results[index:index + len(batch_results)] = batch_results
+                self.paths_read.update(paths_read)
+                self.dimension_records.update(dimension_records)
+                self.files_done += len(batch_results)
+                self.parse_hits += parse_hits
+                self.parse_misses += parse_misses
+        return results
+
+    def clear(self):
+        """Forget the paths read and dimensions probed so far."""
+        self.paths_read.clear()
+        self.dimension_records.clear()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def stats(self):
+        return ("{} files extracted by {} processes; "
+                "their parse cache: {} cached, {} parsed").format(
+                    self.files_done, self.jobs, self.parse_hits, self.parse_misses)
+
+
+_worker_readfile = None
+
+
+def _init_worker(parser_configuration, dimension_cache_path, cache):
+    """Set up the parser configuration and caches of a worker process."""
+    global _worker_readfile
+    parsers.configure(*parser_configuration)
+    image_dimensions.use_cache(image_dimensions.DimensionCache(dimension_cache_path))
+    parse_cache.use_cache(cache)
+    _worker_readfile = FrameCache(file_ops.readfile)
+
+
+def _run(func, batch, dig_parent_dir):
+    """Run per-file work on a batch of files in a worker process."""
+    _worker_readfile.paths_read.clear()
+    image_dimensions.refresh_cache()
+    hits, misses = parse_cache.counts()
+    results = [func(item, dig_parent_dir, _worker_readfile) for item in batch]
+    new_hits, new_misses = parse_cache.counts()
+    return (results, set(_worker_readfile.paths_read),
+            image_dimensions.take_updated_records(),
+            new_hits - hits, new_misses - misses)
+
+
+def use_queue(queue):
+    """Make map_files() use 'queue' (a WorkQueue), or none if None."""
+    global _queue
+    _queue = queue
+
+
+def map_files(func, items, dig_parent_dir, readfile):
+    """
+    Return [func(item, dig_parent_dir, readfile) for item in items], run
+    on the queue in use (whose workers use their own readfile) if any.
+
+    'func' must be a module level function, and items (usually the paths of
+    the files to extract) and results must be picklable.
+    """
+    items = list(items)
+    if _queue is None or len(items) < MIN_QUEUED_FILES:
+        return [func(item, dig_parent_dir, readfile) for item in items]
+    return _queue.map(func, items, dig_parent_dir)
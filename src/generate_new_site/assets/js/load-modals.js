@@ -1,6 +1,24 @@
+// Look up a payload written once for the whole site (in assets/modal-data)
+// by the ID a link carries instead of the payload itself
+function modalPayload(kind, id) {
+  let payloads = window.modalData ? window.modalData[kind] : undefined;
+  return payloads ? payloads[id] : undefined;
+}
+
+// Shown when a link has no payload, e.g. if its modal-data script didn't load
+const NOT_FOUND_MESSAGE = "Sorry, the contents of this link could not be found.";
+
 $(document).ready(function() {
+  // lightGallery reads figure captions from the links themselves
+  for (let anchor of document.querySelectorAll("a[data-figure-id]")) {
+    let caption = modalPayload("figures", anchor.getAttribute("data-figure-id"));
+    if (caption !== undefined && !anchor.hasAttribute("data-sub-html")) {
+      anchor.setAttribute("data-sub-html", caption);
+    }
+  }
   $("[id^=carousel-zoom]").lightGallery({ /* loop: select elements with id:"carousel-zoom" */
-    selector: 'a'
+    selector: 'a',
+    exThumbImage: 'data-exthumbimage' /* small derivatives, not the full size images */
   });
   $("[id^=archaeology-images]").lightGallery({ /* loop: select elements with id:"carousel-zoom" */
   selector: 'a'
@@ -31,7 +49,12 @@ function setUpModals() {
   }
   for (let anchor of refAnchors) {
     anchor.onclick = function(e) {
-      modalBody.innerHTML = `${anchor.getAttribute("data-author")}<br><p>${anchor.getAttribute("data-ref-text")}</p>`;
+      let reference = modalPayload("references", anchor.getAttribute("data-ref-id"));
+      if (reference) {
+        modalBody.innerHTML = `${reference.author}<br><p>${reference.text}</p>`;
+      } else {
+        modalBody.innerHTML = `<p>${NOT_FOUND_MESSAGE}</p>`;
+      }
       modalBody.classList.add('ref-modal-body');
       modalBody.classList.remove('img-modal-body');
       modalBody.classList.remove('table-modal-body');
@@ -39,8 +62,13 @@ function setUpModals() {
   }
   for (let anchor of tableAnchors) {
     anchor.onclick = function(e) {
-      modalBody.innerHTML = (`<p>${anchor.getAttribute("data-table-header")}</p>`
-                             + `<pre>${anchor.getAttribute("data-table-string")}</pre>`);
+      let table = modalPayload("tables", anchor.getAttribute("data-table-id"));
+      if (table) {
+        modalBody.innerHTML = (`<p>${table.header}</p>`
+                               + `<pre>${table.html}</pre>`);
+      } else {
+        modalBody.innerHTML = `<p>${NOT_FOUND_MESSAGE}</p>`;
+      }
       for (let tableImgAnchor of modalBody.getElementsByTagName("a")) {
         tableImgAnchor.onclick = function() {
           tableImgModalBody.innerHTML = `
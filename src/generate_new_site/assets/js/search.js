@@ -0,0 +1,209 @@
+// Full text search of the site, over the index written by
+// utilities/search_index.py: window.eotSearch.index holds the pages and the
+// stemmer's rules, and the posting lists of terms are loaded on demand from
+// the shard of their prefix.
+const MAX_SEARCH_RESULTS = 50;
+
+let searchIndex = window.eotSearch.index;
+let searchShards = window.eotSearch.shards;
+let shardLoads = {};
+let stopwords = new Set(searchIndex.stopwords);
+
+// Same as tokenize() and stem() in search_index.py
+function searchTokens(text) {
+    let words = text.normalize("NFKD").replace(/[\u0300-\u036f]/g, "")
+        .toLowerCase().match(/[a-z0-9]+/g) || [];
+    return words.filter(word => (word.length > 1 || /^[0-9]$/.test(word))
+                        && !stopwords.has(word));
+}
+
+function searchStem(word) {
+    let minLength = searchIndex.minStemLength;
+    if (word.length <= minLength || !/^[a-z]+$/.test(word)) {
+        return word;
+    }
+    for (let rules of searchIndex.stemSteps) {
+        for (let [suffix, replacement] of rules) {
+            if (word.endsWith(suffix)) {
+                if (word.length - suffix.length >= minLength) {
+                    word = word.slice(0, word.length - suffix.length) + replacement;
+                }
+                break;
+            }
+        }
+    }
+    let last = word[word.length - 1];
+    if (word.length > minLength && last === word[word.length - 2]
+            && !searchIndex.keptDoubles.includes(last)) {
+        word = word.slice(0, -1);
+    }
+    if (word.length > minLength && word.endsWith("e")) {
+        word = word.slice(0, -1);
+    }
+    return word;
+}
+
+// Same as decode_postings() in search_index.py, as a Map
+function decodePostings(encoded) {
+    let postings = new Map();
+    let number = 0;
+    for (let entry of encoded.split(",")) {
+        let [delta, count] = entry.split(":");
+        number += parseInt(delta, 36);
+        postings.set(number, count === undefined ? 1 : parseInt(count, 36));
+    }
+    return postings;
+}
+
+function loadShard(prefix) {
+    if (!(prefix in shardLoads)) {
+        shardLoads[prefix] = new Promise(function(resolve) {
+            let script = document.createElement("script");
+            script.src = searchDirectory() + searchIndex.shards[prefix];
+            script.onload = resolve;
+            script.onerror = resolve;  // Its terms then match nothing
+            document.head.appendChild(script);
+        });
+    }
+    return shardLoads[prefix];
+}
+
+function searchDirectory() {
+    return document.getElementById("search-results").getAttribute("data-search-dir");
+}
+
+// Shards holding the terms starting with 'prefix'
+function shardsFor(prefix) {
+    let length = searchIndex.prefixLength;
+    if (prefix.length >= length) {
+        let key = prefix.slice(0, length);
+        return key in searchIndex.shards ? [key] : [];
+    }
+    return Object.keys(searchIndex.shards).filter(key => key.startsWith(prefix));
+}
+
+// Whether a prefix being typed matches a term: terms it starts, and stems
+// it runs a few letters past ("excavati" for "excavat")
+function prefixMatches(prefix, term) {
+    return term.startsWith(prefix) || (prefix.startsWith(term)
+        && term.length > searchIndex.minStemLength && term.length >= prefix.length - 2);
+}
+
+// Occurrences of 'term' in each page, or of any term it matches as a prefix
+function termPostings(term, isPrefix) {
+    let postings = new Map();
+    for (let key of shardsFor(term)) {
+        let shard = searchShards[key] || {};
+        if (!isPrefix) {
+            return term in shard ? decodePostings(shard[term]) : postings;
+        }
+        for (let candidate in shard) {
+            if (prefixMatches(term, candidate)) {
+                for (let [number, count] of decodePostings(shard[candidate])) {
+                    postings.set(number, (postings.get(number) || 0) + count);
+                }
+            }
+        }
+    }
+    return postings;
+}
+
+// Pages containing every term of the query, best first. The last word is
+// taken as a prefix while it's being typed.
+async function search(query) {
+    let words = searchTokens(query);
+    let queries = words.map((word, i) => {
+        let isPrefix = i === words.length - 1 && !/\s$/.test(query);
+        // Prefixes are matched unstemmed, since they may not be whole words
+        return {term: isPrefix ? word : searchStem(word), isPrefix: isPrefix};
+    });
+    let prefixes = new Set();
+    for (let {term} of queries) {
+        shardsFor(term).forEach(key => prefixes.add(key));
+    }
+    await Promise.all(Array.from(prefixes, loadShard));
+
+    let documentCount = searchIndex.documents.length;
+    let scores = null;
+    for (let {term, isPrefix} of queries) {
+        let postings = termPostings(term, isPrefix);
+        if (isPrefix) {
+            // Whole words also match their inflections
+            let stem = searchStem(term);
+            if (stem !== term) {
+                for (let [number, count] of termPostings(stem, true)) {
+                    postings.set(number, Math.max(postings.get(number) || 0, count));
+                }
+            }
+        }
+        let idf = Math.log(1 + documentCount / Math.max(postings.size, 1));
+        let termScores = new Map();
+        for (let [number, count] of postings) {
+            if (scores === null || scores.has(number)) {
+                termScores.set(number, (scores ? scores.get(number) : 0)
+                               + (1 + Math.log(count)) * idf);
+            }
+        }
+        scores = termScores;
+    }
+    if (scores === null) {
+        return [];
+    }
+    return Array.from(scores).sort((a, b) => b[1] - a[1] || a[0] - b[0])
+        .map(([number]) => number);
+}
+
+function showResults(query, numbers, milliseconds) {
+    let results = document.getElementById("search-results");
+    let status = document.getElementById("search-status");
+    results.textContent = "";
+    if (!searchTokens(query).length) {
+        status.textContent = "";
+        return;
+    }
+    status.textContent = numbers.length + (numbers.length === 1 ? " page" : " pages")
+        + " found in " + milliseconds.toFixed(1) + " ms"
+        + (numbers.length > MAX_SEARCH_RESULTS ? ", showing the first " + MAX_SEARCH_RESULTS : "")
+        + ".";
+    for (let number of numbers.slice(0, MAX_SEARCH_RESULTS)) {
+        let [title, href, moduleNumber] = searchIndex.documents[number];
+        let [chapterName, moduleName] = searchIndex.modules[moduleNumber];
+        let item = document.createElement("li");
+        item.className = "list-group-item";
+        let link = document.createElement("a");
+        link.setAttribute("href", "../" + href);
+        link.textContent = title;
+        let place = document.createElement("small");
+        place.className = "text-muted d-block";
+        place.textContent = chapterName === moduleName ? chapterName : chapterName + " / " + moduleName;
+        item.appendChild(link);
+        item.appendChild(place);
+        results.appendChild(item);
+    }
+}
+
+function setUpSearch() {
+    let input = document.getElementById("search-input");
+    if (input === null) {
+        return;
+    }
+    let latest = 0;
+    async function update() {
+        let query = input.value;
+        let request = ++latest;
+        let start = performance.now();
+        let numbers = await search(query);
+        if (request === latest) {  // Not superseded while shards loaded
+            showResults(query, numbers, performance.now() - start);
+        }
+    }
+    input.value = new URLSearchParams(window.location.search).get("q") || "";
+    input.addEventListener("input", update);
+    document.getElementById("search-form").addEventListener("submit", function(e) {
+        e.preventDefault();
+        update();
+    });
+    update();
+}
+
+setUpSearch();
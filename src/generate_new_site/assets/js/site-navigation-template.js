@@ -0,0 +1,83 @@
+// Navigation tree of the whole site, filled in when the site is generated.
+// Chapters are [name, href, modules], modules are [long name, short name,
+// author, href, sections], and sections are [name, href, subsections], with
+// hrefs relative to the html directory, unless they're external.
+let siteNavigation = 'placeholderForJinjaGeneration';
+
+function navLink(name, href) {
+    let link = document.createElement("a");
+    if (href !== null) {
+        link.setAttribute("href", /^[a-z]+:/i.test(href) ? href : "../" + href);
+    }
+    link.textContent = name;
+    return link;
+}
+
+function navElement(tagName, className, children) {
+    let element = document.createElement(tagName);
+    if (className) {
+        element.className = className;
+    }
+    for (let child of children) {
+        element.appendChild(child);
+    }
+    return element;
+}
+
+// Same markup as templates/shared_elements/sidebar.html.jinja, with entries
+// active when their names match those of the page's chapter, module and
+// section.
+function setUpSiteNavigation() {
+    let nav = document.getElementById("toc");
+    if (nav === null || !nav.hasAttribute("data-chapter")) {
+        return;
+    }
+    let chapterName = nav.getAttribute("data-chapter");
+    let moduleName = nav.getAttribute("data-module");
+    let sectionName = nav.getAttribute("data-section");
+    let allSections = nav.hasAttribute("data-all-sections");
+
+    for (let [name, href, modules] of siteNavigation) {
+        if (name !== chapterName) {
+            nav.appendChild(navElement("div", "sidebar-chapter", [navLink(name, href)]));
+            continue;
+        }
+        let moduleList = navElement("ul", "nav", []);
+        for (let [longName, shortName, author, moduleHref, sections] of modules) {
+            if (longName !== moduleName) {
+                moduleList.appendChild(navElement(
+                    "li", "sidebar-module", [navLink(shortName, moduleHref)]));
+                continue;
+            }
+            let moduleItem = navElement(
+                "li", "sidebar-active sidebar-module", [navLink(longName, moduleHref)]);
+            if (author) {
+                let authorElement = navElement("p", null, []);
+                authorElement.id = "author";
+                authorElement.textContent = author;
+                moduleItem.appendChild(authorElement);
+            }
+            if (allSections || sections.length > 1 || name === "Archaeology Primer") {
+                let sectionList = navElement("ul", "nav", []);
+                for (let [title, sectionHref, subsections] of sections) {
+                    let sectionItem = navElement(
+                        "li", title === sectionName ? "sidebar-active sidebar-section" : "sidebar-section",
+                        [navLink(title, sectionHref)]);
+                    if (subsections.length) {
+                        sectionItem.appendChild(navElement("ul", null, subsections.map(
+                            ([subtitle, subsectionHref]) => navElement(
+                                "li", subtitle === sectionName ? "sidebar-active sidebar-subsection" : "sidebar-subsection",
+                                [navLink(subtitle, subsectionHref)]))));
+                    }
+                    sectionList.appendChild(sectionItem);
+                }
+                moduleItem.appendChild(sectionList);
+            }
+            moduleList.appendChild(moduleItem);
+        }
+        nav.appendChild(navElement(
+            "div", "sidebar-active sidebar-chapter", [navLink(name, href), moduleList]));
+    }
+};
+
+setUpSiteNavigation();
@@ -1,13 +1,23 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
 from pathlib import Path
 import json
+import time
 from . import site_data_structs
 from . import utilities
 
+# Build cache directory, relative to the output directory unless given
+CACHE_DIR_NAME = ".cache"
+
 
 def generate_site(
         dig_dir, input_dir, output_dir,
-        overwrite_out=False, copy_images=False, copy_videos=False, copy_data=True):
+        overwrite_out=False, copy_images=False, copy_videos=False, copy_data=True,
+        jobs=1, incremental=False, bundle_assets=True, image_derivatives=True,
+        optimize_images=False, hash_copies=False, cache_dir=None,
+        shared_nav=False):
 
     DIG_DIR = Path(dig_dir)
     INPUT_DIR = Path(input_dir)
@@ -23,13 +33,14 @@ def generate_site(
               .format(str(DIG_DIR)))
         return
 
-    # Terminate execution if output_dir exists and not set to overwrite
-    if OUTPUT_DIR.exists() and not overwrite_out:
+    # Terminate execution if output_dir exists and not set to overwrite or
+    # to update it incrementally
+    if OUTPUT_DIR.exists() and not (overwrite_out or incremental):
         print(("Output directory: {} already exists, and overwrite_out is "
                "set to 'False'.").format(str(OUTPUT_DIR)))
         return
 
-    OUTPUT_DIR.mkdir(parents=overwrite_out, exist_ok=overwrite_out)
+    OUTPUT_DIR.mkdir(parents=overwrite_out, exist_ok=overwrite_out or incremental)
 
     IMGS_IN = DIG_DIR / "html" / "images"
     IMGS_OUT = OUTPUT_DIR / "imgs"
@@ -40,23 +51,184 @@ def generate_site(
     ASSETS_IN = Path(__file__).parent / "assets"
     ASSETS_OUT = OUTPUT_DIR / "assets"
 
-    HTML_OUT_DIR.mkdir(parents=overwrite_out, exist_ok=overwrite_out)
+    HTML_OUT_DIR.mkdir(parents=overwrite_out, exist_ok=overwrite_out or incremental)
+
+    # Compiled templates are kept in the build cache between builds
+    CACHE_DIR = Path(cache_dir) if cache_dir is not None else OUTPUT_DIR / CACHE_DIR_NAME
+    utilities.jinja_env.use_bytecode_cache(CACHE_DIR)
 
     # Table for translation from old to new Paths
     index = site_data_structs.site.Index(INDEX_PATH)
+    # Sidebars built in the browser from one navigation file
+    if shared_nav:
+        index.add_sidebars(utilities.sidebars.SharedNavSidebars())
 
+    # Files are only copied when changed since they were last copied
     if copy_images:
-        utilities.dig_imgs.copy_images(DIG_DIR, IMGS_IN, IMGS_OUT, index)
+        sync = utilities.dig_imgs.copy_images(
+            DIG_DIR, IMGS_IN, IMGS_OUT, index, hash_copies)
+        print(sync.summary("Images"))
     else:
         utilities.dig_imgs.register_images(DIG_DIR, IMGS_IN, IMGS_OUT, index)
 
-    utilities.html_assets.copy_html_assets(ASSETS_IN, ASSETS_OUT)
+    # Losslessly shrink the copied images, converting GIFs to PNG
+    if optimize_images:
+        optimizer = utilities.image_optimizer.ImageOptimizer(IMGS_OUT)
+        optimizer.build(index.pathtable, jobs)
+        optimizer.write_report()
+        print(optimizer.summary())
+
+    # Snapshot of the registered images, used to rebuild the site tree in
+    # worker processes without touching the image directories again
+    image_paths = {old_path: entry['path']
+                   for old_path, entry in index.pathtable.path_table.items()}
+
+    # Smaller copies of the images for srcset attributes and thumbnails
+    if image_derivatives:
+        derivatives = utilities.image_derivatives.ImageDerivatives(IMGS_OUT)
+        derivatives.build(image_paths.values(), jobs)
+        index.add_image_derivatives(derivatives)
+        print(derivatives.summary())
+
+    # Otherwise only the assets the pages use are shipped, once written
+    if not bundle_assets:
+        sync = utilities.html_assets.copy_html_assets(ASSETS_IN, ASSETS_OUT, hash_copies)
+        print(sync.summary("Assets"))
 
     if copy_videos:
-        utilities.html_assets.copy_videos(DIG_DIR / "html/video", OUTPUT_DIR / "video")
+        sync = utilities.html_assets.copy_videos(
+            DIG_DIR / "html/video", OUTPUT_DIR / "video", hash_copies)
+        print(sync.summary("Videos"))
 
     if copy_data:
-        utilities.html_assets.copy_data(DIG_DIR / 'html/data/content/files', OUTPUT_DIR / 'dataForDownload')
+        sync = utilities.html_assets.copy_data(
+            DIG_DIR / 'html/data/content/files', OUTPUT_DIR / 'dataForDownload', hash_copies)
+        print(sync.summary("Data files"))
+
+    excavation_chapter = build_site(index, INPUT_DIR, HTML_OUT_DIR)
+    index.modal_data.write(ASSETS_OUT / utilities.modal_data.DIR_NAME)
+
+    # Index the pages' text for the search page, before writing rewrites it
+    search_index = utilities.search_index.SearchIndex()
+    search_index.build(index, HTML_OUT_DIR)
+    search_index.write(ASSETS_OUT / utilities.search_index.DIR_NAME, HTML_OUT_DIR)
+
+    # Only write the pages whose inputs changed since the last build
+    if incremental:
+        manifest = utilities.build_manifest.BuildManifest(
+            OUTPUT_DIR / utilities.build_manifest.MANIFEST_FILENAME)
+        fingerprints = utilities.build_manifest.page_fingerprints(index)
+        stale_paths = manifest.stale_paths(fingerprints)
+        index.mark_up_to_date(stale_paths)
+        print("Incremental build: {} of {} pages changed.".format(
+            len(stale_paths), len(fingerprints)))
+    else:
+        stale_paths = None
+
+    if jobs > 1:
+        write_site_parallel(index, jobs, image_paths, INPUT_DIR, HTML_OUT_DIR,
+                            stale_paths, CACHE_DIR, shared_nav)
+    else:
+        index.write()  # Write the site!
+    print(index.link_payloads.summary())
+    print(index.modal_data.summary())
+    print(search_index.summary())
+
+    if incremental:
+        removed = manifest.prune(fingerprints)
+        if removed:
+            print("Removed {} pages no longer in the site.".format(removed))
+        manifest.update(fingerprints)
+        manifest.write()
+
+    # Add the page-numbers-to-html-file-path dictionary to the JavaScript file
+    # enabling navigation by page num.
+    with (ASSETS_IN / "js" / "page-num-navigation-template.js").open('r') as f:
+        page_num_navigation_js = f.read()
+    page_num_nav_json = dict.copy(index.pagetable.roman_nums_to_prelim_pages)
+    page_num_nav_json.update(index.pagetable.pages)
+    page_num_nav_json.update(index.pagetable.strings_to_getting_started_pages)
+    page_num_nav_json.update(index.pagetable.strings_to_archaeology_primer_pages)
+    page_num_nav_json.update(index.pagetable.strings_to_appendix_a_pages)
+    page_num_nav_json.update(index.pagetable.strings_to_appendix_b_pages)
+    page_num_nav_json.update(index.pagetable.strings_to_data_pages)
+    for pageNum, pathValue in page_num_nav_json.items():
+        page_path = utilities.path_ops.rel_path(pathValue, HTML_OUT_DIR)
+        page_path = str(page_path.as_posix())
+        page_num_nav_json[pageNum] = page_path
+    page_num_nav_json = json.dumps(page_num_nav_json, indent=2)
+
+    page_num_navigation_js = page_num_navigation_js.replace(
+        "'placeholderForJinjaGeneration'",
+        page_num_nav_json
+    )
+
+    # Add a JavaScript file containing an href lookup table for the excavation map
+    # Set up paths and names for map links
+    elem_data = {}
+    excavation_chapter.parent.update_href(excavation_chapter.path)
+    for module in excavation_chapter.children:
+        for page in module.children:
+            elem_data[utilities.str_ops.make_str_filename_safe(page.name)] = {
+                'href': page.href,
+                'name': page.name
+            }
+
+    js_file_str = "const hrefs = {};".format(json.dumps(elem_data))
+
+    generated_js = {
+        "js/page-num-navigation.js": page_num_navigation_js,
+        "js/exc_hrefs.js": js_file_str
+    }
+
+    # Add the navigation tree the sidebars are built from
+    if shared_nav:
+        script_template = ASSETS_IN / utilities.sidebars.SHARED_NAV_SCRIPT_TEMPLATE
+        with script_template.open('r') as f:
+            site_navigation_js = f.read()
+        navigation_json = json.dumps(
+            utilities.sidebars.navigation_tree(index),
+            separators=(',', ':'))
+        generated_js[utilities.sidebars.SHARED_NAV_SCRIPT] = site_navigation_js.replace(
+            "'placeholderForJinjaGeneration'", navigation_json)
+    if bundle_assets:
+        # Bundle, prune and minify the stylesheets and scripts pages load
+        pipeline = utilities.asset_pipeline.AssetPipeline(
+            ASSETS_IN, ASSETS_OUT, generated_js,
+            kept_dirs=[utilities.modal_data.DIR_NAME,
+                       utilities.search_index.DIR_NAME])
+        pipeline.build(HTML_OUT_DIR)
+        print(pipeline.summary())
+    else:
+        for rel_path, js in generated_js.items():
+            with (ASSETS_OUT / rel_path).open('w') as f:
+                f.write(js)
+
+    return
+
+
+def build_site(index, input_dir, html_out_dir):
+    """
+    Build the site tree under 'index' from the extracted data.
+
+    Images must already be registered in index.pathtable.
+
+    Parameters
+    ----------
+    index : Index
+        Root of the site tree.
+    input_dir : Path
+        Directory containing the extracted site data.
+    html_out_dir : Path
+        Directory that will contain the new site's html files.
+
+    Returns
+    -------
+    excavation_chapter : ExcavationChapter
+        The site's excavation chapter, kept for easy access later.
+    """
+    INPUT_DIR = input_dir
+    HTML_OUT_DIR = html_out_dir
 
     DESCRIPTIONS_PATH = INPUT_DIR / "descriptions.json"
     EXCAVATIONS_PATH = INPUT_DIR / "excavationsElements.json"
@@ -118,7 +290,6 @@ def generate_site(
         dir=HTML_OUT_DIR / "background",
         index=index
     ))
-    # Save excavation chapter for easy access later
     excavation_chapter = site_data_structs.excavation.ExcavationChapter.from_json(
         exc_json_path=EXCAVATIONS_PATH,
         desc_json_path=DESCRIPTIONS_PATH,
@@ -174,49 +345,208 @@ def generate_site(
         name="Electronic Dig", parent=index,
         path=Path("https://electronicdig.sites.oasis.unc.edu/")))
 
-    index.write()  # Write the site!
+    # Payloads shared by all links to a figure, reference or table
+    index.modal_data.collect(index)
 
-    # Add the page-numbers-to-html-file-path dictionary to the JavaScript file
-    # enabling navigation by page num.
-    JS_PATH = ASSETS_OUT / "js"
-    with (JS_PATH / "page-num-navigation-template.js").open('r') as f:
-        page_num_navigation_js = f.read()
-    page_num_nav_json = dict.copy(index.pagetable.roman_nums_to_prelim_pages)
-    page_num_nav_json.update(index.pagetable.pages)
-    page_num_nav_json.update(index.pagetable.strings_to_getting_started_pages)
-    page_num_nav_json.update(index.pagetable.strings_to_archaeology_primer_pages)
-    page_num_nav_json.update(index.pagetable.strings_to_appendix_a_pages)
-    page_num_nav_json.update(index.pagetable.strings_to_appendix_b_pages)
-    page_num_nav_json.update(index.pagetable.strings_to_data_pages)
-    for pageNum, pathValue in page_num_nav_json.items():
-        page_path = utilities.path_ops.rel_path(pathValue, HTML_OUT_DIR)
-        page_path = str(page_path.as_posix())
-        page_num_nav_json[pageNum] = page_path
-    page_num_nav_json = json.dumps(page_num_nav_json, indent=2)
+    return excavation_chapter
 
-    page_num_navigation_js = page_num_navigation_js.replace(
-        "'placeholderForJinjaGeneration'",
-        page_num_nav_json
-    )
-    with (JS_PATH / "page-num-navigation.js").open('w') as f:
-        f.write(page_num_navigation_js)
 
-    # Add a JavaScript file containing an href lookup table for the excavation map
-    # Set up paths and names for map links
-    elem_data = {}
-    excavation_chapter.parent.update_href(excavation_chapter.path)
-    for module in excavation_chapter.children:
-        for page in module.children:
-            elem_data[utilities.str_ops.make_str_filename_safe(page.name)] = {
-                'href': page.href,
-                'name': page.name
-            }
+def benchmark_link_rewriting(dig_dir, input_dir, repeat=3):
+    """
+    Time the rewriting of links in every paragraph of the site, with the
+    fast path of process_content.update_links() and with html5lib only, and
+    check that both give the same output. Nothing is written.
 
-    js_file_str = "const hrefs = {};".format(json.dumps(elem_data))
-    with (JS_PATH / "exc_hrefs.js").open('w') as f:
-        f.write(js_file_str)
+    Parameters
+    ----------
+    dig_dir : str or Path
+        Directory containing the old site.
+    input_dir : str or Path
+        Directory containing the extracted site data.
+    repeat : int
+        Number of times each paragraph is rewritten by each engine.
+
+    Returns
+    -------
+    results : dict
+        Paragraphs per second for each engine ('fast', 'html5lib'), number of
+        'paragraphs', how many of them skip html5lib ('fast_paragraphs') and
+        how many give a different output with the fast path ('mismatches').
+    """
+    dig_dir = Path(dig_dir)
+    html_out_dir = Path("newdig") / "html"
+    index = site_data_structs.site.Index(html_out_dir / "index.html")
+    utilities.dig_imgs.register_images(
+        dig_dir, dig_dir / "html" / "images", html_out_dir.parent / "imgs", index)
+    build_site(index, Path(input_dir), html_out_dir)
+    paragraphs = [(content_obj['content'], page.path)
+                  for page in index.pages()
+                  for content_obj in page.paragraphs()]
+
+    results = {'paragraphs': len(paragraphs)}
+    outputs = {}
+    # Silence the warnings about missing references, printed on every run
+    with contextlib.redirect_stdout(io.StringIO()):
+        for engine, fast in [('html5lib', False), ('fast', True)]:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                # A fresh memo each time, as in a build
+                index.link_payloads = utilities.tables.LinkPayloadTable()
+                outputs[engine] = [
+                    utilities.process_content.update_text_paragraph(
+                        paragraph, index, page_path, fast)
+                    for paragraph, page_path in paragraphs
+                ]
+            seconds = time.perf_counter() - start
+            results[engine] = len(paragraphs) * repeat / seconds if seconds else 0
+    results['fast_paragraphs'] = sum(
+        utilities.html_fragments.canonical_tokens(paragraph) is not None
+        for paragraph, page_path in paragraphs)
+    results['mismatches'] = sum(
+        fast_output != html5lib_output
+        for fast_output, html5lib_output in zip(outputs['fast'], outputs['html5lib']))
+
+    print("{} paragraphs, {} rewritten without html5lib.".format(
+        results['paragraphs'], results['fast_paragraphs']))
+    print("html5lib only: {:.0f} paragraphs/s".format(results['html5lib']))
+    print("Fast path:     {:.0f} paragraphs/s".format(results['fast']))
+    if results['mismatches']:
+        print("{} paragraphs differ between the two!".format(results['mismatches']))
+    else:
+        print("Output is identical.")
+    return results
 
-    return
+
+def write_site_parallel(index, jobs, image_paths, input_dir, html_out_dir,
+                        stale_paths=None, cache_dir=None, shared_nav=False):
+    """
+    Write the site with the chapters' pages spread over 'jobs' processes.
+
+    Each worker builds its own copy of the site tree once, then writes the
+    pages it is handed from Index.write_tasks(). The output is the same as
+    that of index.write().
+
+    Parameters
+    ----------
+    index : Index
+        Root of the fully built site tree.
+    jobs : int
+        Number of worker processes.
+    image_paths : dict
+        Registered image paths, old path to new path.
+    input_dir : Path
+        Directory containing the extracted site data.
+    html_out_dir : Path
+        Directory that will contain the new site's html files.
+    stale_paths : set of Path, optional
+        For incremental builds, the paths of the pages that need writing.
+    cache_dir : Path, optional
+        Build cache directory holding the compiled templates.
+    shared_nav : bool, optional
+        Whether sidebars are built in the browser, see SharedNavSidebars.
+    """
+    # Compile the templates once here rather than once per worker
+    utilities.jinja_env.precompile()
+
+    print("Writing index.html... ", end='', flush=True)
+    index.write_index_page()
+    print("Done.")
+
+    tasks = index.write_tasks()
+    if stale_paths is not None:
+        tasks = [task for task in tasks
+                 if not all(page.up_to_date for page in index.get_page(task[1]).walk())]
+    tasks = group_write_tasks(index, tasks)
+    print("Writing {} pages using {} processes... ".format(
+        sum(len(task) for task in tasks), jobs), end='', flush=True)
+    if tasks:  # Don't start workers for an up to date incremental build
+        with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_write_worker,
+                initargs=(image_paths, input_dir, html_out_dir,
+                          stale_paths, index.image_derivatives,
+                          cache_dir, shared_nav)) as executor:
+            # Consume the results so that worker errors are raised here
+            for link_payload_counts, modal_links in executor.map(_write_pages, tasks):
+                index.link_payloads.add_counts(*link_payload_counts)
+                index.modal_data.links.update(modal_links)
+    print("Done.")
+
+    # Landing pages may overwrite module pages, so they are written last
+    for chapter in index.children:
+        chapter.write_landing_page()
+
+
+def group_write_tasks(index, tasks):
+    """
+    Group write tasks so that pages writing to the same file stay together.
+
+    Pages sharing an output file are kept in the same group, in their
+    original order, so the file ends up with the same contents as when
+    writing serially.
+
+    Parameters
+    ----------
+    index : Index
+        Root of the site tree.
+    tasks : list of tuple
+        Tasks from Index.write_tasks().
+
+    Returns
+    -------
+    groups : list of list of tuple
+    """
+    groups = []
+    group_by_path = {}
+    for task in tasks:
+        paths = []
+        pages = [index.get_page(task[1])]
+        while pages:
+            page = pages.pop()
+            paths.append(page.path)
+            pages.extend(page.children)
+
+        group = next((group_by_path[path] for path in paths
+                      if path in group_by_path), None)
+        if group is None:
+            group = []
+            groups.append(group)
+        group.append(task)
+        for path in paths:
+            group_by_path.setdefault(path, group)
+
+    return groups
+
+
+_worker_index = None
+
+
+def _init_write_worker(image_paths, input_dir, html_out_dir, stale_paths,
+                       image_derivatives, cache_dir, shared_nav):
+    """Build this worker process's copy of the site tree."""
+    global _worker_index
+    if cache_dir is not None:
+        utilities.jinja_env.use_bytecode_cache(cache_dir)
+    _worker_index = site_data_structs.site.Index(html_out_dir / "index.html")
+    if shared_nav:
+        _worker_index.add_sidebars(utilities.sidebars.SharedNavSidebars())
+    for old_path, new_path in image_paths.items():
+        _worker_index.pathtable.register(old_path, new_path)
+    _worker_index.add_image_derivatives(image_derivatives)
+    build_site(_worker_index, input_dir, html_out_dir)
+    if stale_paths is not None:
+        _worker_index.mark_up_to_date(stale_paths)
+
+
+def _write_pages(tasks):
+    """
+    Write a group of pages from group_write_tasks() in a worker, and return
+    the link payload and modal data link counters for these pages.
+    """
+    for start_path, page_key in tasks:
+        _worker_index.write_page(start_path, page_key)
+    return (_worker_index.link_payloads.take_counts(),
+            _worker_index.modal_data.take_links())
 
 
 if __name__ == '__main__':
@@ -240,12 +570,50 @@ if __name__ == '__main__':
     parser.add_argument(
         "-c", "--copy-images", action="store_true",
         help="copy images from /dig to proper location in target directory")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="number of processes used to write pages")
+    parser.add_argument(
+        "--cache-directory", type=str, default=None,
+        help="directory kept between builds for compiled templates (default: .cache in the target directory)")
+    parser.add_argument(
+        "-i", "--incremental", action="store_true",
+        help="update an existing target directory, only rewriting pages whose inputs changed")
+    parser.add_argument(
+        "--no-bundle-assets", action="store_true",
+        help="copy every asset as is, instead of bundling and minifying what pages use")
+    parser.add_argument(
+        "--hash-copies", action="store_true",
+        help="compare file contents, not just sizes and modification times, to find files that need copying")
+    parser.add_argument(
+        "--optimize-images", action="store_true",
+        help="losslessly recompress the copied JPEGs (with jpegtran, if installed) and convert GIFs to PNG")
+    parser.add_argument(
+        "--no-image-derivatives", action="store_true",
+        help="don't make smaller copies of the images for srcset attributes and thumbnails")
+    parser.add_argument(
+        "--shared-nav", action="store_true",
+        help="build sidebars in the browser from one navigation file, instead of writing them into every page")
+    parser.add_argument(
+        "--benchmark-links", action="store_true",
+        help="only time link rewriting in paragraphs, with and without html5lib")
     args = parser.parse_args()
     args = vars(args)
-    generate_site(
-        args['dig-directory'],
-        args['input-directory'],
-        args['output_directory'],
-        args['parents'],
-        args['copy_images']
-    )
+    if args['benchmark_links']:
+        benchmark_link_rewriting(args['dig-directory'], args['input-directory'])
+    else:
+        generate_site(
+            args['dig-directory'],
+            args['input-directory'],
+            args['output_directory'],
+            args['parents'],
+            args['copy_images'],
+            jobs=args['jobs'],
+            incremental=args['incremental'],
+            bundle_assets=not args['no_bundle_assets'],
+            image_derivatives=not args['no_image_derivatives'],
+            optimize_images=args['optimize_images'],
+            hash_copies=args['hash_copies'],
+            cache_dir=args['cache_directory'],
+            shared_nav=args['shared_nav']
+        )
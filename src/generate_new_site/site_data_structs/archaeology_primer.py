@@ -1,23 +1,16 @@
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from pathlib import Path
 from . import text
+from ..utilities.dig_imgs import image_href
+from ..utilities.jinja_env import get_template
 from ..utilities.path_ops import rel_path
 from ..utilities.str_ops import make_str_filename_safe, normalize_file_page_num
-from ..utilities.process_content import update_text_paragraph
+from ..utilities.process_content import update_links, update_text_paragraph
+from ..utilities.sidebars import SIDEBAR_TEMPLATE_FILENAME
 from .site import SiteChapter, SiteModule, SitePage
 import json
 
 
-TEMPLATES_DIRECTORY = str(Path(__file__).parent.parent / "templates")
 TEXT_TEMPLATE_FILENAME = "archaeology_primer.html.jinja"
 
-TEXT_TEMPLATE = Environment(
-    loader=FileSystemLoader(TEMPLATES_DIRECTORY),
-    autoescape=select_autoescape(['html', 'xml']),
-    line_statement_prefix='#', line_comment_prefix='##',
-    trim_blocks=True, lstrip_blocks=True
-).get_template(TEXT_TEMPLATE_FILENAME)
-
 
 class PrimerChapter(SiteChapter):
     """
@@ -169,7 +162,18 @@ class PrimerPage(SitePage):
                          page_num=page_num)
         self.image = image
 
+    def templates(self):
+        return [get_template(TEXT_TEMPLATE_FILENAME)]
+
+    def paragraphs(self):
+        return [content_obj for content_obj in self.content
+                if content_obj['type'] != 'ul' and 'content' in content_obj]
+
     def write(self):
+        if self.up_to_date:  # Only write children
+            super().write()
+            return
+
         prev_href = self.parent.parent.parent.pagetable.get_prev_page_path(self.page_num)
         if prev_href is not None:
             prev_href_rel = rel_path(prev_href, self.path).as_posix()
@@ -187,17 +191,18 @@ class PrimerPage(SitePage):
             'next_page_href': next_href_rel
         }
 
+        index = self.parent.parent.parent
+
         for content_obj in self.content:
             if content_obj['type'] == 'ul':
-                from bs4 import BeautifulSoup
-                soup = BeautifulSoup(content_obj['content'], 'html5lib')
                 pageToImgMap = content_obj["pageToImgMap"]
-                for a in soup.find_all('a'):
-                    image = pageToImgMap[a['href']]
-                    a['data-image-path'] = image['src'].replace('/dig/html/images/', '../../imgs/')
-                    a['data-image-caption'] = image['caption']
-                    a['href'] = 'javascript:void(0);' # del a['href']
-                content_obj['content'] = str(soup.body).replace('<body>', '').replace('</body>', '')
+
+                def update_image_link(attrs):
+                    image = pageToImgMap[attrs['href']]
+                    attrs['data-image-path'] = image_href(image['src'], index)
+                    attrs['data-image-caption'] = image['caption']
+                    attrs['href'] = 'javascript:void(0);' # del a['href']
+                content_obj['content'] = update_links(content_obj['content'], update_image_link)
             elif 'content' in content_obj:
                 content_obj['content'] = update_text_paragraph(
                     content_obj['content'],
@@ -205,24 +210,30 @@ class PrimerPage(SitePage):
                     self.path
                 )
             if 'image' in content_obj:
-                content_obj['image']['path'] = content_obj['image']['path'].replace('/dig/html/images/', '../../imgs/')
+                content_obj['image']['path'] = image_href(content_obj['image']['path'], index)
             if 'mapImg' in content_obj:
-                content_obj['mapImg'] = content_obj['mapImg'].replace('/dig/html/images/', '../../imgs/')
+                content_obj['mapImg'] = image_href(content_obj['mapImg'], index)
 
         # Update image paths
         if self.image:
-            self.image["path"] = self.image["path"].replace("/dig/html/images/", "../../imgs/")
+            self.image["path"] = image_href(self.image["path"], index)
         # TODO
 
+        sidebar_html = index.sidebars.render(
+            SIDEBAR_TEMPLATE_FILENAME, index, self.parent.parent.name,
+            self.parent.long_name, self.name)
+
         # Open using wb and encode('utf-8') to resolve encoding issues
         with self.path.open('wb') as f:
-            f.write(TEXT_TEMPLATE.render(
+            f.write(get_template(TEXT_TEMPLATE_FILENAME).render(
                 chapters=self.parent.parent.parent.children,
                 this_chapter_name=self.parent.parent.name,
                 this_module_name=self.parent.long_name,
                 this_section_name=self.name,
                 this_section=self,
-                pagination=pagination
+                pagination=pagination,
+                modal_data_scripts=self.parent.parent.parent.modal_data.scripts,
+                sidebar_html=sidebar_html
             ).encode('utf-8'))
 
         super().write()  # Write children
@@ -1,25 +1,14 @@
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from pathlib import Path
 import json
+from ..utilities.jinja_env import get_template
 from ..utilities.path_ops import rel_path
 from ..utilities.str_ops import make_str_filename_safe, normalize_file_page_num
 from ..utilities.process_content import update_text_paragraph
+from ..utilities.sidebars import COLLAPSED_SIDEBAR_TEMPLATE_FILENAME
 from .site import SiteChapter, SiteModule, SitePage
 
-TEMPLATES_DIRECTORY = str(Path(__file__).parent.parent / "templates")
 EXCAVATION_TEMPLATE_FILENAME = "excavation.html.jinja"
 EXC_ELEM_TEMPLATE_FILENAME = "exc_elem.html.jinja"
 EXC_DESC_TEMPLATE_FILENAME = "exc_elem_desc.html.jinja"
-JINJA_ENV = Environment(
-    loader=FileSystemLoader(TEMPLATES_DIRECTORY),
-    autoescape=select_autoescape(['html', 'xml']),
-    line_statement_prefix='#', line_comment_prefix='##',
-    trim_blocks=True, lstrip_blocks=True
-)
-
-EXCAVATION_TEMPLATE = JINJA_ENV.get_template(EXCAVATION_TEMPLATE_FILENAME)
-EXC_ELEM_TEMPLATE = JINJA_ENV.get_template(EXC_ELEM_TEMPLATE_FILENAME)
-EXC_DESC_TEMPLATE = JINJA_ENV.get_template(EXC_DESC_TEMPLATE_FILENAME)
 
 
 class ExcavationChapter(SiteChapter):
@@ -49,15 +38,33 @@ class ExcavationChapter(SiteChapter):
         for child in self.children:
             child.write()
 
+        self.write_landing_page()
+        print("Done.")
+
+    def write_tasks(self):
+        """
+        List (start_path, (module, page)) pairs for each page this chapter
+        writes. All pages share the chapter's directory.
+        """
+        return [(self.path, (module_num, page_num))
+                for module_num, module in enumerate(self.children)
+                for page_num in range(len(module.children))]
+
+    def write_landing_page(self):
+        """Write the excavation map page."""
+        self.parent.update_href(self.path)
+        sidebar_html = self.parent.sidebars.render(
+            COLLAPSED_SIDEBAR_TEMPLATE_FILENAME, self.parent, "Excavations",
+            None, None)
         with self.path.open('w') as f:
-            f.write(EXCAVATION_TEMPLATE.render(
+            f.write(get_template(EXCAVATION_TEMPLATE_FILENAME).render(
                 excavation_element=self,
                 chapters=self.parent.children,
                 this_chapter_name="Excavations",
                 this_module_name=None,
-                this_section_name=None
+                this_section_name=None,
+                sidebar_html=sidebar_html
             ))
-        print("Done.")
 
     # Remove once Excavation chapter has separate chapter level page
     def add_child(self, child):
@@ -114,21 +121,21 @@ class ExcavationChapter(SiteChapter):
         with desc_json_path.open() as f:
             desc_data = json.load(f)
 
-        # Get desc_data into better format
-        descriptions = [{
-            'name': desc['name'],
-            'page_num': desc['pageNum'],
-            'content': desc_data['pages'][desc['pageNum']]
-        } for desc in desc_data['module']['sections']]
+        # Get desc_data into better format, indexed by the name of the
+        # element each description is for. If several descriptions are for
+        # the same element, the last one is used.
+        descriptions = {}
+        for desc in desc_data['module']['sections']:
+            descriptions[described_element_name(desc['name'])] = {
+                'name': desc['name'],
+                'page_num': desc['pageNum'],
+                'content': desc_data['pages'][desc['pageNum']]
+            }
 
         # Parse out each element
         for element in exc_data:
             # Find description if it exists
-            description = None
-            for desc in descriptions:
-                # TODO Probably breaks
-                if desc['name'].strip(" Description") == element['name']:
-                    description = desc
+            description = descriptions.get(element['name'])
 
             info = {
                 'dimensions': {
@@ -210,6 +217,17 @@ class ExcavationChapter(SiteChapter):
         return excavations
 
 
+def described_element_name(description_name):
+    """
+    Return the name of the excavation element a description is for, e.g.
+    "Feature 4" for "Feature 4 Description".
+    """
+    name = description_name.strip()
+    if name.endswith(" Description"):
+        name = name[:-len(" Description")]
+    return name.strip()
+
+
 class ExcavationModule(SiteModule):
     """
     Object representing a module in the Excavations chapter of the EOT site.
@@ -288,6 +306,8 @@ class ExcavationPage(SitePage):
         }
     figures : list of Figure
         List of Figures, all figures linked on this elements page
+    figure_set : set of Figure
+        The same Figures, for quick membership checks
     artifacts_path : Path, optional
         Path to to this element's original artifacts html page, if it exists
     description_path : Path, optional
@@ -295,6 +315,8 @@ class ExcavationPage(SitePage):
     content : dict, optional
         Description content
     related_elements : list of RelatedElement
+    related_element_set : set of RelatedElement
+        The same RelatedElements, for quick membership checks
 
     Fluid Attributes
     -------------------
@@ -316,10 +338,12 @@ class ExcavationPage(SitePage):
         self.mini_map_orig_path = mini_map_orig_path
         self.info = info
         self.figures = []
+        self.figure_set = set()
         self.artifacts_path = artifacts_path
         self.artifacts_page = None
         self.description_path = description_path
         self.related_elements = []
+        self.related_element_set = set()
 
     def add_figure(self, figure):
         """
@@ -329,16 +353,39 @@ class ExcavationPage(SitePage):
         ----------
         figure : Figure
         """
-        if figure not in self.figures:
+        if figure not in self.figure_set:
             self.figures.append(figure)
+            self.figure_set.add(figure)
 
     def add_related_element(self, related_element):
-        if related_element not in self.related_elements:
+        if related_element not in self.related_element_set:
             self.related_elements.append(related_element)
+            self.related_element_set.add(related_element)
+
+    def templates(self):
+        if self.page_num is not None:
+            return [get_template(EXC_DESC_TEMPLATE_FILENAME)]
+        return [get_template(EXC_ELEM_TEMPLATE_FILENAME)]
+
+    def paragraphs(self):
+        if self.content:
+            # TODO: Extra content key exists here, needs to be removed
+            # earlier on in extraction/generation
+            return self.content['content']['content']
+        return []
+
+    def search_text(self):
+        return super().search_text() + [
+            "Figure {}. {}".format(figure.figure_num, figure.caption)
+            for figure in self.figures]
 
     def write(self):
+        if self.up_to_date:  # Only write children
+            super().write()
+            return
+
         if self.page_num is not None:
-            this_template = EXC_DESC_TEMPLATE
+            this_template = get_template(EXC_DESC_TEMPLATE_FILENAME)
             pagination = {
                 'prev_page_href': rel_path(
                     self.parent.parent.parent.pagetable.get_prev_page_path(
@@ -349,18 +396,20 @@ class ExcavationPage(SitePage):
                         self.page_num), self.path)  # TODO as_posix()?
             }
         else:
-            this_template = EXC_ELEM_TEMPLATE
+            this_template = get_template(EXC_ELEM_TEMPLATE_FILENAME)
             pagination = {}
 
-        if self.content:
-            # TODO: Extra content key exists here, needs to be removed
-            # earlier on in extraction/generation
-            for content_obj in self.content['content']['content']:
-                content_obj['content'] = update_text_paragraph(
-                    content_obj['content'],
-                    self.parent.parent.parent,
-                    self.path
-                )
+        for content_obj in self.paragraphs():
+            content_obj['content'] = update_text_paragraph(
+                content_obj['content'],
+                self.parent.parent.parent,
+                self.path
+            )
+
+        index = self.parent.parent.parent
+        sidebar_html = index.sidebars.render(
+            COLLAPSED_SIDEBAR_TEMPLATE_FILENAME, index, "Excavations",
+            self.parent.long_name, self.name)
 
         with self.path.open('w') as f:
             f.write(this_template.render(
@@ -369,7 +418,9 @@ class ExcavationPage(SitePage):
                 this_chapter_name="Excavations",
                 this_module_name=self.parent.long_name,
                 this_section_name=self.name,
-                pagination=pagination
+                pagination=pagination,
+                modal_data_scripts=self.parent.parent.parent.modal_data.scripts,
+                sidebar_html=sidebar_html
             ))
 
         super().write()  # Write children
@@ -101,6 +101,18 @@ class Figure:
     img_path : str
         PosixPath-like string containing the relative path to this figure's
         image file in the new site directory.
+    srcset : str
+        srcset attribute offering the image's smaller derivatives along with
+        the image itself, or None if it has no derivatives.
+    thumbnail_path : str
+        Relative path to a thumbnail of the image, or to the image itself if
+        it has no thumbnail.
+    width : int
+        Width of the image file in pixels, as measured when making its
+        derivatives, otherwise orig_width.
+    height : int
+        Height of the image file in pixels, as measured when making its
+        derivatives, otherwise orig_height.
     """
 
     def __init__(self, figure_num, caption, img_orig_path,
@@ -125,6 +137,14 @@ class Figure:
         """
         self.clickable_areas.append(clickable_area)
 
+    @property
+    def page_img_path(self):
+        """
+        Path to the figure's image from the site's pages, which are all two
+        directories below the output directory.
+        """
+        return utilities.dig_imgs.image_href(self.img_orig_path, self.parent.parent)
+
     def update_href(self, start_path):
         for area in self.clickable_areas:
             area.update_href(start_path)
@@ -136,14 +156,31 @@ class Figure:
         else:
             self.href = None
 
-        new_img_path = utilities.path_ops.rel_path(
-            self.parent.parent.pathtable.get_path(
-                self.img_orig_path), start_path)
+        img_new_path = self.parent.parent.pathtable.get_path(self.img_orig_path)
+        new_img_path = utilities.path_ops.rel_path(img_new_path, start_path)
         if new_img_path is not None:
             self.img_path = new_img_path.as_posix()
         else:
             self.img_path = None
 
+        self.srcset = None
+        self.thumbnail_path = self.img_path
+        self.width = self.orig_width
+        self.height = self.orig_height
+        derivatives = self.parent.parent.image_derivatives
+        if derivatives is None or self.img_path is None:
+            return
+        record = derivatives.get(img_new_path)
+        if record is not None:
+            imgs_href = utilities.path_ops.rel_path(
+                derivatives.imgs_dir, start_path).as_posix()
+            self.width = record['width']
+            self.height = record['height']
+            if record['sizes']:
+                self.srcset = utilities.image_derivatives.srcset(record, imgs_href)
+            if record['thumbnail'] is not None:
+                self.thumbnail_path = imgs_href + "/" + record['thumbnail'][0]
+
 
 class ClickableArea:
     """
@@ -1,18 +1,11 @@
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from ..utilities.path_ops import rel_path
-from ..utilities.tables import PathTable, PageTable
-from pathlib import Path
+from ..utilities.jinja_env import get_template
+from ..utilities.path_ops import rel_path, start_dir
+from ..utilities.modal_data import ModalData
+from ..utilities.sidebars import SidebarCache
+from ..utilities.tables import LinkPayloadTable, PathTable, PageTable
 
-TEMPLATES_DIRECTORY = str(Path(__file__).parent.parent / "templates")
 INDEX_TEMPLATE_FILENAME = "index.html.jinja"
 
-INDEX_TEMPLATE = Environment(
-    loader=FileSystemLoader(TEMPLATES_DIRECTORY),
-    autoescape=select_autoescape(['html', 'xml']),
-    line_statement_prefix='#', line_comment_prefix='##',
-    trim_blocks=True, lstrip_blocks=True
-).get_template(INDEX_TEMPLATE_FILENAME)
-
 
 class Index:
     """
@@ -32,6 +25,15 @@ class Index:
         Table allowing retrieval of a Figure by its number
     pagetable : PageTable
         Table allowing retrieval of a Page's path by its number
+    link_payloads : LinkPayloadTable
+        Memo of the attributes links to figures and tables are given
+    modal_data : ModalData
+        Figure, reference and table payloads shared by the links to them
+    image_derivatives : ImageDerivatives
+        Smaller copies of the site's images, or None if none were made
+    sidebars : SidebarCache or SharedNavSidebars
+        Renders the sidebars of pages: by default, sidebars already rendered
+        are shared by the pages of each module
 
     Fluid Attributes
     -------------------
@@ -40,6 +42,9 @@ class Index:
 
     href : str
         PosixPath-like string containing the relative path to this file
+    href_dir : Path
+        Directory that all hrefs in the tree are currently relative to, or
+        None if they have not been set (or have been invalidated).
     """
 
     def __init__(self, path):
@@ -47,14 +52,20 @@ class Index:
         self.children = []
         self.pathtable = PathTable()
         self.pagetable = PageTable()
+        self.link_payloads = LinkPayloadTable()
+        self.modal_data = ModalData()
         self.figuretable = None
         self.references = None
         self.datatables = None
+        self.image_derivatives = None
+        self.sidebars = SidebarCache()
+        self.href_dir = None
 
     def add_child(self, child):
         """Adds 'child' to this Index's list of children."""
         if child not in self.children:  # Probably just a waste of time
             self.children.append(child)
+            self.invalidate_hrefs()
 
     def add_figures(self, figures):
         """Adds the passed Figures object as an attribute."""
@@ -68,20 +79,61 @@ class Index:
         """Add a Tables object as an attribute."""
         self.datatables = tables
 
+    def add_image_derivatives(self, image_derivatives):
+        """Add an ImageDerivatives object as an attribute."""
+        self.image_derivatives = image_derivatives
+
+    def add_sidebars(self, sidebars):
+        """Replace the SidebarCache rendering pages' sidebars."""
+        self.sidebars = sidebars
+
     def write(self):
         """
         Write the files to which this object and its children correspond.
         """
         print("Writing index.html... ", end='', flush=True)
+        self.write_index_page()
+        print("Done.")
+        for child in self.children:
+            child.write()
+
+    def write_index_page(self):
+        """Write index.html itself, without any of the chapters' pages."""
         self.update_href(self.path)
-        # Write index.html
         with self.path.open('w') as f:
-            f.write(INDEX_TEMPLATE.render(
+            f.write(get_template(INDEX_TEMPLATE_FILENAME).render(
                 children=self.children
             ))
-        print("Done.")
-        for child in self.children:
-            child.write()
+
+    def write_tasks(self):
+        """
+        Split writing the chapters' pages into independent tasks.
+
+        Returns
+        -------
+        tasks : list of tuple
+            (start_path, page_key) pairs, in the order write() handles the
+            pages. 'start_path' is the location hrefs must be relative to
+            while the page is written, and 'page_key' is a tuple of
+            (chapter, module, page) indices locating the page in the tree, so
+            that an identical tree built in another process can find it.
+        """
+        tasks = []
+        for chapter_num, chapter in enumerate(self.children):
+            for start_path, page_key in chapter.write_tasks():
+                tasks.append((start_path, (chapter_num,) + page_key))
+        return tasks
+
+    def get_page(self, page_key):
+        """Return the page identified by a 'page_key' from write_tasks()."""
+        chapter_num, module_num, page_num = page_key
+        return self.children[chapter_num].children[module_num].children[page_num]
+
+    def write_page(self, start_path, page_key):
+        """Write a single page (and its subpages) from write_tasks()."""
+        self.update_href(start_path)
+        start_dir(start_path).mkdir(parents=True, exist_ok=True)
+        self.get_page(page_key).write()
 
     def update_href(self, start_path):
         """
@@ -89,12 +141,41 @@ class Index:
         Recursively sets the href attributes of this and all child objects to
         be PosixPath-like strings, relative from the starting location
         'start_path'.
+
+        Relative hrefs only depend on the directory of 'start_path', so the
+        tree is only walked again when that directory changes. Pages sharing
+        an output directory therefore share one snapshot of the hrefs.
         """
+        directory = start_dir(start_path)
+        if directory == self.href_dir:
+            return
+        self.href_dir = directory
+
         self.href = rel_path(self.path, start_path).as_posix()
 
         for child in self.children:
             child.update_href(start_path)
 
+    def invalidate_hrefs(self):
+        """Force the next update_href call to walk the whole tree again."""
+        self.href_dir = None
+        self.sidebars.clear()
+
+    def mark_up_to_date(self, stale_paths):
+        """
+        Mark every page whose path isn't in 'stale_paths' as up to date, so
+        that writing the site skips it. See utilities.build_manifest.
+        """
+        for page in self.pages():
+            page.up_to_date = page.path not in stale_paths
+
+    def pages(self):
+        """Yield every page in the site tree, subpages included, in write order."""
+        for chapter in self.children:
+            for module in chapter.children:
+                for page in module.children:
+                    yield from page.walk()
+
 
 class SiteChapter:
     """
@@ -109,6 +190,8 @@ class SiteChapter:
     parent : Index
     children : list of SiteModule
         List of all of the chapter's modules
+    child_set : set
+        The same children, for quick membership checks in add_child().
 
     Fluid Attributes
     -------------------
@@ -124,11 +207,19 @@ class SiteChapter:
         self.path = path
         self.parent = parent
         self.children = []
+        self.child_set = set()
 
     def add_child(self, child):
         """Adds 'child' to this Index's list of children."""
-        if child not in self.children:
+        if child not in self.child_set:
             self.children.append(child)
+            self.child_set.add(child)
+            self.invalidate_hrefs()
+
+    def invalidate_hrefs(self):
+        """Invalidate the Index's href snapshot, see Index.update_href."""
+        if self.parent is not None:
+            self.parent.invalidate_hrefs()
 
     def write(self):
         """
@@ -148,6 +239,22 @@ class SiteChapter:
         if self.children:
             print("Done.")
 
+    def write_tasks(self):
+        """
+        List (start_path, (module, page)) pairs for each page this chapter
+        writes, see Index.write_tasks().
+        """
+        return [(module.path, (module_num, page_num))
+                for module_num, module in enumerate(self.children)
+                for page_num in range(len(module.children))]
+
+    def write_landing_page(self):
+        """
+        Write any page belonging to the chapter itself rather than to one of
+        its modules. Must run after the modules' pages have been written.
+        """
+        return
+
     def update_href(self, start_path):
         """
         Update the href variables for this object and all children.
@@ -177,6 +284,8 @@ class SiteModule:
     parent : SiteChapter
     children : list of SitePage
         List containing this modules' child pages
+    child_set : set
+        The same children, for quick membership checks in add_child().
 
     Fluid Attributes
     -------------------
@@ -194,10 +303,18 @@ class SiteModule:
         self.path = path
         self.parent = parent
         self.children = []
+        self.child_set = set()
 
     def add_child(self, child):
-        if child not in self.children:
+        if child not in self.child_set:
             self.children.append(child)
+            self.child_set.add(child)
+            self.invalidate_hrefs()
+
+    def invalidate_hrefs(self):
+        """Invalidate the Index's href snapshot, see Index.update_href."""
+        if self.parent is not None:
+            self.parent.invalidate_hrefs()
 
     def write(self):
         for child in self.children:
@@ -234,9 +351,14 @@ class SitePage:
         can have page children, the parent of those pages is still the module.
     children : list of SitePage
         List containing any child pages of this page.
+    child_set : set
+        The same children, for quick membership checks in add_child().
     content : list of dict
         List of dictionaries containing this page's original content. Dict
         format is {'type': str, 'content': str}.
+    up_to_date : bool
+        True if an incremental build found this page's file up to date, in
+        which case write() only writes its children.
 
     Fluid Attributes
     -------------------
@@ -255,18 +377,53 @@ class SitePage:
         self.path = path
         self.parent = parent
         self.children = []
+        self.child_set = set()
         self.content = content
+        self.up_to_date = False
 
     def add_child(self, child):
-        if child not in self.children:
+        if child not in self.child_set:
             self.children.append(child)
+            self.child_set.add(child)
             child.parent = self.parent
+            self.invalidate_hrefs()
+
+    def invalidate_hrefs(self):
+        """Invalidate the Index's href snapshot, see Index.update_href."""
+        if self.parent is not None:
+            self.parent.invalidate_hrefs()
 
     def write(self):
         # Inheriting classes will extend this method to actually write pages
         for child in self.children:
             child.write()
 
+    def walk(self):
+        """Yield this page and all of its descendant pages, in write order."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def templates(self):
+        """Return the list of templates this page is rendered with."""
+        return []
+
+    def paragraphs(self):
+        """
+        Return the content objects whose 'content' goes through
+        update_text_paragraph() when this page is written.
+        """
+        return []
+
+    def search_text(self):
+        """
+        Return the html fragments of this page's text, as indexed by the
+        site's search (see utilities.search_index). Must be called before
+        the page is written, since writing rewrites its paragraphs.
+        """
+        return [content_obj['content'] for content_obj in self.paragraphs()
+                if isinstance(content_obj['content'], str)]
+
     def update_href(self, start_path):
         """
         Update the href variables for this object and all children.
@@ -27,6 +27,11 @@ class Tables:
             table_num = self.old_paths_to_table_nums[old_path]
             return self.tables[table_num]
         return None
+
+    def get_table_num_by_old_path(self, old_path):
+        if old_path in self.old_paths_to_table_nums:
+            return self.old_paths_to_table_nums[old_path]
+        return None
     
     def get_figure_num_by_html_path(self, image_html_path):
         if image_html_path in self.image_paths_to_figure_nums:
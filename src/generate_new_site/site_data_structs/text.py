@@ -1,27 +1,16 @@
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from pathlib import Path
+from ..utilities.jinja_env import get_template
 from ..utilities.path_ops import rel_path
 from ..utilities.str_ops import make_str_filename_safe, normalize_file_page_num
 from ..utilities.process_content import update_text_paragraph
+from ..utilities.sidebars import SIDEBAR_TEMPLATE_FILENAME
 from .site import SiteChapter, SiteModule, SitePage
 import json
 
 
-TEMPLATES_DIRECTORY = str(Path(__file__).parent.parent / "templates")
 TEXT_TEMPLATE_FILENAME = "textpage.html.jinja"
 APPENDIX_A_TEMPLATE_FILENAME = "appendix_a.html.jinja"
 APPENDIX_B_TEMPLATE_FILENAME = "appendix_b.html.jinja"
 
-jinja_env = Environment(
-    loader=FileSystemLoader(TEMPLATES_DIRECTORY),
-    autoescape=select_autoescape(['html', 'xml']),
-    line_statement_prefix='#', line_comment_prefix='##',
-    trim_blocks=True, lstrip_blocks=True
-)
-TEXT_TEMPLATE = jinja_env.get_template(TEXT_TEMPLATE_FILENAME)
-APPENDIX_A_TEMPLATE = jinja_env.get_template(APPENDIX_A_TEMPLATE_FILENAME)
-APPENDIX_B_TEMPLATE = jinja_env.get_template(APPENDIX_B_TEMPLATE_FILENAME)
-
 
 class TextChapter(SiteChapter):
     """
@@ -365,7 +354,7 @@ class TextChapter(SiteChapter):
                     # "parentExcElem": exc_element,
                     "parentExcPath": rel_path(exc_element.path, path).as_posix()
                 },
-                template=APPENDIX_A_TEMPLATE
+                template=APPENDIX_A_TEMPLATE_FILENAME
             )
             # exc_element.artifacts_page = this_section
             exc_element.artifacts_path = rel_path(path, index.pathtable.get_path(exc_element.path))
@@ -449,7 +438,7 @@ class TextChapter(SiteChapter):
                 content=content,
                 parent=module,
                 page_num="Appendix B " + str(int(apx_b_page["pageNum"]) + 1),
-                template=APPENDIX_B_TEMPLATE
+                template=APPENDIX_B_TEMPLATE_FILENAME
             )
 
             # Add section to path table for link resolution
@@ -551,13 +540,42 @@ class TextPage(SitePage):
         content respectively.
     """
 
-    def __init__(self, name, path, content, parent, page_num, other_info=None, template=TEXT_TEMPLATE):
+    def __init__(self, name, path, content, parent, page_num, other_info=None, template=TEXT_TEMPLATE_FILENAME):
         super().__init__(name=name, path=path, content=content, parent=parent,
                          page_num=page_num)
         self.other_info = other_info
         self.template = template
 
+    def templates(self):
+        return [get_template(self.template)]
+
+    def paragraphs(self):
+        # Only regular text pages, not Appendix A/B
+        if self.template == TEXT_TEMPLATE_FILENAME:
+            return self.content
+        return []
+
+    def search_text(self):
+        if self.template != APPENDIX_A_TEMPLATE_FILENAME:
+            return super().search_text()
+        # Appendix A lists the artifacts of each zone of an excavation element
+        text = []
+        for content_obj in self.content:
+            if content_obj['type'] != 'artifact-zone':
+                if isinstance(content_obj['content'], str):
+                    text.append(content_obj['content'])
+                continue
+            for zone in content_obj['content']:
+                text.append(zone['name'])
+                text.extend(artifact['Artifacts'] for artifact in zone['artifacts']
+                            if artifact.get('Artifacts'))
+        return text
+
     def write(self):
+        if self.up_to_date:  # Only write children
+            super().write()
+            return
+
         prev_href = self.parent.parent.parent.pagetable.get_prev_page_path(self.page_num)
         if prev_href is not None:
             prev_href_rel = rel_path(prev_href, self.path).as_posix()
@@ -575,25 +593,30 @@ class TextPage(SitePage):
             'next_page_href': next_href_rel
         }
 
-        # Only update text paragraphs for regular text pages, not Appendix A/B
-        if self.template == TEXT_TEMPLATE:
-            for content_obj in self.content:
-                content_obj['content'] = update_text_paragraph(
-                    content_obj['content'],
-                    self.parent.parent.parent,
-                    self.path
-                )
+        for content_obj in self.paragraphs():
+            content_obj['content'] = update_text_paragraph(
+                content_obj['content'],
+                self.parent.parent.parent,
+                self.path
+            )
+
+        index = self.parent.parent.parent
+        sidebar_html = index.sidebars.render(
+            SIDEBAR_TEMPLATE_FILENAME, index, self.parent.parent.name,
+            self.parent.long_name, self.name)
 
         # Open using wb and encode('utf-8') to resolve encoding issues
         with self.path.open('wb') as f:
-            f.write(self.template.render(
+            f.write(get_template(self.template).render(
                 chapters=self.parent.parent.parent.children,
                 this_chapter_name=self.parent.parent.name,
                 this_module_name=self.parent.long_name,
                 this_section_name=self.name,
                 this_section=self,
                 other_info=self.other_info,
-                pagination=pagination
+                pagination=pagination,
+                modal_data_scripts=self.parent.parent.parent.modal_data.scripts,
+                sidebar_html=sidebar_html
             ).encode('utf-8'))
 
         super().write()  # Write children
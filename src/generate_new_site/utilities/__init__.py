@@ -1,6 +1,22 @@
-__all__ = ['dig_imgs', 'path_ops', 'str_ops', 'tables', 'html_assets']
+__all__ = ['dig_imgs', 'path_ops', 'str_ops', 'tables', 'html_assets',
+           'build_manifest', 'html_fragments', 'process_content',
+           'modal_data', 'minify', 'asset_pipeline', 'image_derivatives',
+           'image_optimizer', 'file_sync', 'jinja_env',
+           'sidebars', 'search_index']
+from . import file_sync
+from . import jinja_env
+from . import sidebars
+from . import search_index
 from . import dig_imgs
 from . import tables
 from . import str_ops
 from . import path_ops
 from . import html_assets
+from . import build_manifest
+from . import html_fragments
+from . import process_content
+from . import modal_data
+from . import minify
+from . import asset_pipeline
+from . import image_derivatives
+from . import image_optimizer
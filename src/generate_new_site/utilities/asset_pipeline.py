@@ -0,0 +1,438 @@
+from urllib.parse import unquote, urlsplit
+import hashlib
+import json
+import os
+import pathlib
+import posixpath
+import re
+import shutil
+from . import minify
+
+MANIFEST_FILENAME = "assetBundles.json"
+MANIFEST_VERSION = 1
+# Asset directories whose files are bundled
+BUNDLED_DIRS = {'css', 'js'}
+# Local copies of scripts pages load from CDNs, for the class names these
+# add to pages at run time
+EXTERNAL_SCRIPTS = {
+    'bootstrap.bundle.min.js': 'js/bootstrap.min.js'
+}
+# Classes bootstrap-toc gives the links of the sidebar's table of contents,
+# which has no local copy
+SAFELIST = {'nav', 'nav-link', 'active'}
+
+# Comments are matched so that the tags they contain are skipped
+TAG_RE = re.compile(
+    r'<!--.*?-->|<link\b[^>]*>|<script\b([^>]*)>(.*?)</script\s*>', re.S | re.I)
+ATTRIBUTE_RE = re.compile(
+    r'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+NAMES_RE = re.compile(
+    r'\b(?:class|id)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|&quot;(.*?)&quot;)', re.S)
+EVENT_ATTRIBUTE_RE = re.compile(r'\bon[a-z]+\s*=\s*"([^"]*)"', re.I)
+TAG_NAME_RE = re.compile(r'<[^\s>/]*')
+ASSET_ATTRIBUTE_RE = re.compile(r'\b(?:src|href|data-src|poster)\s*=\s*"([^"]*)"')
+
+
+class AssetPipeline:
+    """
+    Asset build stage, shipping only the stylesheets, scripts and files the
+    written pages use, bundled and minified.
+
+    Pages loading the same local stylesheets and scripts (i.e. written from
+    the same template) make up a page type. The stylesheets of a page type
+    are bundled into one file, in place of the first of them, and each run
+    of its scripts that nothing else needs to run in between (scripts from
+    CDNs, inline scripts) is bundled into one file, in place of the last
+    script of the run. Stylesheet rules only matching classes or IDs found
+    neither in the type's pages nor in the strings of the scripts they load
+    are pruned.
+
+    Bundles and the files pages and bundles refer to are written to the
+    output assets directory, and everything else found there is deleted,
+    except in 'kept_dirs'. Pages can be processed again, in later
+    incremental builds: the manifest records which files each bundle was
+    made from.
+
+    Attributes
+    ----------
+    assets_in : Path
+        Directory of the site's assets.
+    assets_out : Path
+        Assets directory of the new site.
+    generated : dict
+        Text of assets generated during the build, by path relative to
+        assets_out (e.g. 'js/exc_hrefs.js').
+    kept_dirs : set of str
+        Directories of assets_out written by other stages, e.g. modal data.
+        Their scripts hold data only, so bundled scripts may move past them.
+    bundles : dict
+        Paths relative to assets_out of the files each bundle was made from,
+        by path of the bundle.
+    page_types : dict
+        Page count, bundles, and the classes, IDs and scripts found in the
+        pages, by page type.
+    """
+
+    def __init__(self, assets_in, assets_out, generated=None, kept_dirs=()):
+        self.assets_in = pathlib.Path(assets_in)
+        self.assets_out = pathlib.Path(assets_out)
+        self.generated = dict(generated or {})
+        self.kept_dirs = set(kept_dirs)
+        self.manifest_path = self.assets_out.parent / MANIFEST_FILENAME
+        self.previous_bundles = {}
+        if self.manifest_path.is_file():
+            try:
+                with self.manifest_path.open() as f:
+                    data = json.load(f)
+            except ValueError:
+                data = {}
+            if data.get('version') == MANIFEST_VERSION:
+                self.previous_bundles = data.get('bundles', {})
+        self.bundles = {}
+        self.page_types = {}
+        self.missing = set()
+        self.files = set()  # Other files to ship, relative to assets_in
+        self.bundle_sources = {}  # Bundle text by bundle path
+        self._texts = {}
+        self._stylesheets = {}
+        self._words = {}
+
+    def build(self, html_dir):
+        """Bundle the assets of every page under html_dir, and ship them."""
+        plans = {}
+        for page_path in sorted(pathlib.Path(html_dir).rglob('*.html')):
+            text = page_path.read_bytes().decode('utf-8', 'surrogateescape')
+            plan = self.plan_page(page_path, text)
+            page_type = self.page_types.setdefault(plan['key'], {
+                'pages': 0, 'names': set(SAFELIST), 'scripts': set()})
+            page_type['pages'] += 1
+            page_type['names'].update(plan['names'])
+            page_type['scripts'].update(plan['scripts'])
+            plans[page_path] = plan
+
+        for key, page_type in self.page_types.items():
+            css_sources, js_runs = key
+            is_used = self.used_names(key, page_type)
+            page_type['css'] = self.bundle_stylesheets(css_sources, is_used)
+            page_type['js'] = [self.bundle_scripts(run) for run in js_runs]
+
+        for page_path, plan in plans.items():
+            page_type = self.page_types[plan['key']]
+            text = page_path.read_bytes().decode('utf-8', 'surrogateescape')
+            new_text = rewrite_page(text, plan, page_type, page_path.parent,
+                                    self.assets_out)
+            if new_text != text:
+                page_path.write_bytes(new_text.encode('utf-8', 'surrogateescape'))
+
+        self.write()
+
+    def plan_page(self, page_path, text):
+        """
+        Find the assets a page loads, and what to replace with bundles.
+
+        Returns
+        -------
+        plan : dict
+            'key': page type, as the stylesheets and runs of scripts to bundle
+            'css': spans of the stylesheet tags to replace
+            'js': spans of the script tags to replace, for each run
+            'names': classes, IDs and words of the page's inline scripts
+            'scripts': other local scripts the page loads
+        """
+        page_dir = page_path.parent
+        stylesheets = []  # (sources, span)
+        runs = [[]]  # Lists of (sources, span)
+        names = set()
+        scripts = set()
+
+        for match in TAG_RE.finditer(text):
+            tag = match.group(0)
+            if tag.startswith('<!--'):
+                continue
+            span = match.span()
+            attrs = parse_attributes(tag[:tag.index('>') + 1])
+            if tag[:5].lower() == '<link':
+                if 'stylesheet' not in attrs.get('rel', '').lower().split():
+                    continue
+                sources = self.local_sources(attrs.get('href'), page_dir)
+                if sources and all(self.is_bundled(source) for source in sources):
+                    stylesheets.append((sources, span))
+                elif sources:
+                    self.files.update(source for source in sources
+                                      if self.source_path(source) is not None)
+            elif 'src' not in attrs:  # Inline script
+                names.update(minify.script_words(match.group(2)))
+                runs.append([])
+            else:
+                sources = self.local_sources(attrs['src'], page_dir)
+                if sources and all(self.is_bundled(source) for source in sources):
+                    runs[-1].append((sources, span))
+                elif sources:  # Modal data, or a missing file: can be moved past
+                    for source in sources:
+                        if self.text(source) is not None:
+                            scripts.add(source)
+                        if self.source_path(source) is not None:
+                            self.files.add(source)
+                else:
+                    name = posixpath.basename(urlsplit(attrs['src']).path)
+                    if name in EXTERNAL_SCRIPTS:
+                        scripts.add(EXTERNAL_SCRIPTS[name])
+                    runs.append([])
+
+        for match in NAMES_RE.finditer(text):
+            value = match.group(1) or match.group(2) or match.group(3) or ''
+            names.update(value.split())
+        for match in EVENT_ATTRIBUTE_RE.finditer(text):
+            names.update(minify.script_words(match.group(1).replace('&quot;', '"')))
+        for match in ASSET_ATTRIBUTE_RE.finditer(text):
+            if self.assets_out.name not in match.group(1):  # Quick check
+                continue
+            for source in self.local_sources(match.group(1), page_dir) or []:
+                if self.source_path(source) and not self.is_bundled(source):
+                    self.files.add(source)
+
+        # A stylesheet loaded several times is applied where it comes last
+        css_sources = []
+        for sources, span in stylesheets:
+            for source in sources:
+                if source in css_sources:
+                    css_sources.remove(source)
+                css_sources.append(source)
+        runs = [run for run in runs if run]
+        return {
+            'key': (tuple(css_sources),
+                    tuple(tuple(source for sources, span in run for source in sources)
+                          for run in runs)),
+            'css': [span for sources, span in stylesheets],
+            'js': [[span for sources, span in run] for run in runs],
+            'names': names,
+            'scripts': scripts
+        }
+
+    def local_sources(self, url, page_dir):
+        """
+        Return the paths relative to assets_out of the files a URL in a page
+        loads (several for a bundle from a previous build), or None if it
+        isn't an asset of the site.
+        """
+        if not url:
+            return None
+        parts = urlsplit(url)
+        if parts.scheme or parts.netloc or not parts.path:
+            return None
+        path = os.path.normpath(os.path.join(page_dir, unquote(parts.path)))
+        rel = pathlib.Path(os.path.relpath(path, self.assets_out)).as_posix()
+        if rel.startswith('../'):
+            return None
+        return list(self.previous_bundles.get(rel, [rel]))
+
+    def is_bundled(self, source):
+        """Whether a stylesheet or script gets bundled."""
+        return (source.split('/')[0] in BUNDLED_DIRS
+                and self.text(source) is not None)
+
+    def source_path(self, source):
+        path = self.assets_in / source
+        return path if path.is_file() else None
+
+    def text(self, source):
+        """Text of an asset, or None (counted as missing) if there's none."""
+        if source not in self._texts:
+            if source in self.generated:
+                text = self.generated[source]
+            elif self.source_path(source) is not None:
+                text = self.source_path(source).read_text(encoding='utf-8')
+            elif (source.split('/')[0] in self.kept_dirs
+                    and (self.assets_out / source).is_file()):
+                text = (self.assets_out / source).read_text(encoding='utf-8')
+            else:
+                text = None
+            self._texts[source] = text
+        if self._texts[source] is None:
+            self.missing.add(source)
+        return self._texts[source]
+
+    def used_names(self, key, page_type):
+        """
+        Return a function telling if a class or ID may be in pages of a type:
+        it's in their markup or in a string of their scripts, or starts with
+        a word of these strings ending with '-' ("bs-popover-"), from which
+        scripts build names.
+        """
+        names = set(page_type['names'])
+        words = set()
+        css_sources, js_runs = key
+        for source in set(page_type['scripts']).union(*js_runs):
+            if source not in self._words:
+                text = self.text(source)
+                self._words[source] = minify.script_words(text) if text else set()
+            words.update(self._words[source])
+        names.update(words)
+        prefixes = {word[:-1] for word in words if word.endswith('-')}
+
+        def is_used(name):
+            if name in names:
+                return True
+            return any(name[i] == '-' and name[:i] in prefixes
+                       for i in range(1, len(name)))
+
+        return is_used
+
+    def stylesheet(self, source):
+        """Parsed stylesheet, with URLs relative to the css directory."""
+        if source not in self._stylesheets:
+            source_dir = posixpath.dirname(source)
+
+            def rewrite(url):
+                parts = urlsplit(url)
+                if (parts.scheme or parts.netloc or not parts.path
+                        or parts.path.startswith('/')):
+                    return url
+                target = posixpath.normpath(posixpath.join(
+                    source_dir, unquote(parts.path)))
+                new_url = posixpath.relpath(target, 'css')
+                if parts.query:
+                    new_url += '?' + parts.query
+                if parts.fragment:
+                    new_url += '#' + parts.fragment
+                return new_url
+
+            nodes = minify.parse_css(self.text(source))
+            self._stylesheets[source] = minify.rewrite_css_urls(nodes, rewrite)
+        return self._stylesheets[source]
+
+    def bundle_stylesheets(self, sources, is_used):
+        """Return the path of the pruned bundle of stylesheets, None if none."""
+        if not sources:
+            return None
+        nodes = []
+        for source in sources:
+            nodes.extend(self.stylesheet(source))
+        nodes = minify.prune_keyframes(minify.prune_css(nodes, is_used), is_used)
+        for url in minify.css_urls(nodes):
+            parts = urlsplit(url)
+            if not (parts.scheme or parts.netloc or parts.path.startswith('/')):
+                target = posixpath.normpath(posixpath.join('css', unquote(parts.path)))
+                if self.source_path(target) is not None:
+                    self.files.add(target)
+        return self.add_bundle('css', sources, minify.serialize_css(nodes))
+
+    def bundle_scripts(self, sources):
+        """Return the path of the minified bundle of scripts."""
+        texts = []
+        for source in sources:
+            text = minify.strip_source_maps(self.text(source))
+            if '.min.' not in source:
+                text = minify.minify_js(text)
+            texts.append(text.strip())
+        # Line breaks end trailing comments, semicolons unfinished statements
+        return self.add_bundle('js', sources, '\n;\n'.join(texts) + '\n')
+
+    def add_bundle(self, kind, sources, text):
+        path = "{}/bundle.{}.{}".format(
+            kind, hashlib.sha1(text.encode('utf-8')).hexdigest()[:12], kind)
+        self.bundles[path] = list(sources)
+        self.bundle_sources[path] = text
+        return path
+
+    def write(self):
+        """
+        Write the bundles and copy the other files used, delete anything
+        else, and record the bundles in the manifest.
+        """
+        shipped = set(self.bundle_sources) | self.files
+        if self.assets_out.is_dir():
+            for path in sorted(self.assets_out.rglob('*'), reverse=True):
+                rel = path.relative_to(self.assets_out).as_posix()
+                if rel.split('/')[0] in self.kept_dirs:
+                    continue
+                if path.is_file() and rel not in shipped:
+                    path.unlink()
+                elif path.is_dir() and not any(path.iterdir()):
+                    path.rmdir()
+
+        for rel, text in self.bundle_sources.items():
+            path = self.assets_out / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(text.encode('utf-8'))
+        for rel in self.files:
+            path = self.assets_out / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(self.assets_in / rel, path)
+
+        with self.manifest_path.open('w') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'bundles': self.bundles
+            }, f, indent=1, sort_keys=True)
+
+    def bytes_shipped(self):
+        return (sum(len(text.encode('utf-8')) for text in self.bundle_sources.values())
+                + sum((self.assets_in / rel).stat().st_size for rel in self.files))
+
+    def summary(self):
+        """Sizes shipped, and what pages of each type load, before and after."""
+        lines = ["Assets: {} bundles for {} page types, {} files, {} bytes shipped "
+                 "instead of {}.".format(
+                     len(self.bundle_sources), len(self.page_types),
+                     len(self.bundle_sources) + len(self.files),
+                     self.bytes_shipped(), bytes_in(self.assets_in, self.generated))]
+        for (css_sources, js_runs), page_type in sorted(
+                self.page_types.items(), key=lambda item: -item[1]['pages']):
+            sources = list(css_sources) + [source for run in js_runs for source in run]
+            before = sum(len(self.text(source).encode('utf-8')) for source in sources)
+            bundles = ([page_type['css']] if page_type['css'] else []) + page_type['js']
+            after = sum(len(self.bundle_sources[bundle].encode('utf-8'))
+                        for bundle in bundles)
+            lines.append("  {} pages: {} files, {} bytes -> {} files, {} bytes".format(
+                page_type['pages'], len(sources), before, len(bundles), after))
+        if self.missing:
+            lines.append("Missing assets: " + ", ".join(sorted(self.missing)))
+        return "\n".join(lines)
+
+
+def rewrite_page(text, plan, page_type, page_dir, assets_out):
+    """Replace the tags of a page's bundled assets with tags of the bundles."""
+    def url(bundle):
+        return pathlib.Path(os.path.relpath(assets_out / bundle, page_dir)).as_posix()
+
+    replacements = {}  # Span start -> (span, new tag)
+    for i, span in enumerate(plan['css']):
+        replacements[span[0]] = (span, '<link rel="stylesheet" href="{}">'.format(
+            url(page_type['css'])) if i == 0 else '')
+    for spans, bundle in zip(plan['js'], page_type['js']):
+        for i, span in enumerate(spans):
+            replacements[span[0]] = (span, '<script src="{}"></script>'.format(
+                url(bundle)) if i == len(spans) - 1 else '')
+
+    pieces = []
+    pos = 0
+    for start in sorted(replacements):
+        (start, end), tag = replacements[start]
+        if not tag:  # Take the tag's line too, if it's alone on it
+            line_start = len(text[:start].rstrip(' \t'))
+            if ((line_start == 0 or text[line_start - 1] == '\n')
+                    and text[end:end + 1] == '\n' and line_start >= pos):
+                start, end = line_start, end + 1
+        pieces.append(text[pos:start])
+        pieces.append(tag)
+        pos = end
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+
+def parse_attributes(tag):
+    """Attributes of a start tag, with lowercase names."""
+    attrs = {}
+    for match in ATTRIBUTE_RE.finditer(tag, TAG_NAME_RE.match(tag).end()):
+        name = match.group(1).lower()
+        value = next((group for group in match.groups()[1:] if group is not None), '')
+        attrs.setdefault(name, value)
+    return attrs
+
+
+def bytes_in(assets_in, generated):
+    """Size of everything in assets_in and generated, as copied before."""
+    return (sum(path.stat().st_size for path in pathlib.Path(assets_in).rglob('*')
+                if path.is_file() and path.name != '.DS_Store')
+            + sum(len(text.encode('utf-8')) for text in generated.values()))
@@ -0,0 +1,228 @@
+from jinja2 import Template, meta
+import hashlib
+import json
+import os
+import pathlib
+
+MANIFEST_FILENAME = "generationManifest.json"
+MANIFEST_VERSION = 1
+
+# Attributes linking objects within the site tree, or holding relative paths
+# that change while the site is written, rather than data of their own
+SKIPPED_ATTRIBUTES = {
+    'parent', 'children', 'href', 'href_dir', 'rel_content', 'img_path',
+    'mini_map_path', 'artifacts_href', 'up_to_date', 'child_set',
+    'figure_set', 'related_element_set', 'srcset', 'thumbnail_path',
+    'width', 'height'
+}
+
+
+class BuildManifest:
+    """
+    Fingerprints of the inputs of every page written by the last build, to
+    only rewrite pages whose inputs changed since.
+
+    Attributes
+    ----------
+    path : Path
+        Location of the manifest file, at the root of the output directory.
+    pages : dict
+        Page fingerprints, keyed by the pages' paths relative to the output
+        directory.
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.pages = {}
+        if self.path.is_file():
+            try:
+                with self.path.open() as f:
+                    data = json.load(f)
+            except ValueError:
+                data = {}
+            if data.get('version') == MANIFEST_VERSION:
+                self.pages = data.get('pages', {})
+
+    def key(self, page_path):
+        return pathlib.Path(os.path.relpath(page_path, self.path.parent)).as_posix()
+
+    def stale_paths(self, fingerprints):
+        """
+        Return the set of paths from 'fingerprints' that have to be written,
+        i.e. missing files and files whose fingerprint changed.
+        """
+        return {path for path, fingerprint in fingerprints.items()
+                if self.pages.get(self.key(path)) != fingerprint
+                or not path.is_file()}
+
+    def prune(self, fingerprints):
+        """
+        Delete the files of pages from the last build that are no longer
+        part of the site, and return how many were deleted.
+        """
+        current_keys = {self.key(path) for path in fingerprints}
+        removed = 0
+        for key in self.pages:
+            file_path = self.path.parent / key
+            if key not in current_keys and file_path.is_file():
+                file_path.unlink()
+                removed += 1
+        return removed
+
+    def update(self, fingerprints):
+        """Replace the recorded fingerprints with those of the new build."""
+        self.pages = {self.key(path): fingerprint
+                      for path, fingerprint in fingerprints.items()}
+
+    def write(self):
+        with self.path.open('w') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'pages': self.pages
+            }, f, indent=1, sort_keys=True)
+
+
+def page_fingerprints(index):
+    """
+    Fingerprint the inputs of every page in the site tree.
+
+    A page's fingerprint covers its own data, the templates it renders
+    (including everything they extend or include), its pagination
+    neighbours, and what all pages share: the sidebar tree and how sidebars
+    are rendered, the tables used to resolve links, the image derivatives,
+    and the generation code itself.
+
+    Parameters
+    ----------
+    index : Index
+        Root of the fully built site tree. Must be called before any page is
+        written, as writing modifies the pages' content.
+
+    Returns
+    -------
+    fingerprints : dict
+        Fingerprint strings keyed by output file path. Pages writing to the
+        same file share a single, combined fingerprint.
+    """
+    site_fingerprint = hash_value([
+        hash_code(pathlib.Path(__file__).parent.parent),
+        site_outline(index),
+        sorted([str(old_path), str(entry['path'])]
+               for old_path, entry in index.pathtable.path_table.items()),
+        to_data(index.figuretable),
+        to_data(index.references),
+        to_data(index.datatables),
+        to_data(index.image_derivatives.records
+                if index.image_derivatives is not None else None),
+        [template_fingerprint(template) for template in index.sidebars.templates()]
+    ])
+    template_fingerprints = {}
+
+    page_hashes = {}
+    for page in index.pages():
+        page_hashes.setdefault(page.path, []).append(
+            page_fingerprint(page, site_fingerprint, template_fingerprints))
+
+    return {path: hashes[0] if len(hashes) == 1 else hash_value(hashes)
+            for path, hashes in page_hashes.items()}
+
+
+def page_fingerprint(page, site_fingerprint, template_fingerprints):
+    """Fingerprint a single page, see page_fingerprints()."""
+    pagination = None
+    if page.page_num is not None:
+        pagetable = page.parent.parent.parent.pagetable
+        pagination = [str(pagetable.get_prev_page_path(page.page_num)),
+                      str(pagetable.get_next_page_path(page.page_num))]
+
+    templates = []
+    for template in page.templates():
+        if template.name not in template_fingerprints:
+            template_fingerprints[template.name] = template_fingerprint(template)
+        templates.append(template_fingerprints[template.name])
+
+    return hash_value([site_fingerprint, templates, pagination,
+                       type(page).__name__, to_data(page)])
+
+
+def site_outline(index):
+    """Names and paths of every chapter, module and page, as in the sidebar."""
+    def page_outline(page):
+        return [page.name, str(page.path), page.page_num,
+                [page_outline(child) for child in page.children]]
+
+    return [[type(chapter).__name__, chapter.name, str(chapter.path),
+             [[module.short_name, module.long_name, module.author,
+               str(module.path),
+               [page_outline(page) for page in module.children]]
+              for module in chapter.children]]
+            for chapter in index.children]
+
+
+def template_fingerprint(template):
+    """Hash of a template's source and of all the templates it references."""
+    env = template.environment
+    sha1 = hashlib.sha1()
+    seen = set()
+    names = [template.name]
+    while names:
+        name = names.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        source = env.loader.get_source(env, name)[0]
+        sha1.update(name.encode('utf-8'))
+        sha1.update(source.encode('utf-8'))
+        for referenced in meta.find_referenced_templates(env.parse(source)):
+            if referenced is None:  # Dynamic name, depend on every template
+                names.extend(env.loader.list_templates())
+            else:
+                names.append(referenced)
+    return sha1.hexdigest()
+
+
+def to_data(value, stack=()):
+    """
+    Convert a page (or anything it holds) into JSON-serializable data.
+
+    Objects are converted to a dict of their attributes, and dicts to a
+    list of [key, value] pairs sorted by key. Site tree objects
+    referenced from elsewhere are represented by their path only, and
+    attributes in SKIPPED_ATTRIBUTES are left out.
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, pathlib.PurePath):
+        return value.as_posix()
+    if isinstance(value, Template):
+        return value.name
+    if isinstance(value, dict):
+        # Sorted, so that equal dicts give the same data whatever the order
+        # their keys were added in
+        return sorted(([str(key), to_data(item, stack)] for key, item in value.items()),
+                      key=lambda pair: pair[0])
+    if isinstance(value, (list, tuple)):
+        return [to_data(item, stack) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((to_data(item, stack) for item in value), key=str)
+    if stack and hasattr(value, 'children') and hasattr(value, 'path'):
+        return str(value.path)
+    if id(value) in stack or not hasattr(value, '__dict__'):
+        return type(value).__name__
+    stack = stack + (id(value),)
+    return {name: to_data(item, stack) for name, item in vars(value).items()
+            if name not in SKIPPED_ATTRIBUTES}
+
+
+def hash_value(value):
+    return hashlib.sha1(json.dumps(
+        value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def hash_code(package_dir):
+    """Hash of all the Python source files under package_dir."""
+    sha1 = hashlib.sha1()
+    for source_path in sorted(pathlib.Path(package_dir).rglob('*.py')):
+        sha1.update(source_path.relative_to(package_dir).as_posix().encode('utf-8'))
+        sha1.update(source_path.read_bytes())
+    return sha1.hexdigest()
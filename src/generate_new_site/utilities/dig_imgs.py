@@ -1,27 +1,40 @@
-import shutil
 from os.path import relpath
 import pathlib
+from .file_sync import FileSync
 
+IMAGE_SUFFIXES = {".jpeg", ".jpg", ".gif"}
+# Records what each copied image was copied from, as the image optimizer
+# modifies the copies in place
+SYNC_STATE_FILENAME = "copiedImages.json"
 
-def copy_images(dig_dir, imgs_in, imgs_out, index):
+
+def copy_images(dig_dir, imgs_in, imgs_out, index, use_hash=False):
+    """
+    Copy the images in the subdirectories of 'imgs_in' to the same
+    subdirectories of 'imgs_out', unless already copied from the same
+    source, and register their new paths.
+
+    Returns
+    -------
+    sync : FileSync
+        The copying's outcome.
+    """
+    pairs = []
     # Iterate through subdirectories
     for img_dir in imgs_in.iterdir():
         if img_dir.is_dir():
-            # Make copy of subdirectory in output img directory
-            new_dir = imgs_out / img_dir.name
-            new_dir.mkdir(parents=True, exist_ok=True)
             # Iterate through images
             for img in img_dir.iterdir():
-                if img.suffix in {".jpeg", ".jpg", ".gif"}:
-                    # Make copy of image in new subdirectory
-                    new_img = new_dir / img.name
-                    if not new_img.exists():
-                        shutil.copy(img, new_img)
+                if img.suffix in IMAGE_SUFFIXES:
+                    new_img = imgs_out / img_dir.name / img.name
+                    pairs.append((img, new_img))
                     # Register the new path in the path table
                     img = pathlib.Path('/') / relpath(img, dig_dir.parent)
                     index.pathtable.register(img, new_img)
 
-    return
+    sync = FileSync(state_path=imgs_out / SYNC_STATE_FILENAME, use_hash=use_hash)
+    sync.sync(pairs)
+    return sync
 
 
 def register_images(dig_dir, imgs_in, imgs_out, index):
@@ -40,3 +53,18 @@ def register_images(dig_dir, imgs_in, imgs_out, index):
             img = pathlib.Path('/') / relpath(img, dig_dir.parent)
             index.pathtable.register(img, new_img)
     return
+
+
+def image_href(old_path, index):
+    """
+    Path to an image from the site's pages, which are all two directories
+    below the output directory. Registered images are looked up in the path
+    table, which follows images converted to another format when copied.
+    """
+    registered_path = pathlib.Path('/') / old_path
+    if registered_path in index.pathtable.path_table:
+        new_path = index.pathtable.get_path(registered_path)
+        return '../../' + pathlib.Path(
+            relpath(new_path, index.path.parent.parent)).as_posix()
+    return pathlib.PurePath(old_path).as_posix().replace(
+        '/dig/html/images/', '../../imgs/')
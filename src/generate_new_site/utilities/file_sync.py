@@ -0,0 +1,255 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_THREADS = 8
+IGNORED_NAMES = {'.DS_Store'}
+# Linux ioctl making the destination share the source's blocks (a reflink)
+FICLONE = 0x40049409
+
+
+class FileSync:
+    """
+    Copies files into the output directory, skipping those already up to
+    date, in a thread pool.
+
+    A copy keeps its source's modification time, and is up to date when
+    its size and modification time match the source's, or optionally when
+    their contents hash the same.
+
+    When later stages modify or replace the copies (like the image
+    optimizer), a state file instead records the source every copy was
+    made from, and a file is only copied again once its source changes.
+    Deleting the state file makes every file be copied again.
+
+    Attributes
+    ----------
+    state_path : Path
+        File recording the sources of the copies, or None to compare copies
+        with their sources.
+    use_hash : bool
+        Compare the contents of files whose size matches but modification
+        time doesn't, instead of copying them.
+    hardlink : bool
+        Hard link copies to their sources where possible. Only for copies
+        that nothing modifies in place, since they share their source's
+        data.
+    threads : int
+        Number of files copied at once.
+    copied : list of Path
+        Destinations copied so far.
+    up_to_date : int
+        Number of files skipped so far.
+    bytes_copied : int
+    methods : Counter
+        Number of files copied by each method: 'hardlink', 'reflink',
+        'copy_file_range' or 'copy'.
+    """
+
+    def __init__(self, state_path=None, use_hash=False, hardlink=False,
+                 threads=DEFAULT_THREADS):
+        self.state_path = state_path
+        self.use_hash = use_hash
+        self.hardlink = hardlink
+        self.threads = threads
+        self.copied = []
+        self.up_to_date = 0
+        self.bytes_copied = 0
+        self.methods = Counter()
+
+    def sync(self, pairs):
+        """
+        Copy each (source, destination) pair that isn't up to date.
+
+        Returns
+        -------
+        copied : list of Path
+            The destinations that were copied.
+        """
+        state = self.read_state()
+        new_state = {}
+        tasks = []
+        for source, destination in pairs:
+            source, destination = pathlib.Path(source), pathlib.Path(destination)
+            source_stat = source.stat()
+            signature = [source_stat.st_size, source_stat.st_mtime_ns]
+            if self.state_path is not None:
+                key = os.path.relpath(destination, self.state_path.parent)
+                key = pathlib.Path(key).as_posix()
+                new_state[key] = self.source_state(source, signature, state.get(key))
+                # Unchanged sources keep their previous state
+                up_to_date = new_state[key] is state.get(key)
+            else:
+                up_to_date = self.is_copy(source, signature, destination)
+            if up_to_date:
+                self.up_to_date += 1
+            else:
+                tasks.append((source, destination, source_stat.st_size))
+
+        for directory in {destination.parent for _, destination, _ in tasks}:
+            directory.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            methods = list(executor.map(
+                lambda task: copy_file(task[0], task[1], self.hardlink), tasks))
+        self.methods.update(methods)
+        copied = [destination for _, destination, _ in tasks]
+        self.copied.extend(copied)
+        self.bytes_copied += sum(size for _, _, size in tasks)
+
+        if self.state_path is not None:
+            self.write_state(new_state)
+        return copied
+
+    def source_state(self, source, signature, previous):
+        """
+        State to record for a source: its size and modification time, and
+        its hash if hashes are compared. Sources that haven't changed since
+        their 'previous' state keep it (with its signature updated, if only
+        the hash matches).
+        """
+        if previous is not None and previous[:2] == signature:
+            return previous
+        if not self.use_hash:
+            return signature
+        source_hash = file_hash(source)
+        if previous is not None and previous[2:] == [source_hash]:
+            previous[:2] = signature
+            return previous
+        return signature + [source_hash]
+
+    def is_copy(self, source, signature, destination):
+        """Whether 'destination' is an up to date copy of 'source'."""
+        try:
+            stat = destination.stat()
+        except OSError:
+            return False
+        if [stat.st_size, stat.st_mtime_ns] == signature:
+            return True
+        if (self.use_hash and stat.st_size == signature[0]
+                and file_hash(source) == file_hash(destination)):
+            # Same contents, so don't compare them again next time
+            shutil.copystat(source, destination)
+            return True
+        return False
+
+    def read_state(self):
+        if self.state_path is None:
+            return {}
+        try:
+            with self.state_path.open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_state(self, state):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.state_path.open('w') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+
+    def summary(self, name):
+        methods = ", ".join("{} by {}".format(count, method)
+                            for method, count in sorted(self.methods.items()))
+        return "{}: {} files copied ({} KB{}), {} up to date.".format(
+            name, len(self.copied), self.bytes_copied // 1024,
+            "; " + methods if methods else "", self.up_to_date)
+
+
+def tree_pairs(dir_in, dir_out, suffixes=None):
+    """
+    (source, destination) pairs copying every file under 'dir_in' to the
+    same place under 'dir_out', optionally only files with the given
+    suffixes.
+    """
+    dir_in, dir_out = pathlib.Path(dir_in), pathlib.Path(dir_out)
+    pairs = []
+    directories = [dir_in]
+    while directories:
+        directory = directories.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name in IGNORED_NAMES:
+                    continue
+                if entry.is_dir():
+                    directories.append(pathlib.Path(entry.path))
+                elif suffixes is None or os.path.splitext(entry.name)[1] in suffixes:
+                    source = pathlib.Path(entry.path)
+                    pairs.append((source, dir_out / source.relative_to(dir_in)))
+    return sorted(pairs)
+
+
+def copy_file(source, destination, hardlink=False):
+    """
+    Copy 'source' to 'destination', along with its modification time.
+    Whatever was at 'destination' is replaced rather than written to, in
+    case it is a hard link to the source.
+
+    Returns
+    -------
+    method : str
+        How the file was copied: by 'hardlink', 'reflink',
+        'copy_file_range' (within the kernel), or a plain 'copy'.
+    """
+    if os.path.lexists(destination):
+        os.unlink(destination)
+    if hardlink:
+        try:
+            os.link(source, destination)
+            return 'hardlink'
+        except OSError:  # Different file systems, or no hard links
+            pass
+
+    with open(source, 'rb') as source_file, open(destination, 'wb') as destination_file:
+        method = (clone_file(source_file, destination_file)
+                  or copy_file_range(source_file, destination_file))
+        if method is None:
+            source_file.seek(0)
+            destination_file.seek(0)
+            destination_file.truncate()
+            shutil.copyfileobj(source_file, destination_file, 1 << 20)
+            method = 'copy'
+    shutil.copystat(source, destination)
+    return method
+
+
+def clone_file(source_file, destination_file):
+    if fcntl is None:
+        return None
+    try:
+        fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    except OSError:  # Not supported, or different file systems
+        return None
+    return 'reflink'
+
+
+def copy_file_range(source_file, destination_file):
+    if not hasattr(os, 'copy_file_range'):  # Linux, Python 3.8+
+        return None
+    remaining = os.fstat(source_file.fileno()).st_size
+    try:
+        while remaining > 0:
+            copied = os.copy_file_range(
+                source_file.fileno(), destination_file.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    except OSError:
+        return None
+    return 'copy_file_range' if remaining == 0 else None
+
+
+def file_hash(path):
+    """SHA-1 of a file's contents, read in chunks."""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
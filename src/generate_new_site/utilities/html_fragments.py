@@ -0,0 +1,247 @@
+from bs4 import BeautifulSoup
+from bs4.formatter import HTMLFormatter
+from functools import lru_cache
+import re
+
+# Formatter and tree builder settings str(soup) uses for an html5lib soup
+FORMATTER = HTMLFormatter.REGISTRY['minimal']
+# What FORMATTER.substitute() does with text outside <script> and <style>
+ESCAPE = FORMATTER.entity_substitution or str
+_BUILDER = BeautifulSoup('', 'html5lib').builder
+VOID_ELEMENTS = frozenset(_BUILDER.empty_element_tags)
+LIST_ATTRIBUTES = _BUILDER.cdata_list_attributes
+
+WHITESPACE = ' \t\n\x0c\r'
+# Characters html5lib replaces or normalizes, or that are best left to it
+UNSAFE_CHARACTERS_RE = re.compile('[\x00-\x08\x0b\r\x0e-\x1f\x7f]')
+NONWHITESPACE_RE = re.compile(r'\S+')
+ENTITY_RE = re.compile('&(amp|lt|gt|quot);')
+ENTITIES = {'amp': '&', 'lt': '<', 'gt': '>', 'quot': '"'}
+
+# A start tag with lowercase names and quoted values, an end tag, or text
+TOKEN_RE = re.compile(
+    r'<([a-z][a-z0-9]*)((?: [a-z][a-z0-9_.-]*=(?:"[^"]*"|\'[^\']*\'))*)/?>'
+    r'|</([a-z][a-z0-9]*)>'
+    r'|[^<]+'
+)
+ATTRIBUTE_RE = re.compile(r' ([a-z][a-z0-9_.-]*)=(?:"([^"]*)"|\'([^\']*)\')')
+
+# Elements html5lib puts in the tree exactly where they appear, as long as
+# the rules in can_open() hold. Anything else (forms, lists of definitions,
+# <pre>, scripts, foreign content...) is left to html5lib.
+INLINE_ELEMENTS = {
+    'a', 'abbr', 'acronym', 'b', 'big', 'br', 'cite', 'code', 'del', 'dfn',
+    'em', 'font', 'i', 'img', 'ins', 'kbd', 'q', 's', 'samp', 'small',
+    'span', 'strike', 'strong', 'sub', 'sup', 'tt', 'u', 'var', 'wbr'
+}
+HEADINGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+# Elements closing an open <p>
+BLOCK_ELEMENTS = {
+    'address', 'blockquote', 'center', 'div', 'hr', 'li', 'ol', 'p', 'table',
+    'ul'
+} | HEADINGS
+# Children allowed in table elements, which can't hold anything else
+TABLE_CHILDREN = {
+    'table': {'caption', 'colgroup', 'tbody', 'tfoot', 'thead'},
+    'tbody': {'tr'},
+    'thead': {'tr'},
+    'tfoot': {'tr'},
+    'tr': {'td', 'th'},
+    'colgroup': {'col'}
+}
+TABLE_ELEMENTS = {'caption', 'col', 'td', 'th'} | set(TABLE_CHILDREN)
+# Elements ending the scope html5lib searches for an open <p> or <li>
+SCOPE_BOUNDARIES = {'caption', 'table', 'td', 'th'}
+LIST_ITEM_BOUNDARIES = (
+    (BLOCK_ELEMENTS | TABLE_ELEMENTS) - {'address', 'div', 'p'}
+)
+
+
+def rewrite_anchors(fragment, rewrite):
+    """
+    Rewrite the <a> tags of an HTML fragment without building a soup.
+
+    Parameters
+    ----------
+    fragment : str
+        HTML fragment, e.g. a paragraph of a text page.
+    rewrite : function
+        Called with the attribute dict of each <a> tag, in document order,
+        and modifying it in place like it would a Tag's attrs.
+
+    Returns
+    -------
+    new_fragment : str or None
+        The fragment exactly as str(soup.body) (minus the <body> tags) of
+        an html5lib soup with the same changes would be, or None if the
+        fragment isn't already in the form BeautifulSoup writes markup in,
+        in which case rewrite() was not called and the fragment has to go
+        through BeautifulSoup instead.
+    """
+    tokens = canonical_tokens(fragment)
+    if tokens is None:
+        return None
+    pieces = []
+    for raw, anchor_attrs in tokens:
+        if anchor_attrs is None:
+            pieces.append(raw)
+        else:
+            rewrite(anchor_attrs)
+            pieces.append(start_tag('a', anchor_attrs))
+    return ''.join(pieces)
+
+
+def canonical_tokens(fragment):
+    """
+    Split an HTML fragment into tokens, if parsing it with html5lib and
+    serializing it with BeautifulSoup would give back the exact same string.
+
+    This holds for markup previously written by BeautifulSoup, as long as
+    html5lib doesn't need to move, close or open elements to build its tree.
+    To stay on the safe side, anything unusual makes the fragment rejected.
+
+    Returns
+    -------
+    tokens : list of tuple or None
+        (raw token string, attributes) pairs, with attributes a dict for
+        <a> start tags and None for other tokens. None if the fragment isn't
+        in canonical form.
+    """
+    if fragment[:1] and fragment[0] in WHITESPACE:  # Dropped by html5lib
+        return None
+    if UNSAFE_CHARACTERS_RE.search(fragment):
+        return None
+
+    tokens = []
+    open_elements = []
+    pos = 0
+    while pos < len(fragment):
+        match = TOKEN_RE.match(fragment, pos)
+        if match is None:  # Comment, doctype, unquoted attribute...
+            return None
+        raw = match.group(0)
+        pos = match.end()
+        name, attr_string, end_name = match.groups()
+        if name is not None:
+            attrs = canonical_attributes(raw, name, attr_string)
+            if attrs is None or not can_open(name, open_elements):
+                return None
+            if name not in VOID_ELEMENTS:
+                open_elements.append(name)
+            if name == 'a':  # Fresh copy for rewrite() to modify
+                attrs = {key: list(value) if isinstance(value, list) else value
+                         for key, value in attrs.items()}
+                tokens.append((raw, attrs))
+            else:
+                tokens.append((raw, None))
+        elif end_name is not None:
+            # Only explicitly closing the current element keeps html5lib
+            # from reconstructing or implicitly closing anything
+            if not open_elements or open_elements.pop() != end_name:
+                return None
+            tokens.append((raw, None))
+        else:
+            if (open_elements and open_elements[-1] in TABLE_CHILDREN
+                    and raw.strip(WHITESPACE)):  # Would be moved out of the table
+                return None
+            if ('&' in raw or '>' in raw) and ESCAPE(unescape(raw)) != raw:
+                return None
+            tokens.append((raw, None))
+
+    if open_elements:
+        return None
+    return tokens
+
+
+def can_open(name, open_elements):
+    """
+    Return True if html5lib would insert a 'name' start tag as a child of
+    the current element, without closing or moving anything.
+    """
+    current = open_elements[-1] if open_elements else None
+    if current in TABLE_CHILDREN:
+        return name in TABLE_CHILDREN[current]
+    if name in TABLE_ELEMENTS and name != 'table':
+        return False
+    if name == 'a' and 'a' in open_elements:
+        return False
+    if name in HEADINGS and current in HEADINGS:
+        return False
+    if name in BLOCK_ELEMENTS:
+        for element in reversed(open_elements):
+            if element == 'p':
+                return False
+            if element in SCOPE_BOUNDARIES:
+                break
+    if name == 'li':
+        for element in reversed(open_elements):
+            if element == 'li':
+                return False
+            if element in LIST_ITEM_BOUNDARIES:
+                break
+    return name in INLINE_ELEMENTS or name in BLOCK_ELEMENTS
+
+
+@lru_cache(maxsize=None)
+def canonical_attributes(raw, name, attr_string):
+    """
+    Return the attributes of start tag 'raw' if it is written exactly as
+    BeautifulSoup would write it, None otherwise. Memoized, as the same tags
+    appear all over the site: the result must not be modified.
+    """
+    attrs = parse_attributes(name, attr_string)
+    if attrs is None or start_tag(name, attrs) != raw:
+        return None
+    return attrs
+
+
+def parse_attributes(name, attr_string):
+    """
+    Parse the attributes of a start tag into a dict like the Tag's attrs,
+    or return None if an attribute is repeated.
+    """
+    attrs = {}
+    list_attributes = (LIST_ATTRIBUTES.get('*', set())
+                       | LIST_ATTRIBUTES.get(name, set()))
+    for match in ATTRIBUTE_RE.finditer(attr_string):
+        key = match.group(1)
+        if key in attrs:
+            return None
+        value = match.group(2)
+        if value is None:
+            value = match.group(3)
+        value = unescape(value)
+        if key in list_attributes:
+            value = NONWHITESPACE_RE.findall(value)
+        attrs[key] = value
+    return attrs
+
+
+def start_tag(name, attrs):
+    """Serialize a start tag the way BeautifulSoup's Tag.decode() does."""
+    pieces = ['<', name]
+    for key, value in FORMATTER.attributes(_Attributes(attrs)):
+        pieces.append(' ')
+        pieces.append(key)
+        if value is not None:
+            if isinstance(value, (list, tuple)):
+                value = ' '.join(value)
+            elif not isinstance(value, str):
+                value = str(value)
+            pieces.append('=')
+            pieces.append(FORMATTER.quoted_attribute_value(ESCAPE(value)))
+    if name in VOID_ELEMENTS:
+        pieces.append(FORMATTER.void_element_close_prefix or '')
+    pieces.append('>')
+    return ''.join(pieces)
+
+
+def unescape(string):
+    return ENTITY_RE.sub(lambda match: ENTITIES[match.group(1)], string)
+
+
+class _Attributes:
+    """Stand-in for a Tag, for Formatter.attributes()."""
+
+    def __init__(self, attrs):
+        self.attrs = attrs
@@ -0,0 +1,247 @@
+from concurrent.futures import ProcessPoolExecutor
+import json
+import pathlib
+from PIL import Image
+from .file_sync import file_hash
+
+DIR_NAME = "responsive"
+MANIFEST_FILENAME = "derivatives.json"
+IMAGE_SUFFIXES = {".jpeg", ".jpg", ".gif", ".png"}
+
+# Widths derivatives are made at, when narrower than the original image
+WIDTHS = (160, 320, 640)
+# Bounding box of the thumbnails shown in lightGallery's thumbnail strip
+THUMBNAIL_SIZE = (120, 120)
+JPEG_QUALITY = 85
+
+# Anything changing the derivatives made from the same image
+SETTINGS = {
+    'version': 1,
+    'widths': list(WIDTHS),
+    'thumbnail': list(THUMBNAIL_SIZE),
+    'jpeg_quality': JPEG_QUALITY
+}
+
+
+class ImageDerivatives:
+    """
+    Smaller copies of the site's images, for srcset attributes and gallery
+    thumbnails, so that pages don't load full size originals for them.
+
+    Derivatives are written to their own directory under the output image
+    directory, mirroring its subdirectories. A manifest there records the
+    hash of the image every derivative was made from, and derivatives of
+    images that haven't changed since are not made again.
+
+    Attributes
+    ----------
+    imgs_dir : Path
+        Output image directory, that the originals were copied to.
+    records : dict
+        Record of each image's dimensions and derivatives, keyed by the
+        image's path relative to imgs_dir. Derivative paths are relative to
+        imgs_dir as well.
+    made : int
+        Number of images whose derivatives were made by the last build().
+    """
+
+    def __init__(self, imgs_dir):
+        self.imgs_dir = pathlib.Path(imgs_dir)
+        self.records = {}
+        self.made = 0
+
+    @property
+    def manifest_path(self):
+        return self.imgs_dir / DIR_NAME / MANIFEST_FILENAME
+
+    def build(self, image_paths, jobs=1):
+        """
+        Make the derivatives of the images at 'image_paths', in 'jobs'
+        processes. Images not under imgs_dir, or not on disk, are left out.
+        """
+        previous = self.read_manifest()
+        tasks = []
+        for image_path in sorted(set(image_paths)):
+            image_path = pathlib.Path(image_path)
+            if image_path.suffix.lower() not in IMAGE_SUFFIXES:
+                continue
+            try:
+                key = image_path.relative_to(self.imgs_dir).as_posix()
+            except ValueError:
+                continue
+            if not image_path.is_file():
+                continue
+            source_hash = file_hash(image_path)
+            record = previous.get(key)
+            if (record is not None and record['hash'] == source_hash
+                    and all((self.imgs_dir / path).is_file()
+                            for path in derivative_paths(record))):
+                self.records[key] = record
+            else:
+                tasks.append((str(image_path), key, source_hash))
+
+        if jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                made = list(executor.map(
+                    _make_derivatives, [(self.imgs_dir, task) for task in tasks],
+                    chunksize=max(1, len(tasks) // (4 * jobs))))
+        else:
+            made = [_make_derivatives((self.imgs_dir, task)) for task in tasks]
+        for key, record in made:
+            if record is not None:
+                self.records[key] = record
+        # In the same order whether records were made or read back from the
+        # manifest, down to their keys, see build_manifest.page_fingerprints()
+        self.records = {key: dict(sorted(self.records[key].items()))
+                        for key in sorted(self.records)}
+        self.made = len(made)
+
+        self.remove_unused(previous)
+        self.write_manifest()
+
+    def read_manifest(self):
+        """Records of the last build, if it used the same settings."""
+        try:
+            with self.manifest_path.open() as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('settings') != SETTINGS:
+            return {}
+        return manifest.get('images', {})
+
+    def write_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.manifest_path.open('w') as f:
+            json.dump({'settings': SETTINGS, 'images': self.records}, f,
+                      indent=1, sort_keys=True)
+
+    def remove_unused(self, previous):
+        """Delete derivatives from previous builds no record refers to."""
+        used = {path for record in self.records.values()
+                for path in derivative_paths(record)}
+        for record in previous.values():
+            for path in derivative_paths(record):
+                if path not in used and (self.imgs_dir / path).is_file():
+                    (self.imgs_dir / path).unlink()
+
+    def get(self, image_path):
+        """Record of the image at 'image_path', or None."""
+        try:
+            key = pathlib.Path(image_path).relative_to(self.imgs_dir).as_posix()
+        except ValueError:
+            return None
+        return self.records.get(key)
+
+    def summary(self):
+        original_bytes = derivative_bytes = 0
+        for record in self.records.values():
+            original_bytes += record['bytes']
+            derivative_bytes += sum(size[3] for size in record['sizes'])
+            if record['thumbnail'] is not None:
+                derivative_bytes += record['thumbnail'][3]
+        return ("Image derivatives: {} images, {} made this build, "
+                "{} KB of derivatives for {} KB of originals.").format(
+                    len(self.records), self.made,
+                    derivative_bytes // 1024, original_bytes // 1024)
+
+
+def derivative_paths(record):
+    paths = [size[0] for size in record['sizes']]
+    if record['thumbnail'] is not None:
+        paths.append(record['thumbnail'][0])
+    return paths
+
+
+def srcset(record, rel_dir):
+    """
+    srcset attribute value for an image's derivatives, followed by the
+    original image itself, with paths relative to 'rel_dir', the image
+    directory's path relative to the page.
+    """
+    candidates = [(path, width) for path, width, height, size in record['sizes']]
+    candidates.append((record['path'], record['width']))
+    return ", ".join("{}/{} {}w".format(rel_dir, path, width)
+                     for path, width in candidates)
+
+
+def _make_derivatives(args):
+    """
+    Make the derivatives of a single image. Module level, so that it can
+    run in a worker process.
+
+    Returns
+    -------
+    key : str
+        The image's path relative to the image directory.
+    record : dict
+        The image's record, or None if it can't be read.
+    """
+    imgs_dir, (image_path, key, source_hash) = args
+    image_path = pathlib.Path(image_path)
+    try:
+        image = Image.open(image_path)
+        image.load()
+    except OSError:
+        print("Failed to read image " + str(image_path))
+        return key, None
+
+    width, height = image.size
+    original_bytes = image_path.stat().st_size
+    record = {
+        'path': key,
+        'hash': source_hash,
+        'width': width,
+        'height': height,
+        'bytes': original_bytes,
+        'sizes': [],
+        'thumbnail': None
+    }
+    # Animated or transparent images would lose frames or transparency
+    if (getattr(image, 'is_animated', False) or 'transparency' in image.info
+            or image.mode in ('RGBA', 'LA')):
+        return key, record
+
+    stem = pathlib.PurePosixPath(DIR_NAME) / pathlib.PurePosixPath(key).with_suffix('')
+    suffix = image_path.suffix.lower()
+    for new_width in WIDTHS:
+        if new_width >= width:
+            break
+        new_height = max(1, round(height * new_width / width))
+        resized = resize(image, (new_width, new_height))
+        path = "{}-{}w{}".format(stem, new_width, suffix)
+        size = save(resized, imgs_dir / path, image.format)
+        # Only worth offering in srcset if smaller than the original
+        if size < original_bytes:
+            record['sizes'].append([path, new_width, new_height, size])
+        else:
+            (imgs_dir / path).unlink()
+
+    thumbnail = image.convert('RGB')
+    thumbnail.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+    if thumbnail.size != image.size:
+        path = "{}-thumb{}".format(stem, suffix)
+        size = save(thumbnail, imgs_dir / path, image.format)
+        if size < original_bytes:
+            record['thumbnail'] = [path, thumbnail.width, thumbnail.height, size]
+        else:
+            (imgs_dir / path).unlink()
+    return key, record
+
+
+def resize(image, size):
+    """Resize in RGB (or greyscale), not in the image's palette."""
+    mode = 'L' if image.mode in ('1', 'L') else 'RGB'
+    return image.convert(mode).resize(size, Image.LANCZOS)
+
+
+def save(image, path, image_format):
+    """Save a derivative in the format of its original, and return its size."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if image_format in ('GIF', 'PNG'):
+        if image.mode != 'L':
+            image = image.convert('P', palette=Image.ADAPTIVE)
+        image.save(path, image_format, optimize=True)
+    else:
+        image.save(path, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    return path.stat().st_size
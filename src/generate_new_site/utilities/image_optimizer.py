@@ -0,0 +1,252 @@
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import hashlib
+import io
+import json
+import pathlib
+import shutil
+import subprocess
+from PIL import Image
+from .file_sync import file_hash
+
+MANIFEST_FILENAME = "optimizedImages.json"
+REPORT_FILENAME = "optimizationReport.csv"
+JPEG_SUFFIXES = {".jpeg", ".jpg"}
+GIF_SUFFIXES = {".gif"}
+# Lossless JPEG optimizer, used when installed (it comes with libjpeg)
+JPEGTRAN = "jpegtran"
+
+# Anything changing what the same image is optimized into
+SETTINGS = {
+    'version': 2,
+    'gif_format': 'PNG'
+}
+
+
+class ImageOptimizer:
+    """
+    Lossless optimization of the images copied to the output directory.
+
+    JPEGs are re-encoded in place by jpegtran, as progressive JPEGs with
+    optimized Huffman tables and without metadata, and left as they are if
+    jpegtran isn't installed. Still GIFs are converted to
+    PNG, and their path table registrations are pointed at the PNGs, so that
+    every link to them follows. Files are only replaced when the result is
+    smaller and decodes to the same pixels.
+
+    A manifest records the hash of every image optimized and of the result,
+    and images that haven't changed since are not optimized again.
+
+    Attributes
+    ----------
+    imgs_dir : Path
+        Output image directory, that the originals were copied to.
+    records : dict
+        Record of each image's optimization, keyed by the image's original
+        path relative to imgs_dir: the 'output' path relative to imgs_dir,
+        its 'output_hash', the source 'hash', and 'bytes_in' and
+        'bytes_out'.
+    made : int
+        Number of images optimized by the last build().
+    """
+
+    def __init__(self, imgs_dir):
+        self.imgs_dir = pathlib.Path(imgs_dir)
+        self.records = {}
+        self.made = 0
+
+    @property
+    def manifest_path(self):
+        return self.imgs_dir / MANIFEST_FILENAME
+
+    @property
+    def report_path(self):
+        return self.imgs_dir / REPORT_FILENAME
+
+    def build(self, pathtable, jobs=1):
+        """
+        Optimize the images registered in 'pathtable', in 'jobs' processes,
+        and register the images converted to another format at their new
+        paths.
+        """
+        previous = self.read_manifest()
+        old_paths = {}
+        tasks = []
+        for old_path, entry in pathtable.path_table.items():
+            image_path = pathlib.Path(entry['path'])
+            if image_path.suffix.lower() not in JPEG_SUFFIXES | GIF_SUFFIXES:
+                continue
+            try:
+                key = image_path.relative_to(self.imgs_dir).as_posix()
+            except ValueError:
+                continue
+            old_paths[key] = old_path
+            record = previous.get(key)
+            if self.is_up_to_date(image_path, record):
+                self.records[key] = record
+            elif image_path.is_file():
+                tasks.append((self.imgs_dir, key))
+
+        if jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                made = list(executor.map(
+                    _optimize_image, tasks,
+                    chunksize=max(1, len(tasks) // (4 * jobs))))
+        else:
+            made = [_optimize_image(task) for task in tasks]
+        for key, record in made:
+            if record is not None:
+                self.records[key] = record
+        self.made = len(made)
+
+        for key, record in self.records.items():
+            if record['output'] != key:
+                pathtable.move(old_paths[key], self.imgs_dir / record['output'])
+        self.write_manifest()
+
+    def is_up_to_date(self, image_path, record):
+        """
+        Whether an image's optimized output exists. The original may have
+        been copied again (or not copied, when only registering images),
+        in which case any copy replaced by another file is deleted again.
+        """
+        if record is None:
+            return False
+        output = self.imgs_dir / record['output']
+        if not output.is_file() or file_hash(output) != record['output_hash']:
+            return False
+        if output != image_path and image_path.is_file():
+            if file_hash(image_path) != record['hash']:
+                return False
+            image_path.unlink()
+        return True
+
+    def read_manifest(self):
+        """Records of the last build, if it used the same settings."""
+        try:
+            with self.manifest_path.open() as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('settings') != settings():
+            return {}
+        return manifest.get('images', {})
+
+    def write_manifest(self):
+        self.imgs_dir.mkdir(parents=True, exist_ok=True)
+        with self.manifest_path.open('w') as f:
+            json.dump({'settings': settings(), 'images': self.records}, f,
+                      indent=1, sort_keys=True)
+
+    def write_report(self):
+        """Write the bytes saved on each image, and in total, as CSV."""
+        with self.report_path.open('w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['image', 'optimized', 'bytes_in', 'bytes_out',
+                             'bytes_saved'])
+            for key, record in sorted(self.records.items()):
+                writer.writerow([key, record['output'], record['bytes_in'],
+                                 record['bytes_out'],
+                                 record['bytes_in'] - record['bytes_out']])
+            bytes_in, bytes_out = self.totals()
+            writer.writerow(['total', '', bytes_in, bytes_out,
+                             bytes_in - bytes_out])
+
+    def totals(self):
+        return (sum(record['bytes_in'] for record in self.records.values()),
+                sum(record['bytes_out'] for record in self.records.values()))
+
+    def summary(self):
+        bytes_in, bytes_out = self.totals()
+        converted = sum(1 for key, record in self.records.items()
+                        if record['output'] != key)
+        return ("Image optimization: {} images ({} optimized this build, "
+                "{} GIFs converted), {} KB -> {} KB. See {}.").format(
+                    len(self.records), self.made, converted,
+                    bytes_in // 1024, bytes_out // 1024, self.report_path)
+
+
+def settings():
+    """SETTINGS, and whether JPEGs can be optimized with this install."""
+    return dict(SETTINGS, jpegtran=shutil.which(JPEGTRAN) is not None)
+
+
+def _optimize_image(args):
+    """
+    Optimize a single image. Module level, so that it can run in a worker
+    process.
+
+    Returns
+    -------
+    key : str
+        The image's path relative to the image directory.
+    record : dict
+        The image's record, or None if it can't be read.
+    """
+    imgs_dir, key = args
+    image_path = imgs_dir / key
+    with image_path.open('rb') as f:
+        data = f.read()
+    try:
+        if image_path.suffix.lower() in JPEG_SUFFIXES:
+            output_path, output = image_path, optimized_jpeg(data)
+        else:
+            output_path, output = image_path.with_suffix('.png'), gif_to_png(data)
+    except (OSError, ValueError) as e:
+        print("Failed to optimize image {}: {}".format(image_path, e))
+        return key, None
+
+    if output is None or len(output) >= len(data):
+        output_path, output = image_path, data
+    else:
+        with output_path.open('wb') as f:
+            f.write(output)
+        if output_path != image_path:
+            image_path.unlink()
+    return key, {
+        'output': output_path.relative_to(imgs_dir).as_posix(),
+        'hash': hashlib.sha1(data).hexdigest(),
+        'output_hash': hashlib.sha1(output).hexdigest(),
+        'bytes_in': len(data),
+        'bytes_out': len(output)
+    }
+
+
+def optimized_jpeg(data):
+    """
+    JPEG losslessly re-encoded by jpegtran, or None if jpegtran isn't
+    installed or fails, or if the result doesn't decode to the same pixels.
+    """
+    jpegtran = shutil.which(JPEGTRAN)
+    if jpegtran is None:
+        return None
+    with Image.open(io.BytesIO(data)) as image:
+        # Keep the metadata when Exif rotates or flips the image
+        copy = 'all' if image.getexif().get(0x0112, 1) != 1 else 'none'
+        pixels = image.tobytes()
+    try:
+        output = subprocess.run(
+            [jpegtran, '-copy', copy, '-optimize', '-progressive'],
+            input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    with Image.open(io.BytesIO(output)) as image:
+        if image.tobytes() != pixels:
+            return None
+    return output
+
+
+def gif_to_png(data):
+    """PNG of a still GIF with the same pixels, or None for animated GIFs."""
+    with Image.open(io.BytesIO(data)) as image:
+        if getattr(image, 'is_animated', False):
+            return None
+        image.load()
+        png = io.BytesIO()
+        image.save(png, 'PNG', optimize=True)
+        pixels = image.convert('RGBA').tobytes()
+    with Image.open(io.BytesIO(png.getvalue())) as converted:
+        if converted.convert('RGBA').tobytes() != pixels:
+            return None
+    return png.getvalue()
@@ -0,0 +1,74 @@
+from jinja2 import (Environment, FileSystemBytecodeCache, FileSystemLoader,
+                    select_autoescape)
+from pathlib import Path
+
+TEMPLATES_DIRECTORY = str(Path(__file__).parent.parent / "templates")
+# Directory of the bytecode cache, under the build cache directory
+CACHE_DIR_NAME = "jinja"
+
+_environment = None
+
+
+def environment():
+    """
+    The Jinja environment shared by every page, created on first use.
+
+    Templates are compiled the first time they're requested, and kept for
+    the rest of the build. They aren't checked for changes after that,
+    since they don't change during a build.
+    """
+    global _environment
+    if _environment is None:
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATES_DIRECTORY),
+            autoescape=select_autoescape(['html', 'xml']),
+            line_statement_prefix='#', line_comment_prefix='##',
+            trim_blocks=True, lstrip_blocks=True,
+            auto_reload=False
+        )
+    return _environment
+
+
+def get_template(name):
+    """Load the template 'name', compiling it if it hasn't been yet."""
+    return environment().get_template(name)
+
+
+def use_bytecode_cache(cache_dir):
+    """
+    Keep compiled templates in 'cache_dir' (the build cache directory), so
+    that later builds load them instead of compiling them again. A template
+    is only compiled again once its source changes.
+
+    Returns
+    -------
+    bytecode_dir : Path
+        Directory the compiled templates are kept in.
+    """
+    bytecode_dir = Path(cache_dir) / CACHE_DIR_NAME
+    env = environment()
+    if getattr(env.bytecode_cache, 'directory', None) == str(bytecode_dir):
+        return bytecode_dir
+    bytecode_dir.mkdir(parents=True, exist_ok=True)
+    env.bytecode_cache = FileSystemBytecodeCache(str(bytecode_dir))
+    # Templates loaded before now would never reach the cache
+    env.cache.clear()
+    return bytecode_dir
+
+
+def precompile():
+    """
+    Load every template ahead of time, so that nothing is compiled while
+    pages are written (and worker processes started afterwards inherit or
+    find the compiled templates).
+
+    Returns
+    -------
+    names : list of str
+        Names of the templates loaded.
+    """
+    env = environment()
+    names = env.list_templates(filter_func=lambda name: name.endswith('.jinja'))
+    for name in names:
+        env.get_template(name)
+    return names
@@ -0,0 +1,467 @@
+import re
+
+#####################
+# Stylesheets (CSS) #
+#####################
+
+CSS_STRING = r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\''
+CSS_STRING_RE = re.compile(CSS_STRING, re.S)
+CSS_TOKEN_RE = re.compile(
+    r'/\*.*?\*/|' + CSS_STRING + r'|[{};]|[^{};"\'/]+|/', re.S)
+# At-rules holding rules, as opposed to declarations (@font-face, @page) or
+# anything else left as is (@keyframes)
+GROUP_RULE_RE = re.compile(r'@(?:-[a-z]+-)?(?:media|supports|document)\b', re.I)
+KEYFRAMES_RE = re.compile(r'@(?:-[a-z]+-)?keyframes\s+(\S+)', re.I)
+LICENSE_RE = re.compile(r'/\*\s*!')
+SOURCE_MAP_RE = re.compile(r'/\*# sourceMappingURL=[^*]*\*/|^//# sourceMappingURL=.*$', re.M)
+
+ATTRIBUTE_SELECTOR_RE = re.compile(r'\[[^\]]*\]')
+PARENTHESES_RE = re.compile(r'\([^()]*\)')
+CLASS_OR_ID_RE = re.compile(r'[.#](-?[_a-zA-Z][\w-]*)')
+WORD_RE = re.compile(r'-?[_a-zA-Z][\w-]*')
+URL_RE = re.compile(r'url\(\s*(' + CSS_STRING + r'|[^)"\']*?)\s*\)', re.S)
+
+
+def parse_css(css):
+    """
+    Split a stylesheet into rules, keeping just enough structure to prune
+    them.
+
+    Returns
+    -------
+    nodes : list of tuple
+        Each node is one of:
+            ('comment', text) for /*! comments (licenses) at the top level
+            ('statement', text) for at-rules ending with ';' (@import...)
+            ('rule', prelude, body) for style rules and other at-rules
+            ('group', prelude, nodes) for @media, @supports and @document
+        Other comments are dropped.
+    """
+    return _parse_block(CSS_TOKEN_RE.findall(css), 0, True)[0]
+
+
+def _parse_block(tokens, pos, top):
+    nodes = []
+    prelude = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        pos += 1
+        if token.startswith('/*'):
+            if top and LICENSE_RE.match(token) and not ''.join(prelude).strip():
+                nodes.append(('comment', token))
+        elif token == '}':
+            return nodes, pos
+        elif token == ';':
+            statement = ''.join(prelude).strip()
+            if statement:
+                nodes.append(('statement', statement))
+            prelude = []
+        elif token == '{':
+            text = ''.join(prelude).strip()
+            prelude = []
+            if GROUP_RULE_RE.match(text):
+                children, pos = _parse_block(tokens, pos, False)
+                nodes.append(('group', text, children))
+            else:
+                body, pos = _read_body(tokens, pos)
+                nodes.append(('rule', text, body))
+        else:
+            prelude.append(token)
+    return nodes, pos
+
+
+def _read_body(tokens, pos):
+    """Read a block up to its closing brace, minus comments."""
+    depth = 1
+    body = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        pos += 1
+        if token.startswith('/*'):
+            continue
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0:
+                break
+        body.append(token)
+    return ''.join(body), pos
+
+
+def split_selectors(prelude):
+    """Split a selector list on the commas that aren't nested in () or []."""
+    selectors = []
+    depth = 0
+    start = 0
+    for match in re.finditer(CSS_STRING + r'|[()\[\],]', prelude):
+        char = match.group(0)
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:match.start()])
+            start = match.end()
+    selectors.append(prelude[start:])
+    return [selector.strip() for selector in selectors]
+
+
+def selector_names(selector):
+    """
+    Return the set of class names and IDs an element must have for the
+    selector to match anything, or None if that can't be told.
+
+    Names in attribute selectors and in the arguments of pseudo-classes
+    (:not(.active)...) aren't required.
+    """
+    if '\\' in selector:
+        return None
+    selector = ATTRIBUTE_SELECTOR_RE.sub('', CSS_STRING_RE.sub('', selector))
+    previous = None
+    while previous != selector:
+        previous = selector
+        selector = PARENTHESES_RE.sub('', selector)
+    return set(CLASS_OR_ID_RE.findall(selector))
+
+
+def prune_css(nodes, is_used):
+    """
+    Remove the selectors requiring a class or ID for which is_used(name) is
+    False, and the rules and groups left empty.
+    """
+    kept = []
+    for node in nodes:
+        if node[0] == 'rule' and not node[1].startswith('@'):
+            selectors = []
+            for selector in split_selectors(node[1]):
+                names = selector_names(selector)
+                if names is None or all(is_used(name) for name in names):
+                    selectors.append(selector)
+            if selectors:
+                kept.append(('rule', ','.join(selectors), node[2]))
+        elif node[0] == 'group':
+            children = prune_css(node[2], is_used)
+            if children:
+                kept.append(('group', node[1], children))
+        else:
+            kept.append(node)
+    return kept
+
+
+def prune_keyframes(nodes, is_used):
+    """
+    Remove the @keyframes no declaration refers to, and for which
+    is_used(name) is False.
+    """
+    words = set()
+
+    def collect(nodes):
+        for node in nodes:
+            if node[0] == 'group':
+                collect(node[2])
+            elif node[0] == 'rule' and not KEYFRAMES_RE.match(node[1]):
+                words.update(WORD_RE.findall(CSS_STRING_RE.sub('', node[2])))
+
+    def prune(nodes):
+        kept = []
+        for node in nodes:
+            if node[0] == 'group':
+                node = ('group', node[1], prune(node[2]))
+                if not node[2]:
+                    continue
+            elif node[0] == 'rule':
+                match = KEYFRAMES_RE.match(node[1])
+                if match and match.group(1) not in words and not is_used(match.group(1)):
+                    continue
+            kept.append(node)
+        return kept
+
+    collect(nodes)
+    return prune(nodes)
+
+
+def rewrite_css_urls(nodes, rewrite):
+    """
+    Return the nodes with rewrite(url) applied to the url() of every
+    declaration, e.g. to keep relative URLs working from another directory.
+    """
+    def replace(match):
+        url = match.group(1)
+        quote = url[0] if url[:1] in ('"', "'") else ''
+        if quote:
+            url = url[1:-1]
+        return 'url(' + quote + rewrite(url) + quote + ')'
+
+    rewritten = []
+    for node in nodes:
+        if node[0] == 'group':
+            node = ('group', node[1], rewrite_css_urls(node[2], rewrite))
+        elif node[0] in ('rule', 'statement'):
+            node = node[:-1] + (URL_RE.sub(replace, node[-1]),)
+        rewritten.append(node)
+    return rewritten
+
+
+def css_urls(nodes):
+    """Return the URLs in the url() of the nodes, unquoted."""
+    urls = []
+    for node in nodes:
+        if node[0] == 'group':
+            urls.extend(css_urls(node[2]))
+        elif node[0] in ('rule', 'statement'):
+            for match in URL_RE.finditer(node[-1]):
+                url = match.group(1)
+                if url[:1] in ('"', "'"):
+                    url = url[1:-1]
+                urls.append(url)
+    return urls
+
+
+def serialize_css(nodes):
+    """Write parsed nodes back to a minified stylesheet."""
+    pieces = []
+    for node in nodes:
+        if node[0] == 'comment':
+            pieces.append(node[1] + '\n')
+        elif node[0] == 'statement':
+            pieces.append(_minify_css_text(node[1], 'prelude') + ';')
+        elif node[0] == 'group':
+            pieces.append(_minify_css_text(node[1], 'prelude') + '{'
+                          + serialize_css(node[2]) + '}')
+        else:
+            kind = 'prelude' if node[1].startswith('@') else 'selector'
+            pieces.append(_minify_css_text(node[1], kind) + '{'
+                          + _minify_css_text(node[2], 'body') + '}')
+    return ''.join(pieces)
+
+
+def minify_css(css):
+    return serialize_css(parse_css(css))
+
+
+# Spaces that can go, outside of strings, depending on what is minified
+_CSS_SPACES_RES = {
+    'selector': re.compile(r'\s*([,>+~])\s*'),
+    'prelude': re.compile(r'\s*(,)\s*|(:)\s+'),
+    'body': re.compile(r'\s*([{};,:!])\s*')
+}
+
+
+def _minify_css_text(text, kind):
+    pieces = []
+    for i, piece in enumerate(re.split('(' + CSS_STRING + ')', text, flags=re.S)):
+        if i % 2 == 0:  # Not a string
+            piece = re.sub(r'\s+', ' ', piece)
+            piece = _CSS_SPACES_RES[kind].sub(
+                lambda match: match.group(1) or match.group(2), piece)
+        pieces.append(piece)
+    text = ''.join(pieces).strip()
+    if kind == 'body':
+        text = re.sub(r';+(?=})', '', text).rstrip(';')
+    return text
+
+
+################
+# Scripts (JS) #
+################
+
+JS_TOKEN_RE = re.compile(r'''
+    (?P<space>[ \t\f\v\u00a0\ufeff]+)
+  | (?P<newline>[\n\r\u2028\u2029]+)
+  | (?P<comment>//[^\n\r\u2028\u2029]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\\n\r]|\\(?:\r\n|.))*"|'(?:[^'\\\n\r]|\\(?:\r\n|.))*')
+  | (?P<word>[\w$\\\u0080-\uffff]+)
+  | (?P<punct>.)
+''', re.S | re.X)
+# Where a '/' starts a regular expression rather than a division
+REGEX_AFTER_PUNCT = set('(,=:[!&|?{};~+-*%<>^')
+REGEX_AFTER_WORDS = {
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+    'void', 'throw', 'instanceof', 'yield', 'await'
+}
+# Line breaks that can go as no semicolon could be inserted there
+NO_SEMICOLON_AFTER = set('{[(,;=:&|?!*%<>~^.')
+NO_SEMICOLON_BEFORE = set(')]},;.?:*%&|=<>^')
+STRING_WORD_RE = re.compile(r'[A-Za-z_-][\w-]*')
+
+
+def js_tokens(source):
+    """
+    Split a script into tokens, with regular expressions and template
+    literals read as single tokens.
+
+    Yields
+    ------
+    kind : str
+        'space', 'newline', 'comment', 'string', 'template', 'regex',
+        'word' (identifiers, keywords and numbers) or 'punct' (a single
+        character).
+    text : str
+
+    Raises
+    ------
+    ValueError
+        If a template literal isn't closed.
+    """
+    pos = 0
+    previous = None
+    while pos < len(source):
+        char = source[pos]
+        if char == '`':
+            end = _template_end(source, pos)
+            kind = 'template'
+        elif (char == '/' and source[pos + 1:pos + 2] not in ('/', '*')
+                and _regex_allowed(previous)
+                and _regex_end(source, pos) is not None):
+            end = _regex_end(source, pos)
+            kind = 'regex'
+        else:
+            match = JS_TOKEN_RE.match(source, pos)
+            end = match.end()
+            kind = match.lastgroup
+        text = source[pos:end]
+        pos = end
+        if kind not in ('space', 'newline', 'comment'):
+            previous = (kind, text)
+        yield kind, text
+
+
+def _regex_allowed(previous):
+    if previous is None:
+        return True
+    kind, text = previous
+    return ((kind == 'punct' and text in REGEX_AFTER_PUNCT)
+            or (kind == 'word' and text in REGEX_AFTER_WORDS))
+
+
+def _regex_end(source, pos):
+    """End of the regular expression starting at pos, None if there's none."""
+    in_class = False
+    i = pos + 1
+    while i < len(source):
+        char = source[i]
+        if char in '\n\r\u2028\u2029':
+            return None
+        if char == '\\':
+            i += 1
+        elif char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            while i < len(source) and (source[i].isalnum() or source[i] in '_$'):
+                i += 1
+            return i
+        i += 1
+    return None
+
+
+def _template_end(source, pos):
+    """End of the template literal starting at pos."""
+    i = pos + 1
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '`':
+            return i + 1
+        if source.startswith('${', i):
+            i = _substitution_end(source, i + 2)
+            continue
+        i += 1
+    raise ValueError("Unterminated template literal")
+
+
+def _substitution_end(source, pos):
+    """End of the ${...} substitution whose expression starts at pos."""
+    depth = 1
+    tokens = js_tokens(source[pos:])
+    for kind, text in tokens:
+        pos += len(text)
+        if kind == 'punct' and text == '{':
+            depth += 1
+        elif kind == 'punct' and text == '}':
+            depth -= 1
+            if depth == 0:
+                return pos
+    raise ValueError("Unterminated template literal")
+
+
+def minify_js(source):
+    """
+    Remove comments (other than /*! licenses) and whitespace from a script.
+
+    Line breaks are only removed where no semicolon could be inserted
+    automatically, so that statements stay separated exactly as before.
+    Scripts that can't be tokenized are returned unchanged.
+    """
+    try:
+        tokens = list(js_tokens(source))
+    except ValueError:
+        return source
+
+    pieces = []
+    previous = None
+    gap = None  # Whitespace found since the last token: None, ' ' or '\n'
+    for kind, text in tokens:
+        if kind == 'space' or (kind == 'comment' and '\n' not in text
+                               and not text.startswith('/*!')):
+            gap = gap or ' '
+            continue
+        if kind == 'newline' or (kind == 'comment' and not text.startswith('/*!')):
+            gap = '\n'
+            continue
+        if kind == 'comment':  # License
+            if pieces:
+                pieces.append('\n')
+            pieces.append(text + '\n')
+            previous = None
+            gap = None
+            continue
+
+        if previous is not None and gap is not None:
+            if gap == '\n' and not (
+                    (previous[0] == 'punct' and previous[1] in NO_SEMICOLON_AFTER)
+                    or (kind == 'punct' and text in NO_SEMICOLON_BEFORE)):
+                pieces.append('\n')
+            elif _needs_space(previous, (kind, text)):
+                pieces.append(' ')
+        pieces.append(text)
+        previous = (kind, text)
+        gap = None
+    return ''.join(pieces)
+
+
+def _needs_space(previous, token):
+    """Whether two tokens separated by whitespace would merge without it."""
+    (prev_kind, prev_text), (kind, text) = previous, token
+    if kind == 'word' and prev_kind in ('word', 'regex'):
+        return True
+    if prev_kind == 'word' and prev_text[0].isdigit() and text.startswith('.'):
+        return True
+    if prev_text[-1] in '+-' and text[0] == prev_text[-1]:
+        return True
+    return prev_text[-1] == '/' and text[0] in '/*'
+
+
+def script_words(source):
+    """
+    Return the set of words in the string literals of a script, among which
+    are the class names and IDs it adds to or looks up in pages.
+    """
+    words = set()
+    try:
+        for kind, text in js_tokens(source):
+            if kind in ('string', 'template'):
+                words.update(STRING_WORD_RE.findall(text))
+    except ValueError:
+        words.update(STRING_WORD_RE.findall(source))
+    return words
+
+
+def strip_source_maps(source):
+    """Remove sourceMappingURL comments, whose maps aren't shipped."""
+    return SOURCE_MAP_RE.sub('', source)
@@ -0,0 +1,130 @@
+from collections import Counter
+import hashlib
+import json
+import pathlib
+from .html_fragments import start_tag
+from .process_content import table_modal_payload
+
+DIR_NAME = "modal-data"
+KINDS = ['figures', 'references', 'tables']
+# Attribute naming a link's payload, in place of the payload itself
+ID_ATTRIBUTES = {
+    'figures': 'data-figure-id',
+    'references': 'data-ref-id',
+    'tables': 'data-table-id'
+}
+
+
+class ModalData:
+    """
+    Payloads of the figure, reference and table modals, written once for the
+    whole site instead of being inlined in every link to them.
+
+    Each kind of payload goes in a script named after a hash of its content,
+    assigning to window.modalData, where load-modals.js looks up the payload
+    of a link by its ID when the link is clicked. Scripts (unlike JSON files
+    loaded with fetch) also work when the site is opened from file://.
+
+    Attributes
+    ----------
+    payloads : dict
+        Payloads by ID, for each kind of modal.
+    scripts : list of str
+        File names of the payload scripts, in the modal data directory.
+    links : Counter
+        Number of links written to each (kind, ID) payload.
+    """
+
+    def __init__(self):
+        self.payloads = {kind: {} for kind in KINDS}
+        self.scripts = []
+        self.links = Counter()
+
+    def collect(self, index):
+        """Gather every payload from the index's figures, references and tables."""
+        if index.figuretable is not None:
+            for figure_num, figure in index.figuretable.figures.items():
+                self.payloads['figures'][str(figure_num)] = (
+                    "<b>Figure " + str(figure_num) + "</b>. "
+                    + str(figure.caption)
+                )
+        if index.references is not None:
+            for letters in index.references.old_reference_letters:
+                info = index.references.get_reference_by_letters(letters)
+                self.payloads['references'][letters] = {
+                    'author': info['author'],
+                    'text': info['reference']
+                }
+        if index.datatables is not None:
+            # Only tables that can be linked to
+            for table_num in set(index.datatables.old_paths_to_table_nums.values()):
+                self.payloads['tables'][table_num] = table_modal_payload(
+                    index.datatables.get_table_by_num(table_num), index)
+        self.scripts = [script_name(kind, self.script_source(kind))
+                        for kind in KINDS]
+
+    def script_source(self, kind):
+        return ("window.modalData = window.modalData || {};\n"
+                "window.modalData." + kind + " = "
+                + json.dumps(self.payloads[kind], sort_keys=True,
+                             separators=(',', ':'))
+                + ";\n")
+
+    def link(self, kind, payload_id):
+        """Count a link written with only the ID of a payload."""
+        self.links[(kind, payload_id)] += 1
+
+    def take_links(self):
+        """Return the link counter and reset it, e.g. to collect it from workers."""
+        links = self.links
+        self.links = Counter()
+        return links
+
+    def write(self, dir_path):
+        """
+        Write the payload scripts to dir_path, and delete the ones from
+        previous builds.
+        """
+        dir_path = pathlib.Path(dir_path)
+        dir_path.mkdir(parents=True, exist_ok=True)
+        for old_script in dir_path.glob('*.js'):
+            if old_script.name not in self.scripts:
+                old_script.unlink()
+        for kind, name in zip(KINDS, self.scripts):
+            with (dir_path / name).open('wb') as f:
+                f.write(self.script_source(kind).encode('utf-8'))
+
+    def bytes_saved(self):
+        """
+        Size the links' payloads would have taken if inlined in the links,
+        minus the size of the IDs replacing them and of the scripts.
+        """
+        saved = 0
+        for (kind, payload_id), count in self.links.items():
+            inlined = start_tag('a', inline_attributes(kind, self.payloads[kind][payload_id]))
+            with_id = start_tag('a', {ID_ATTRIBUTES[kind]: payload_id})
+            saved += count * (len(inlined.encode('utf-8')) - len(with_id.encode('utf-8')))
+        for kind in KINDS:
+            saved -= len(self.script_source(kind).encode('utf-8'))
+        return saved
+
+    def summary(self):
+        return ("Modal data: {} links to shared payloads, {} bytes saved "
+                "across the site's links, net of the shared scripts.").format(
+                    sum(self.links.values()), self.bytes_saved())
+
+
+def inline_attributes(kind, payload):
+    """Attributes a link used to carry its payload in."""
+    if kind == 'figures':
+        return {'data-sub-html': payload}
+    if kind == 'references':
+        return {'data-author': payload['author'],
+                'data-ref-text': payload['text']}
+    return {'data-table-header': payload['header'],
+            'data-table-string': payload['html']}
+
+
+def script_name(kind, source):
+    return "{}.{}.js".format(
+        kind, hashlib.sha1(source.encode('utf-8')).hexdigest()[:12])
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from os.path import relpath
 import pathlib
 
@@ -13,11 +14,23 @@ def rel_path(path, start):
     if 'https:/' in str(path) or 'http:/' in str(path):
         return path
 
+    return _cached_rel_path(path, start_dir(start))
+
+
+def start_dir(start):
+    """Return the directory that relative links from 'start' are based on."""
     if start.suffix != '':  # Want relpath from file's directory
-        return pathlib.Path(relpath(path, start.parent))
+        return start.parent
+
+    return start  # Already a directory
 
-    if start.suffix == '':  # Already a directory
-        return pathlib.Path(relpath(path, start))
 
-    # Should be no such paths that get here, return 'path' for safety
-    return path
+@lru_cache(maxsize=None)
+def _cached_rel_path(path, directory):
+    """
+    Memoized relpath, keyed by (target, start directory).
+    The same targets (chapters, modules, figures, ...) are linked from every
+    page in a directory, so each distinct pair only goes through
+    os.path.relpath once per build.
+    """
+    return pathlib.Path(relpath(path, directory))
@@ -1,166 +1,269 @@
 from bs4 import BeautifulSoup
+from functools import lru_cache
 import pathlib
 import os
+import re
+from .dig_imgs import image_href
+from .html_fragments import rewrite_anchors
 from .path_ops import rel_path
 
+# Kinds of links found in the old site's paragraphs, in order of precedence:
+# an href is of the first kind whose pattern appears anywhere in it.
+HREF_KINDS = [
+    ('video_figure', re.compile(r'\A(?=.*slid).*(?:mov|mpg)\.html', re.S)),
+    ('figure', re.compile('slid')),
+    ('reference', re.compile('ref')),
+    ('table', re.compile('html/table')),
+    ('page', re.compile('part[0-5]|descriptions')),
+    ('site', re.compile(
+        'artifacts|excavations|part6|dbs|started|primer|maps|data')),
+    ('video', re.compile('video')),
+    ('version', re.compile(r'version\.html')),
+    ('dig_query', re.compile(r'javalaunch\.html|digquery\.html')),
+    ('tutorial', re.compile('tutorial'))
+]
 
-def update_text_paragraph(paragraph_string, index, page_obj_path):
-    """Update the <a> tags in a textpage/feature description paragraph."""
+
+@lru_cache(maxsize=None)
+def classify_href(href):
+    """Return the kind of link from HREF_KINDS 'href' is, None if unknown."""
+    for kind, pattern in HREF_KINDS:
+        if pattern.search(href):
+            return kind
+    return None
+
+
+def update_text_paragraph(paragraph_string, index, page_obj_path, fast=True):
+    """
+    Update the <a> tags in a textpage/feature description paragraph.
+
+    With fast=False, the paragraph always goes through html5lib, which the
+    fast path is checked against (see generate.benchmark_link_rewriting).
+    """
     # Change innerHTML content of each section/paragraph
     # so that links (e.g. image and references) are updated.
     # TODO: if there is time, find a less redundant way of storing the info
     # for images, tables, and references than directly in the anchor tag.
-    soup = BeautifulSoup(paragraph_string, 'html5lib')
-    for a in soup.find_all('a'):
-        old_path = a['href']
-        if a.has_attr('data-is-primer') and a['data-is-primer'] == 'yes':
-            del a['data-is-primer']
-            old_path = pathlib.Path('/dig/html/primer') / old_path
-            old_path = os.path.normpath(old_path)
-            old_path = str(pathlib.Path(old_path).as_posix())
-            a['href'] = '#genModal'
-            a['data-toggle'] = 'modal'
-            a['data-target'] = '#genModal'
-            a['class'] = 'a-video'
-            a['data-figure-path'] = old_path.replace('/dig/html/video/', '../../video/')
-        elif 'slid' in old_path:
-            # Set up image modal
-            if 'mov.html' in old_path or 'mpg.html' in old_path:
-                old_path = pathlib.Path('/dig/html/someDir') / old_path
-                old_path = os.path.normpath(old_path)
-                old_path = str(pathlib.Path(old_path).as_posix())
-                lookup = index.figuretable
-                img_num = lookup.get_figure_num(old_path)
-                figure = lookup.get_figure(img_num)
-                a['href'] = '#genModal'
-                a['data-toggle'] = 'modal'
-                a['data-target'] = '#genModal'
-                a['class'] = 'a-video'
-                a['data-figure-caption'] = (
-                    "<b>Figure " + str(img_num) + "</b>. "
-                    + str(figure.caption)
-                )
-                a['data-figure-path'] = (
-                    figure.img_orig_path.as_posix()
-                    .split('.')[0]
-                    .replace('/dig/html/video/', '../../video/')
-                    + '.mp4'
-                )
-            else:
-                old_path = pathlib.Path('/dig/html/someDir') / old_path
-                old_path = os.path.normpath(old_path)
-                old_path = str(pathlib.Path(old_path).as_posix())
-                lookup = index.figuretable
-                img_num = lookup.get_figure_num(old_path)
-                figure = lookup.get_figure(img_num)
-                # a['href'] = '#genModal'
-                # a['data-toggle'] = 'modal'
-                # a['data-target'] = '#genModal'
-                a['class'] = 'a-img'
-                a['data-sub-html'] = (
-                    "<b>Figure " + str(img_num) + "</b>. "
-                    + str(figure.caption)
-                )
-                a['data-src'] = (
-                    figure.img_orig_path.as_posix()
-                    .replace('/dig/html/images/', '../../imgs/')
-                )
-                a['href'] = (
-                    figure.img_orig_path.as_posix()
-                    .replace('/dig/html/images/', '../../imgs/')
-                )
-        elif 'ref' in old_path:
-            # Set up reference modal
-            a['href'] = '#genModal'
-            a['data-toggle'] = 'modal'
-            a['data-target'] = '#genModal'
-            a['class'] = 'a-ref'
-            letters = old_path.split('ref_')[-1].split('.')[0]
-            ref_cls = index.references
-            info = ref_cls.get_reference_by_letters(letters)
-            if info:
-                author = info['author']
-                ref_text = info['reference']
-                a['data-author'] = author
-                a['data-ref-text'] = ref_text
-            else:
-                print("Failed to find reference for letters "
-                        + letters)
-        elif 'html/table' in old_path:
-            # Set up table modal
-            a['href'] = '#genModal'
-            a['data-toggle'] = 'modal'
-            a['data-target'] = '#genModal'
-            a['class'] = 'a-table'
-            old_path = pathlib.Path('/dig/html/someDir') / old_path
-            old_path = os.path.normpath(old_path)
-            old_path = str(pathlib.Path(old_path).as_posix())
-            lookup = index.datatables
-            table = lookup.get_table_by_old_path(old_path)
-            a['data-table-header'] = (
-                "<b>Table " + table['tableNum'] + "</b>. "
-                + table['caption']
-            )
-            table_string = table['table']
-            # Replace old links with new info in the table str
-            table_soup = BeautifulSoup(table_string, 'html5lib')
-            for table_a in table_soup.find_all('a'):
-                figure_num = lookup.get_figure_num_by_html_path(
-                    table_a['href']
-                )
-                figure = index.figuretable.get_figure(figure_num)
-                table_a['href'] = '#tableImgModal'
-                table_a['data-toggle'] = 'modal'
-                table_a['data-target'] = '#tableImgModal'
-                table_a['data-figure-caption'] = (
-                    "<b>Figure " + str(figure_num) + "</b>. "
-                    + str(figure.caption)
-                )
-                table_a['data-figure-path'] = (
-                    figure.img_orig_path.as_posix()
-                    .replace('/dig/html/images/', '../../imgs/')
-                )
-            new_table_str = (
-                str(table_soup.body).replace('<body>', '')
-            )
-            new_table_str = new_table_str.replace('</body>', '')
-            a['data-table-string'] = new_table_str
-        elif any(
-            partname in old_path
-            for partname in ['part0', 'part1', 'part2',
-                             'part3', 'part4', 'part5', 'descriptions']
-        ):
-            # Replace link with link to new page
-            if '_' in old_path:
-                old_path = old_path.replace('tab', 'body')
-            new_link = index.pathtable.get_path(old_path)
-            new_link = rel_path(new_link, page_obj_path)
-            a['href'] = new_link
-        elif any(
-            case in old_path
-            for case in ['artifacts', 'excavations', 'part6', 'dbs', 'started',
-                         'primer', 'maps', 'data']
-        ):
-            new_link = index.pathtable.get_path(old_path)
-            new_link = rel_path(new_link, page_obj_path)
-            a['href'] = new_link
-        elif 'video' in old_path:
-            # Deal with video files
-            a['href'] = old_path.replace('/dig/html/video/', '../../video/')
-        elif 'version.html' in old_path:
-            a['href'] = "#versionModal"
-            a['data-toggle'] = "modal"
-            a['data-target'] = "#versionModal"
-        elif 'javalaunch.html' in old_path or 'digquery.html' in old_path:
-            a['href'] = "https://electronicdig.sites.oasis.unc.edu"
-        elif 'tutorial' in old_path:
-            # TODO: Probably just remove this <li> element in the content,
-            # don't have time to restructure this right now
-            a['href'] = "https://electronicdig.sites.oasis.unc.edu/views/tutorial1.html"
-        else:
-            raise Exception('found path ' + old_path + ' in this paragraph: \n'
-                            + paragraph_string)
+    def update(attrs):
+        if not update_link(attrs, index, page_obj_path):
+            raise Exception('found path ' + attrs['href']
+                            + ' in this paragraph: \n' + paragraph_string)
+
+    return update_links(paragraph_string, update, fast)
 
+
+def update_links(html_string, update, fast=True):
+    """
+    Call update() on the attribute dict of each <a> tag in an HTML fragment,
+    and return the updated fragment.
+
+    Fragments in the form BeautifulSoup writes are rewritten directly by
+    html_fragments.rewrite_anchors(). Others (and all of them if fast is
+    False) are parsed with html5lib, which gives the same result.
+    """
+    if fast:
+        new_string = rewrite_anchors(html_string, update)
+        if new_string is not None:
+            return new_string
+    soup = BeautifulSoup(html_string, 'html5lib')
+    for a in soup.find_all('a'):
+        update(a.attrs)
     # Get rid of extra <html>, <head>, and <body> tags in soup
-    new_paragraph = str(soup.body).replace('<body>', '').replace('</body>', '')
-    return new_paragraph
+    return str(soup.body).replace('<body>', '').replace('</body>', '')
+
+
+def update_link(attrs, index, page_obj_path):
+    """
+    Update the attributes of one <a> tag from a paragraph.
+    Return False if its href is of no known kind.
+    """
+    old_path = attrs['href']
+    if attrs.get('data-is-primer') == 'yes':
+        kind = 'primer'
+    else:
+        kind = classify_href(old_path)
+    if kind is None:
+        return False
+    LINK_UPDATERS[kind](attrs, old_path, index, page_obj_path)
+    return True
+
+
+def normalized_path(old_path, base_dir='/dig/html/someDir'):
+    old_path = pathlib.Path(base_dir) / old_path
+    old_path = os.path.normpath(old_path)
+    return str(pathlib.Path(old_path).as_posix())
+
+
+def update_primer_link(attrs, old_path, index, page_obj_path):
+    del attrs['data-is-primer']
+    old_path = normalized_path(old_path, '/dig/html/primer')
+    attrs['href'] = '#genModal'
+    attrs['data-toggle'] = 'modal'
+    attrs['data-target'] = '#genModal'
+    attrs['class'] = 'a-video'
+    attrs['data-figure-path'] = old_path.replace('/dig/html/video/', '../../video/')
+
+
+def update_video_figure_link(attrs, old_path, index, page_obj_path):
+    attrs['href'] = '#genModal'
+    attrs['data-toggle'] = 'modal'
+    attrs['data-target'] = '#genModal'
+    attrs['class'] = 'a-video'
+    attrs.update(index.link_payloads.get(
+        'video_figure', old_path,
+        lambda: video_figure_payload(old_path, index)))
+
+
+def video_figure_payload(old_path, index):
+    old_path = normalized_path(old_path)
+    lookup = index.figuretable
+    img_num = lookup.get_figure_num(old_path)
+    figure = lookup.get_figure(img_num)
+    return {
+        'data-figure-caption': (
+            "<b>Figure " + str(img_num) + "</b>. "
+            + str(figure.caption)
+        ),
+        'data-figure-path': (
+            figure.img_orig_path.as_posix()
+            .split('.')[0]
+            .replace('/dig/html/video/', '../../video/')
+            + '.mp4'
+        )
+    }
+
+
+def update_figure_link(attrs, old_path, index, page_obj_path):
+    # Set up image modal, its caption is set from the figure's ID by
+    # load-modals.js
+    # attrs['href'] = '#genModal'
+    # attrs['data-toggle'] = 'modal'
+    # attrs['data-target'] = '#genModal'
+    attrs['class'] = 'a-img'
+    payload = index.link_payloads.get(
+        'figure', old_path, lambda: figure_payload(old_path, index))
+    attrs.update(payload)
+    index.modal_data.link('figures', payload['data-figure-id'])
+
+
+def figure_payload(old_path, index):
+    old_path = normalized_path(old_path)
+    lookup = index.figuretable
+    img_num = lookup.get_figure_num(old_path)
+    figure = lookup.get_figure(img_num)
+    img_path = image_href(figure.img_orig_path, index)
+    return {
+        'data-figure-id': str(img_num),
+        'data-src': img_path,
+        'href': img_path
+    }
+
+
+def update_reference_link(attrs, old_path, index, page_obj_path):
+    # Set up reference modal
+    attrs['href'] = '#genModal'
+    attrs['data-toggle'] = 'modal'
+    attrs['data-target'] = '#genModal'
+    attrs['class'] = 'a-ref'
+    letters = old_path.split('ref_')[-1].split('.')[0]
+    ref_cls = index.references
+    info = ref_cls.get_reference_by_letters(letters)
+    if info:
+        # Author and text are looked up by load-modals.js
+        attrs['data-ref-id'] = letters
+        index.modal_data.link('references', letters)
+    else:
+        print("Failed to find reference for letters "
+                + letters)
+
+
+def update_table_link(attrs, old_path, index, page_obj_path):
+    # Set up table modal, its contents are looked up by load-modals.js
+    attrs['href'] = '#genModal'
+    attrs['data-toggle'] = 'modal'
+    attrs['data-target'] = '#genModal'
+    attrs['class'] = 'a-table'
+    payload = index.link_payloads.get(
+        'table', old_path, lambda: table_payload(old_path, index))
+    attrs.update(payload)
+    index.modal_data.link('tables', payload['data-table-id'])
+
+
+def table_payload(old_path, index):
+    old_path = normalized_path(old_path)
+    table_num = index.datatables.get_table_num_by_old_path(old_path)
+    if table_num is None:
+        raise Exception('found no table for link to ' + old_path)
+    return {'data-table-id': table_num}
+
+
+def table_modal_payload(table, index, fast=True):
+    """Header and HTML shown in the modal of a data table."""
+    lookup = index.datatables
+
+    # Replace old links with new info in the table str
+    def update_table_image_link(table_attrs):
+        figure_num = lookup.get_figure_num_by_html_path(table_attrs['href'])
+        figure = index.figuretable.get_figure(figure_num)
+        table_attrs['href'] = '#tableImgModal'
+        table_attrs['data-toggle'] = 'modal'
+        table_attrs['data-target'] = '#tableImgModal'
+        table_attrs['data-figure-caption'] = (
+            "<b>Figure " + str(figure_num) + "</b>. "
+            + str(figure.caption)
+        )
+        table_attrs['data-figure-path'] = image_href(figure.img_orig_path, index)
+
+    return {
+        'header': "<b>Table " + table['tableNum'] + "</b>. " + table['caption'],
+        'html': update_links(table['table'], update_table_image_link, fast)
+    }
+
+
+def update_page_link(attrs, old_path, index, page_obj_path):
+    # Replace link with link to new page
+    if '_' in old_path:
+        old_path = old_path.replace('tab', 'body')
+    update_site_link(attrs, old_path, index, page_obj_path)
+
+
+def update_site_link(attrs, old_path, index, page_obj_path):
+    new_link = index.pathtable.get_path(old_path)
+    new_link = rel_path(new_link, page_obj_path)
+    attrs['href'] = new_link
+
+
+def update_video_link(attrs, old_path, index, page_obj_path):
+    # Deal with video files
+    attrs['href'] = old_path.replace('/dig/html/video/', '../../video/')
+
+
+def update_version_link(attrs, old_path, index, page_obj_path):
+    attrs['href'] = "#versionModal"
+    attrs['data-toggle'] = "modal"
+    attrs['data-target'] = "#versionModal"
+
+
+def update_dig_query_link(attrs, old_path, index, page_obj_path):
+    attrs['href'] = "https://electronicdig.sites.oasis.unc.edu"
+
+
+def update_tutorial_link(attrs, old_path, index, page_obj_path):
+    # TODO: Probably just remove this <li> element in the content,
+    # don't have time to restructure this right now
+    attrs['href'] = "https://electronicdig.sites.oasis.unc.edu/views/tutorial1.html"
+
+
+LINK_UPDATERS = {
+    'primer': update_primer_link,
+    'video_figure': update_video_figure_link,
+    'figure': update_figure_link,
+    'reference': update_reference_link,
+    'table': update_table_link,
+    'page': update_page_link,
+    'site': update_site_link,
+    'video': update_video_link,
+    'version': update_version_link,
+    'dig_query': update_dig_query_link,
+    'tutorial': update_tutorial_link
+}
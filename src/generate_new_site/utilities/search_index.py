@@ -0,0 +1,274 @@
+from collections import Counter, defaultdict
+from functools import lru_cache
+import html
+import json
+import pathlib
+import re
+import time
+import unicodedata
+from .jinja_env import get_template
+from .modal_data import script_name
+from .path_ops import rel_path
+
+# Directory of the index scripts, under the assets directory
+DIR_NAME = "search"
+SEARCH_TEMPLATE_FILENAME = "search.html.jinja"
+# The search page, relative to the html directory
+PAGE_PATH = "search/index.html"
+INDEX_VERSION = 1
+
+# Terms are sharded by their first PREFIX_LENGTH characters, so a query only
+# loads the postings of the shards its terms fall in
+PREFIX_LENGTH = 2
+# Occurrences in a page's title count this many times
+TITLE_WEIGHT = 5
+
+STOPWORDS = frozenset("""
+    a an and are as at be been but by for from had has have he her his in into
+    is it its not of on or she that the their there these they this those to
+    was were which who will with
+    """.split())
+
+# Suffix rules of the stemmer, in steps. In each step, the first rule whose
+# suffix a word ends with replaces it, if at least MIN_STEM_LENGTH characters
+# are left before it. The rules are written into the index for search.js,
+# which stems queries the same way.
+STEM_STEPS = [
+    [("sses", "ss"), ("ies", "y"), ("ied", "y"), ("ss", "ss"), ("us", "us"),
+     ("is", "is"), ("s", "")],
+    [("ingly", ""), ("edly", ""), ("ing", ""), ("ed", ""), ("ly", "")],
+    [("ational", "ate"), ("ization", "ize"), ("ation", "ate"), ("ness", ""),
+     ("ment", ""), ("ful", ""), ("ity", ""), ("ive", ""), ("ize", ""),
+     ("ise", ""), ("al", ""), ("er", ""), ("ic", "")]
+]
+MIN_STEM_LENGTH = 3
+# Final double letters that aren't undoubled ("hill", "pass", "buzz")
+KEPT_DOUBLES = "lsz"
+
+WORD = re.compile(r'[a-z0-9]+')
+TAG = re.compile(r'<[^>]*>')
+BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+class SearchIndex:
+    """
+    Full text search index of the site, queried in the browser by
+    search.js.
+
+    Pages are tokenized into stemmed terms, and every term has a posting
+    list of the pages it appears in, with how often. Posting lists are
+    delta encoded and sharded by the terms' prefixes into scripts (which,
+    unlike JSON files, load from file:// URLs), named by the hash of their
+    contents, in assets/search.
+
+    Attributes
+    ----------
+    documents : list of list
+        [title, href relative to the html directory, module number] of every
+        page indexed, in the order of their numbers.
+    modules : list of list
+        [chapter name, module name] of every module with an indexed page.
+    postings : dict
+        Maps every term to a Counter of its occurrences in each page number.
+    shards : dict
+        Maps term prefixes to the names of the scripts holding their
+        postings, once built.
+    shard_sources : dict
+        Maps the same prefixes to the scripts' sources.
+    build_time : float
+        Seconds taken to index the site.
+    bytes : int
+        Size of the scripts written.
+    """
+
+    def __init__(self):
+        self.documents = []
+        self.modules = []
+        self.module_numbers = {}
+        self.postings = defaultdict(Counter)
+        self.shards = {}
+        self.shard_sources = {}
+        self.build_time = 0
+        self.bytes = 0
+
+    def build(self, index, html_dir):
+        """
+        Index every page of the site tree, before pages are written (see
+        SitePage.search_text()).
+        """
+        start = time.perf_counter()
+        for page in index.pages():
+            module = page.parent
+            key = (module.parent.name, module.short_name)
+            if key not in self.module_numbers:
+                self.module_numbers[key] = len(self.modules)
+                self.modules.append(list(key))
+            self.add_document(
+                html_text(page.name),
+                rel_path(page.path, html_dir).as_posix(),
+                self.module_numbers[key],
+                page.search_text())
+        self.shard_sources = {prefix: self.shard_source(prefix, terms)
+                              for prefix, terms in self.shard_terms().items()}
+        self.shards = {prefix: script_name(prefix, source)
+                       for prefix, source in self.shard_sources.items()}
+        self.build_time = time.perf_counter() - start
+
+    def add_document(self, title, href, module_number, fragments):
+        """Index a page's title and html fragments, and return its number."""
+        number = len(self.documents)
+        self.documents.append([title, href, module_number])
+        occurrences = Counter()
+        for term in terms(title):
+            occurrences[term] += TITLE_WEIGHT
+        for fragment in fragments:
+            occurrences.update(terms(html_text(fragment)))
+        for term, count in occurrences.items():
+            self.postings[term][number] = count
+        return number
+
+    def shard_terms(self):
+        """Map term prefixes to the encoded posting lists of their terms."""
+        shards = defaultdict(dict)
+        for term in sorted(self.postings):
+            shards[term[:PREFIX_LENGTH]][term] = encode_postings(self.postings[term])
+        return shards
+
+    def shard_source(self, prefix, terms):
+        return ("window.eotSearch = window.eotSearch || {shards: {}};\n"
+                "window.eotSearch.shards[" + json.dumps(prefix) + "] = "
+                + json.dumps(terms, separators=(',', ':')) + ";\n")
+
+    def index_source(self):
+        metadata = {
+            'version': INDEX_VERSION,
+            'prefixLength': PREFIX_LENGTH,
+            'stopwords': sorted(STOPWORDS),
+            'stemSteps': STEM_STEPS,
+            'minStemLength': MIN_STEM_LENGTH,
+            'keptDoubles': KEPT_DOUBLES,
+            'documents': self.documents,
+            'modules': self.modules,
+            'shards': self.shards
+        }
+        return ("window.eotSearch = window.eotSearch || {shards: {}};\n"
+                "window.eotSearch.index = "
+                + json.dumps(metadata, sort_keys=True, separators=(',', ':'))
+                + ";\n")
+
+    def write(self, dir_path, html_dir):
+        """
+        Write the index's scripts to dir_path, deleting the ones from
+        previous builds, and the search page to html_dir.
+        """
+        dir_path = pathlib.Path(dir_path)
+        dir_path.mkdir(parents=True, exist_ok=True)
+        index_source = self.index_source()
+        index_name = script_name('index', index_source)
+        sources = {index_name: index_source}
+        for prefix, source in self.shard_sources.items():
+            sources[self.shards[prefix]] = source
+        for old_script in dir_path.glob('*.js'):
+            if old_script.name not in sources:
+                old_script.unlink()
+        for name, source in sources.items():
+            with (dir_path / name).open('wb') as f:
+                f.write(source.encode('utf-8'))
+        self.bytes = sum(len(source.encode('utf-8')) for source in sources.values())
+
+        page_path = pathlib.Path(html_dir) / PAGE_PATH
+        page_path.parent.mkdir(parents=True, exist_ok=True)
+        search_dir = rel_path(dir_path, page_path).as_posix()
+        with page_path.open('w') as f:
+            f.write(get_template(SEARCH_TEMPLATE_FILENAME).render(
+                index_script=search_dir + "/" + index_name,
+                search_dir=search_dir + "/"
+            ))
+
+    def summary(self):
+        return ("Search index: {} pages, {} terms in {} shards, {} KB, "
+                "built in {:.2f} s.").format(
+                    len(self.documents), len(self.postings), len(self.shards),
+                    self.bytes // 1024, self.build_time)
+
+
+def html_text(fragment):
+    """Text of an html fragment, without its tags or character references."""
+    return html.unescape(TAG.sub(' ', fragment))
+
+
+def tokenize(text):
+    """
+    Lowercase words of 'text', without accents, stopwords, or single
+    letters (single digits are kept).
+    """
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize('NFKD', text)
+                       if not unicodedata.combining(c))
+    return [word for word in WORD.findall(text.lower())
+            if (len(word) > 1 or word.isdigit()) and word not in STOPWORDS]
+
+
+@lru_cache(maxsize=None)
+def stem(word):
+    """
+    Reduce a word to its stem, by the rules in STEM_STEPS. Memoized, since
+    the site's vocabulary is much smaller than its text.
+    """
+    if len(word) <= MIN_STEM_LENGTH or not word.isalpha():
+        return word
+    for rules in STEM_STEPS:
+        for suffix, replacement in rules:
+            if word.endswith(suffix):
+                if len(word) - len(suffix) >= MIN_STEM_LENGTH:
+                    word = word[:-len(suffix)] + replacement
+                break
+    if (len(word) > MIN_STEM_LENGTH and word[-1] == word[-2]
+            and word[-1] not in KEPT_DOUBLES):
+        word = word[:-1]
+    if len(word) > MIN_STEM_LENGTH and word.endswith('e'):
+        word = word[:-1]
+    return word
+
+
+def terms(text):
+    """The stemmed terms of 'text', in order."""
+    return [stem(word) for word in tokenize(text)]
+
+
+def encode_postings(occurrences):
+    """
+    Encode a posting list, mapping page numbers to occurrence counts, as
+    comma separated page numbers in base 36, each but the first as the
+    difference from the previous one, and followed by ':' and its count
+    in base 36 when that isn't 1.
+    """
+    entries = []
+    previous = 0
+    for number in sorted(occurrences):
+        entry = base36(number - previous)
+        if occurrences[number] != 1:
+            entry += ":" + base36(occurrences[number])
+        entries.append(entry)
+        previous = number
+    return ",".join(entries)
+
+
+def decode_postings(encoded):
+    """Inverse of encode_postings()."""
+    occurrences = {}
+    number = 0
+    for entry in encoded.split(","):
+        delta, _, count = entry.partition(":")
+        number += int(delta, 36)
+        occurrences[number] = int(count, 36) if count else 1
+    return occurrences
+
+
+def base36(number):
+    digits = ""
+    while True:
+        number, digit = divmod(number, 36)
+        digits = BASE36_DIGITS[digit] + digits
+        if number == 0:
+            return digits
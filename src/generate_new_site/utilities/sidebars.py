@@ -0,0 +1,197 @@
+import re
+from markupsafe import Markup
+from .jinja_env import get_template
+
+SIDEBAR_TEMPLATE_FILENAME = "shared_elements/sidebar.html.jinja"
+COLLAPSED_SIDEBAR_TEMPLATE_FILENAME = "shared_elements/sidebar_collapsed.html.jinja"
+SHARED_NAV_TEMPLATE_FILENAME = "shared_elements/sidebar_shared_nav.html.jinja"
+# Script building the sidebars from the navigation tree, relative to the
+# assets directory; the tree replaces its placeholder
+SHARED_NAV_SCRIPT_TEMPLATE = "js/site-navigation-template.js"
+SHARED_NAV_SCRIPT = "js/site-navigation.js"
+
+# Collapse classes of each sidebar, and whether it lists the sections of
+# modules with a single page
+SHARED_NAV_VARIANTS = {
+    SIDEBAR_TEMPLATE_FILENAME: ("collapse show", False),
+    COLLAPSED_SIDEBAR_TEMPLATE_FILENAME: ("collapse", True)
+}
+
+# Class attributes of the sidebar's section and subsection entries, the only
+# part of a module's sidebar that differs between its pages
+SECTION_CLASS = re.compile(r'class="(sidebar-section|sidebar-subsection)"')
+
+
+class SidebarCache:
+    """
+    Rendered sidebars, shared by the pages of a module.
+
+    A sidebar only depends on the site tree's hrefs, which are relative to
+    the directory being written (Index.href_dir), on the active chapter and
+    module, and on the active section. Each fragment is rendered once per
+    directory, chapter and module with no section active, and pages then
+    mark their own section active in a copy of it.
+
+    Attributes
+    ----------
+    fragments : dict
+        Keyed by (href_dir, template name, chapter name, module name), the
+        rendered sidebar split around the section class attributes, as
+        returned by SECTION_CLASS.split(), and the name of the section or
+        subsection each class attribute belongs to. None for sidebars that
+        can't be patched, which are rendered for every page.
+    rendered : int
+        Number of times a sidebar template was rendered.
+    reused : int
+        Number of sidebars patched from an already rendered fragment.
+    """
+
+    def __init__(self):
+        self.fragments = {}
+        self.rendered = 0
+        self.reused = 0
+
+    def clear(self):
+        """Forget every fragment, for when the site tree changes."""
+        self.fragments.clear()
+
+    def templates(self):
+        """Templates rendered besides those the pages' templates include."""
+        return []
+
+    def render(self, template_name, index, this_chapter_name, this_module_name,
+               this_section_name):
+        """
+        Return the sidebar rendered by 'template_name' for a page, with
+        hrefs relative to the directory the site tree's hrefs currently are.
+
+        Returns
+        -------
+        sidebar_html : Markup
+        """
+        key = (index.href_dir, template_name, this_chapter_name, this_module_name)
+        if key not in self.fragments:
+            self.fragments[key] = self.render_fragment(
+                template_name, index, this_chapter_name, this_module_name)
+        elif self.fragments[key] is not None:
+            self.reused += 1
+        fragment = self.fragments[key]
+        if fragment is None:
+            self.rendered += 1
+            return Markup(get_template(template_name).render(
+                chapters=index.children,
+                this_chapter_name=this_chapter_name,
+                this_module_name=this_module_name,
+                this_section_name=this_section_name
+            ))
+
+        parts, names = fragment
+        html = [parts[0]]
+        for name, css_class, text in zip(names, parts[1::2], parts[2::2]):
+            if name == this_section_name:
+                css_class = "sidebar-active " + css_class
+            html.append('class="{}"'.format(css_class))
+            html.append(text)
+        return Markup("".join(html))
+
+    def render_fragment(self, template_name, index, this_chapter_name,
+                        this_module_name):
+        """
+        Render a sidebar with no active section, see 'fragments'. Returns
+        None if its section entries can't be told apart.
+        """
+        section_names = SectionNames()
+        self.rendered += 1
+        html = get_template(template_name).render(
+            chapters=index.children,
+            this_chapter_name=this_chapter_name,
+            this_module_name=this_module_name,
+            this_section_name=section_names
+        )
+        parts = SECTION_CLASS.split(html)
+        if len(parts) // 2 != len(section_names.names):
+            return None
+        return parts, section_names.names
+
+
+class SharedNavSidebars:
+    """
+    Sidebars for the shared navigation mode, in which pages don't contain
+    the sidebar's entries. They are built in the browser from the
+    navigation tree, written once as SHARED_NAV_SCRIPT, and pages only hold
+    the names of their chapter, module and section, and links to the
+    chapters for browsers without JavaScript.
+
+    Attributes
+    ----------
+    rendered : int
+        Number of sidebars rendered.
+    """
+
+    def __init__(self):
+        self.rendered = 0
+
+    def clear(self):
+        return
+
+    def templates(self):
+        """Templates rendered besides those the pages' templates include."""
+        return [get_template(SHARED_NAV_TEMPLATE_FILENAME)]
+
+    def render(self, template_name, index, this_chapter_name, this_module_name,
+               this_section_name):
+        """
+        Return the sidebar for a page, in place of the one 'template_name'
+        would render. See SidebarCache.render().
+        """
+        collapse, all_sections = SHARED_NAV_VARIANTS[template_name]
+        self.rendered += 1
+        return Markup(get_template(SHARED_NAV_TEMPLATE_FILENAME).render(
+            chapters=index.children,
+            collapse=collapse,
+            all_sections=all_sections,
+            this_chapter_name=this_chapter_name,
+            this_module_name=this_module_name,
+            this_section_name=this_section_name
+        ))
+
+
+def navigation_tree(index):
+    """
+    The site's chapters, modules, sections and subsections, as read by
+    SHARED_NAV_SCRIPT, with the hrefs they have from index.html, i.e.
+    relative to the html directory (or absolute, for external chapters).
+    """
+    index.update_href(index.path)
+
+    def section(page, depth=0):
+        subsections = page.children if depth == 0 else []
+        return [page.name, page.href,
+                [section(child, depth + 1) for child in subsections]]
+
+    return [[chapter.name, chapter.href,
+             [[module.long_name, module.short_name, module.author,
+               module.href, [section(page) for page in module.children]]
+              for module in chapter.children]]
+            for chapter in index.children]
+
+
+class SectionNames:
+    """
+    Stand-in for the active section's name while rendering a fragment. The
+    sidebar templates compare every section and subsection name to it, right
+    where they write that entry's class attribute, so it records the names in
+    the order the class attributes appear, and matches none of them.
+    """
+
+    def __init__(self):
+        self.names = []
+
+    def __eq__(self, other):
+        self.names.append(other)
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
@@ -1,4 +1,5 @@
 from .str_ops import page_num_to_arabic
+from collections import Counter
 import pathlib
 
 
@@ -67,6 +68,13 @@ class PathTable:
 
         return
 
+    def move(self, old_path, new_path):
+        """
+        Point an already registered path at a new location, e.g. where a
+        file was converted to another format, keeping its entity.
+        """
+        self.path_table[old_path]['path'] = new_path
+
 
 class PageTable:
     def __init__(self):
@@ -224,3 +232,61 @@ class FigureTable:
         if figure_num in self.figures:
             return self.figures[figure_num]
         return None
+
+
+class LinkPayloadTable:
+    """
+    Memo of the attributes that links to figures and tables resolve to.
+
+    Resolving such a link means looking up the figure or table, building
+    its caption and, for tables, rewriting the links inside the table's
+    HTML. The result only depends on the link's old path, so it is computed
+    the first time a link to it is seen during a build, and reused by every
+    other link to it.
+
+    Attributes
+    ----------
+    payloads : dict
+        Attribute dicts to set on the links, keyed by (kind, old path).
+    computed : Counter
+        Number of payloads computed, by kind of link.
+    reused : Counter
+        Number of times a payload was reused instead of being computed
+        again, by kind of link.
+    """
+
+    def __init__(self):
+        self.payloads = {}
+        self.computed = Counter()
+        self.reused = Counter()
+
+    def get(self, kind, old_path, compute):
+        """
+        Return the payload of a 'kind' link to old_path, calling compute() to
+        make it if it isn't known yet. The payload must not be modified.
+        """
+        key = (kind, old_path)
+        if key in self.payloads:
+            self.reused[kind] += 1
+        else:
+            self.payloads[key] = compute()
+            self.computed[kind] += 1
+        return self.payloads[key]
+
+    def take_counts(self):
+        """Return the counters and reset them, e.g. to collect them from workers."""
+        counts = (self.computed, self.reused)
+        self.computed = Counter()
+        self.reused = Counter()
+        return counts
+
+    def add_counts(self, computed, reused):
+        self.computed.update(computed)
+        self.reused.update(reused)
+
+    def summary(self):
+        return "Link payloads: {} computed, {} reused ({}).".format(
+            sum(self.computed.values()), sum(self.reused.values()),
+            ", ".join("{} {} of {}".format(kind, self.reused[kind],
+                                           self.reused[kind] + self.computed[kind])
+                      for kind in sorted(self.computed)))
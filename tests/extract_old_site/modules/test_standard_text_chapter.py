@@ -1,4 +1,5 @@
 from src.extract_old_site.modules import standard_text_chapter as text
+from src.extract_old_site.utilities.frame_cache import FrameCache
 import pathlib
 import pytest
 import os
@@ -1186,7 +1187,18 @@ def test_extract_full_module():
     }
 
 def test_extract_full_chapter():
-    pass
+    def extract_module_file_names(module_file_names, current_dir_path,
+                                  dig_parent_path, readfile):
+        return {"files": module_file_names, "pages": {}}
+    assert text.extract_full_chapter(
+        ["tab10_2.html", "tab1.html", "tab10.html", "tab1_2.html", "tab2.html"],
+        "/dig/html/part2", pathlib.Path("C:/"), mock_readfile,
+        extract_full_module=extract_module_file_names
+    )["modules"] == [
+        {"files": ["tab1.html", "tab1_2.html"]},
+        {"files": ["tab10.html", "tab10_2.html"]},
+        {"files": ["tab2.html"]}
+    ]
 
 def test_extract_standard_part():
     with mock.patch.object(pathlib.Path, "iterdir") as mock_iterdir:
@@ -1266,3 +1278,19 @@ def test_extract_standard_part():
                 }
             }
         }
+
+def test_extract_standard_part_with_frame_cache():
+    with mock.patch.object(pathlib.Path, "iterdir") as mock_iterdir:
+        iterdir_filename_paths = [
+            "tab0.html", "tab0_2.html", "tab0_3.html",
+            "tab0_4.html", "tab0_5.html", "tab0_6.html",
+            "tab1.html", "tab1_2.html", "tabs0.html", "tabs1.html"
+        ]
+        mock_iterdir.return_value = [pathlib.Path(filename) for filename in iterdir_filename_paths]
+        expected = text.extract_standard_part("part2", "C:/", mock_readfile)
+        cache = FrameCache(mock_readfile)
+        assert text.extract_standard_part("part2", "C:/", cache) == expected
+        # tabs0.html and tabs1.html are each read and parsed only once
+        assert cache.text_hits > 0
+        assert cache.parse_hits > 0
+        assert cache.parse_misses < 2 * 8
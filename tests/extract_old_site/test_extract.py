@@ -0,0 +1,37 @@
+from src.extract_old_site import extract
+from src.extract_old_site.utilities.manifest import path_key
+import pathlib
+import pytest
+
+
+def extract_test_step(dig_parent_dir, readfile, frame_cache):
+    html_dir = pathlib.Path(dig_parent_dir) / "dig/html/started"
+    return [("a.json", {'a': readfile("a.html", html_dir),
+                        'b': frame_cache("b.html", html_dir)}, True)]
+
+
+def test_step_runner_records_inputs(tmp_path):
+    html_dir = tmp_path / "dig/html/started"
+    html_dir.mkdir(parents=True)
+    (html_dir / "a.html").write_text("a")
+    (html_dir / "b.html").write_text("b")
+    (tmp_path / "dig/html/images").mkdir()
+    (tmp_path / "dig/html/images/c.gif").write_text("c")
+    step = {'name': "test", 'description': "test", 'function': extract_test_step,
+            'dirs': ["started"], 'extra_inputs': ["images/*"], 'requires': []}
+
+    runner = extract.StepRunner(str(tmp_path), prefetch=True)
+    outputs, input_paths, seconds = runner.run(step)
+    runner.close()
+
+    assert outputs == [("a.json", {'a': "a", 'b': "b"}, True)]
+    assert input_paths == {path_key(html_dir / "a.html"), path_key(html_dir / "b.html"),
+                           path_key(tmp_path / "dig/html/images/c.gif")}
+    assert seconds >= 0
+
+
+def test_run_steps_parallel_circular_requirements():
+    steps = [{'name': "a", 'requires': ["b"]}, {'name': "b", 'requires': ["a"]}]
+    with pytest.raises(ValueError):
+        extract.run_steps_parallel(steps, 2, (".", None, None, False, 256),
+                                   lambda *args: None)
@@ -0,0 +1,54 @@
+from src.extract_old_site.utilities import dig_inventory
+import os
+
+
+def make_dig(tmp_path):
+    html_dir = tmp_path / "dig/html"
+    for dir_name, filenames in {
+        "part2": ["tab1.html", "tab1_2.html", "tab10.html", "tab10_2.html",
+                  "tabs1.html", "body10_2.html", "report40a.html"],
+        "tables": ["table3.html", "table3_2.html", "tab2_4.html"],
+        "excavations": ["slid_azt.html", "slid_agr.mov.html", "exc_fg.html"]
+    }.items():
+        (html_dir / dir_name).mkdir(parents=True)
+        for filename in filenames:
+            (html_dir / dir_name / filename).write_text("")
+    return html_dir
+
+
+def test_scan(tmp_path):
+    html_dir = make_dig(tmp_path)
+    inventory = dig_inventory.DigInventory.scan(html_dir)
+    part2 = html_dir / "part2"
+    assert inventory.files(part2) == [part2 / name for name in os.listdir(part2)]
+    assert {path.name for path in inventory.files(part2, 'tab')} == {
+        "tab1.html", "tab1_2.html", "tab10.html", "tab10_2.html"}
+    assert [(path.name, match.group('table'))
+            for path, match in inventory.matches(html_dir / "tables", 'table')
+            if path.name == "table3_2.html"] == [("table3_2.html", "3")]
+    assert [path.name for path in inventory.files(html_dir / "excavations", 'slide')] \
+        == ["slid_azt.html"]
+    assert inventory.stats() == "13 files in 4 directories"
+
+
+def test_kind():
+    assert dig_inventory.kind("tab10_2.html") == 'tab'
+    assert dig_inventory.kind("tabs0.html") == 'tabs'
+    assert dig_inventory.kind("report40c.html") == 'report_c'
+    assert dig_inventory.kind("slid_ags.mpg.html") == 'video_slide'
+    assert dig_inventory.kind("db6_1.html") == 'db'
+    assert dig_inventory.kind("foot6.html") is None
+
+
+def test_files_through_inventory_in_use(tmp_path):
+    html_dir = make_dig(tmp_path)
+    tables_dir = html_dir / "tables"
+    inventory = dig_inventory.DigInventory.scan(html_dir)
+    (tables_dir / "tab3_6.html").write_text("")
+    dig_inventory.use_inventory(inventory)
+    try:
+        # Listed when the inventory was taken
+        assert len(dig_inventory.files(tables_dir, 'tab')) == 1
+    finally:
+        dig_inventory.use_inventory(None)
+    assert len(dig_inventory.files(tables_dir, 'tab')) == 2
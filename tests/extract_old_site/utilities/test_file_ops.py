@@ -1,7 +1,9 @@
 from src.extract_old_site.utilities import file_ops
+from concurrent import futures
 from unittest import mock
 import pathlib
 import pytest
+import os
 
 
 index_html_mock_content = "<b>Excavating Occaneechi Town</b>"
@@ -30,3 +32,66 @@ def test_readfile():#filename, parent_dir_path_obj, expected_file_contents):
     with mock.patch("builtins.open", mock.mock_open(read_data=version_html_mock_content)) as mock_file:
         assert file_ops.readfile("version.html", pathlib.Path("C:/dig/html")) == version_html_mock_content
         mock_file.assert_called_with(pathlib.Path("C:/dig/html/version.html"), 'r', encoding='ISO-8859-1')
+
+
+def test_prefetch_reader(tmp_path):
+    for name in ["a.html", "b.html", "c.txt"]:
+        (tmp_path / name).write_text(name * 10)
+    readfile = mock.Mock(side_effect=file_ops.readfile)
+    reader = file_ops.PrefetchReader(readfile=readfile)
+    reader.prefetch(tmp_path / "*.html")
+    assert reader(pathlib.Path("a.html"), tmp_path) == "a.html" * 10
+    assert reader("b.html", tmp_path / "sub" / "..") == "b.html" * 10
+    # Served prefetched contents are dropped, later reads go to the file
+    assert reader("a.html", tmp_path) == "a.html" * 10
+    assert reader("c.txt", tmp_path) == "c.txt" * 10
+    assert (reader.prefetched_reads, reader.direct_reads) == (2, 2)
+    assert readfile.call_count == 4
+    reader.close()
+
+
+def wait_for_reads(reader):
+    while True:
+        with reader.lock:
+            in_flight = list(reader.in_flight)
+        if not in_flight:
+            return
+        futures.wait(in_flight)
+
+
+def test_prefetch_reader_memory_cap(tmp_path):
+    for i in range(5):
+        (tmp_path / "{}.html".format(i)).write_text("x" * 100)
+    reader = file_ops.PrefetchReader(max_bytes=250, max_workers=1)
+    reader.prefetch(tmp_path)
+    wait_for_reads(reader)
+    # Sizes are only known once read, the last file read goes over the cap
+    assert len(reader.pending) == 3
+    assert reader.held_bytes == 300
+    # Serving a prefetched file makes room for the next one
+    assert reader("0.html", tmp_path) == "x" * 100
+    wait_for_reads(reader)
+    assert sorted(reader.pending) == [
+        os.path.normpath(os.path.abspath(tmp_path / name))
+        for name in ["1.html", "2.html", "3.html"]]
+    reader.clear()
+    assert reader("3.html", tmp_path) == "x" * 100
+    assert reader.direct_reads == 1
+    reader.close()
+
+
+def test_prefetch_reader_releases_skipped_files(tmp_path):
+    for i in range(5):
+        (tmp_path / "{}.html".format(i)).write_text("x" * 100)
+    reader = file_ops.PrefetchReader(max_bytes=150, max_workers=1)
+    reader.prefetch(tmp_path)
+    wait_for_reads(reader)
+    assert reader.held_bytes == 200
+    # 0.html and 1.html are never asked for, and stop holding the cap
+    assert reader("3.html", tmp_path) == "x" * 100
+    wait_for_reads(reader)
+    assert (reader.direct_reads, reader.released) == (1, 2)
+    assert list(reader.pending) == [os.path.normpath(os.path.abspath(tmp_path / "4.html"))]
+    assert reader("4.html", tmp_path) == "x" * 100
+    assert reader.prefetched_reads == 1
+    reader.close()
@@ -0,0 +1,61 @@
+from src.extract_old_site.utilities.frame_cache import (
+    FrameCache, frame_sources, parse_frame, resolve_frameset
+)
+from unittest import mock
+import pathlib
+
+
+def test_frame_cache_reads_once():
+    readfile = mock.Mock(return_value="<p>text</p>")
+    cache = FrameCache(readfile)
+    assert cache("a.html", pathlib.Path("/dig/html/part2")) == "<p>text</p>"
+    assert cache("../part2/a.html", pathlib.Path("/dig/html/part2")) == "<p>text</p>"
+    readfile.assert_called_once_with("a.html", pathlib.Path("/dig/html/part2"))
+    assert (cache.text_hits, cache.text_misses) == (1, 1)
+
+
+def test_frame_cache_parse():
+    cache = FrameCache(lambda filename, dir_path: "<p>" + filename + "</p>")
+    func = mock.Mock(side_effect=lambda html, arg: {'html': html, 'arg': arg, 'list': []})
+    func.__module__ = 'tests'
+    func.__name__ = 'func'
+    html = cache("a.html", pathlib.Path("/dig"))
+
+    first = cache.parse(func, html, "x")
+    first['list'].append(1)  # Mutating a result must not affect the cache
+    second = cache.parse(func, html, "x")
+    assert second == {'html': "<p>a.html</p>", 'arg': "x", 'list': []}
+    func.assert_called_once()
+
+    # Different arguments or parsers are separate entries
+    cache.parse(func, html, "y")
+    cache.parse(func, html, "x", parser='html.parser')
+    assert (cache.parse_hits, cache.parse_misses) == (1, 3)
+
+
+def test_parse_frame_without_cache():
+    func = mock.Mock(return_value="result")
+    assert parse_frame(mock.Mock(), func, "<p></p>", "x") == "result"
+    func.assert_called_once_with("<p></p>", "x")
+
+
+def test_resolve_frameset():
+    html = """<HTML><HEAD><TITLE>Report</TITLE></HEAD>
+    <!-- <frame src="commented.html"> -->
+    <FRAMESET ROWS="60,*">
+      <FRAME SRC="tabs0.html" NAME="top">
+      <frameset cols="180,*"><frame src='index0_1.html'/><frame src="report40.html?a=1&amp;b=2"></frameset>
+    </FRAMESET></HTML>"""
+    assert resolve_frameset(html) == ["tabs0.html", "index0_1.html", "report40.html?a=1&b=2"]
+
+
+def test_frame_sources_through_frame_graph():
+    html = '<frameset><frame src="a.html"><frame src="b.html"></frameset>'
+    cache = FrameCache(lambda filename, dir_path: html)
+    page = cache("tab0.html", pathlib.Path("/dig/html/part2"))
+    assert frame_sources(cache, page) == ["a.html", "b.html"]
+    frame_sources(cache, page).append("c.html")
+    assert frame_sources(cache, page) == ["a.html", "b.html"]
+    assert list(cache.frame_graph.values()) == [["a.html", "b.html"]]
+    assert (cache.frameset_hits, cache.frameset_misses) == (2, 1)
+    assert frame_sources(mock.Mock(), html) == ["a.html", "b.html"]
@@ -0,0 +1,56 @@
+from src.extract_old_site.utilities import image_dimensions
+from src.extract_old_site.utilities.manifest import ExtractionManifest, path_key
+from PIL import Image
+import os
+
+
+def test_dimension_cache(tmp_path):
+    image_path = tmp_path / "a.gif"
+    Image.new("RGB", (30, 20)).save(image_path)
+    cache_path = tmp_path / image_dimensions.CACHE_FILENAME
+
+    cache = image_dimensions.DimensionCache(cache_path)
+    assert cache.dimensions(image_path) == (30, 20)
+    assert cache.dimensions(image_path) == (30, 20)
+    assert (cache.probed, cache.cached) == (1, 1)
+    cache.write()
+
+    # Later runs don't read unchanged images, or probe touched ones again
+    cache = image_dimensions.DimensionCache(cache_path)
+    assert cache.dimensions(image_path) == (30, 20)
+    stat = os.stat(image_path)
+    os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.dimensions(image_path) == (30, 20)
+    Image.new("RGB", (40, 20)).save(image_path)
+    assert cache.dimensions(image_path) == (40, 20)
+    assert (cache.cached, cache.rehashed, cache.probed) == (1, 1, 1)
+
+
+def test_dimensions_through_cache_in_use(tmp_path):
+    image_path = tmp_path / "a.png"
+    Image.new("RGB", (5, 7)).save(image_path)
+    cache = image_dimensions.DimensionCache()
+    image_dimensions.use_cache(cache)
+    try:
+        assert image_dimensions.dimensions(image_path) == (5, 7)
+    finally:
+        image_dimensions.use_cache(None)
+    assert cache.probed == 1
+    assert image_dimensions.dimensions(image_path) == (5, 7)
+    assert cache.probed == 1
+
+
+def test_manifest_reuses_known_records(tmp_path):
+    image_path = tmp_path / "a.png"
+    Image.new("RGB", (5, 7)).save(image_path)
+    cache = image_dimensions.DimensionCache()
+    cache.dimensions(image_path)
+    key = path_key(image_path)
+    # Hashing the image again would give a different sha1
+    cache.records[key]['sha1'] = "known"
+
+    manifest = ExtractionManifest(tmp_path / "manifest.json", {})
+    manifest.record("step", {key}, [], cache.records)
+    assert manifest.steps["step"]['files'][key]['sha1'] == "known"
+    manifest.record("other step", {key}, [])
+    assert manifest.steps["other step"]['files'][key]['sha1'] == "known"
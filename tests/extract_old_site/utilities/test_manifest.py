@@ -0,0 +1,67 @@
+from src.extract_old_site.utilities.manifest import (
+    ExtractionManifest, InputRecorder, path_key
+)
+from src.extract_old_site.utilities import file_ops
+import os
+
+
+def make_inputs(tmp_path):
+    dig_dir = tmp_path / "dig"
+    dig_dir.mkdir()
+    (dig_dir / "a.html").write_text("<p>a</p>")
+    (dig_dir / "b.html").write_text("<p>b</p>")
+    out_dir = tmp_path / "jsons"
+    out_dir.mkdir()
+    (out_dir / "a.json").write_text("{}")
+    return dig_dir, out_dir
+
+
+def run_step(manifest, dig_dir):
+    recorder = InputRecorder(file_ops.readfile)
+    recorder("a.html", dig_dir)
+    manifest.record("step", recorder.paths, ["a.json"])
+    manifest.write()
+    return recorder
+
+
+def test_input_recorder(tmp_path):
+    dig_dir, out_dir = make_inputs(tmp_path)
+    recorder = InputRecorder(file_ops.readfile)
+    assert recorder("../dig/a.html", dig_dir) == "<p>a</p>"
+    assert recorder.paths == {path_key(dig_dir / "a.html")}
+
+
+def test_manifest_fresh_after_record(tmp_path):
+    dig_dir, out_dir = make_inputs(tmp_path)
+    manifest = ExtractionManifest(out_dir / "manifest.json", {'code': "1"})
+    assert not manifest.is_fresh("step", out_dir)
+    run_step(manifest, dig_dir)
+
+    reloaded = ExtractionManifest(out_dir / "manifest.json", {'code': "1"})
+    assert reloaded.is_fresh("step", out_dir)
+    assert not reloaded.is_fresh("other step", out_dir)
+    # Different code or config invalidates every step
+    assert not ExtractionManifest(out_dir / "manifest.json", {'code': "2"}).is_fresh("step", out_dir)
+
+
+def test_manifest_stale_inputs(tmp_path):
+    dig_dir, out_dir = make_inputs(tmp_path)
+    manifest = ExtractionManifest(out_dir / "manifest.json", {})
+    run_step(manifest, dig_dir)
+
+    # Touching a file without changing it is fine
+    stat = os.stat(dig_dir / "a.html")
+    os.utime(dig_dir / "a.html", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert manifest.is_fresh("step", out_dir)
+
+    (dig_dir / "a.html").write_text("<p>A</p>")
+    assert not manifest.is_fresh("step", out_dir)
+    run_step(manifest, dig_dir)
+    assert manifest.is_fresh("step", out_dir)
+
+    # Adding a file next to the inputs, or removing an output, reruns the step
+    (dig_dir / "c.html").write_text("<p>c</p>")
+    assert not manifest.is_fresh("step", out_dir)
+    run_step(manifest, dig_dir)
+    (out_dir / "a.json").unlink()
+    assert not manifest.is_fresh("step", out_dir)
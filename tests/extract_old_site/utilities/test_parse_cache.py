@@ -0,0 +1,65 @@
+from src.extract_old_site.utilities import parse_cache, parsers
+from unittest import mock
+import os
+
+
+def make_extractor():
+    func = mock.Mock(side_effect=lambda html, arg: {'html': html, 'arg': arg})
+    func.__module__ = 'tests'
+    func.__qualname__ = 'func'
+    return func
+
+
+def test_parse_cache(tmp_path):
+    func = make_extractor()
+    cache = parse_cache.ParseCache(tmp_path, "code1")
+    assert cache.call(func, "<p>a</p>", "x") == {'html': "<p>a</p>", 'arg': "x"}
+    cache.call(func, "<p>a</p>", "x")['arg'] = "changed"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Kept between runs, for the same html, arguments, code and parsers
+    cache = parse_cache.ParseCache(tmp_path, "code1")
+    assert cache.call(func, "<p>a</p>", "x") == {'html': "<p>a</p>", 'arg': "x"}
+    cache.call(func, "<p>b</p>", "x")
+    cache.call(func, "<p>a</p>", "y")
+    parsers.configure('html.parser')
+    try:
+        cache.call(func, "<p>a</p>", "x")
+    finally:
+        parsers.configure()
+    parse_cache.ParseCache(tmp_path, "code2").call(func, "<p>a</p>", "x")
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert func.call_count == 5
+
+
+def test_evict(tmp_path):
+    func = make_extractor()
+    cache = parse_cache.ParseCache(tmp_path, "code1")
+    for i in range(4):
+        cache.call(func, "<p>" + str(i) + "</p>", "x")
+        path = cache.path(cache.key(func, "<p>" + str(i) + "</p>", ("x",)))
+        os.utime(str(path), (1000 + i, 1000 + i))
+    size = os.path.getsize(str(path))
+    cache.max_bytes = 2 * size
+    assert cache.evict() == 2 * size
+    assert cache.evicted == 2
+    cache.call(func, "<p>3</p>", "x")
+    cache.call(func, "<p>0</p>", "x")
+    assert (cache.hits, cache.misses) == (1, 5)
+
+
+def test_persistent_through_cache_in_use(tmp_path):
+    calls = []
+
+    @parse_cache.persistent
+    def extract(html_string, arg):
+        calls.append(html_string)
+        return html_string + arg
+
+    assert extract("a", "b") == "ab"
+    parse_cache.use_cache(parse_cache.ParseCache(tmp_path, "code1"))
+    try:
+        assert [extract("a", "b"), extract("a", "b")] == ["ab", "ab"]
+    finally:
+        parse_cache.use_cache(None)
+    assert calls == ["a", "a"]
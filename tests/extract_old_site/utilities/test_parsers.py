@@ -0,0 +1,40 @@
+from src.extract_old_site.utilities import parsers
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset_parsers():
+    yield
+    parsers.configure()
+
+
+def test_parser_for_default():
+    parsers.configure("Default")
+    assert parsers.parser_for('standard_text_chapter.extract_topbar', 'html5lib') == 'html5lib'
+    assert parsers.parser_for('standard_text_chapter.extract_page_title', 'html.parser') == 'html.parser'
+
+
+def test_parser_for_configured():
+    parsers.configure('html.parser', {'tables.extract_table_image': 'html5lib'})
+    assert parsers.parser_for('standard_text_chapter.extract_topbar', 'html5lib') == 'html.parser'
+    # Functions depending on html5lib keep it, overrides win over everything
+    assert parsers.parser_for('standard_text_chapter.extract_sidebar', 'html5lib') == 'html5lib'
+    assert parsers.parser_for('tables.extract_table_image', 'html5lib') == 'html5lib'
+
+    parsers.configure('html.parser', {'standard_text_chapter.extract_sidebar': 'html.parser'})
+    assert parsers.parser_for('standard_text_chapter.extract_sidebar', 'html5lib') == 'html.parser'
+
+
+def test_configure_unknown_parser():
+    with pytest.raises(ValueError):
+        parsers.configure('beautifulparser')
+    with pytest.raises(ValueError):
+        parsers.configure(None, {'tables.extract_table_image': 'beautifulparser'})
+
+
+def test_make_soup():
+    parsers.configure('html.parser')
+    soup = parsers.make_soup("<b>text</b>", 'tables.extract_table_header')
+    assert str(soup) == "<b>text</b>"
+    soup = parsers.make_soup("<b>text</b>", 'standard_text_chapter.extract_sidebar')
+    assert str(soup.body) == "<body><b>text</b></body>"
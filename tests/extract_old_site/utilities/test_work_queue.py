@@ -0,0 +1,36 @@
+from src.extract_old_site.utilities import work_queue
+from src.extract_old_site.utilities.manifest import path_key
+
+
+def extract_length(filepath, dig_parent_dir, readfile):
+    return filepath.name, len(readfile(filepath.name, filepath.parent))
+
+
+def test_map_files_without_queue(tmp_path):
+    (tmp_path / "a.html").write_text("aaa")
+    read = []
+
+    def readfile(filename, dir_path):
+        read.append(filename)
+        return (dir_path / filename).read_text()
+    assert work_queue.map_files(extract_length, [tmp_path / "a.html"],
+                                tmp_path, readfile) == [("a.html", 3)]
+    assert read == ["a.html"]
+
+
+def test_work_queue(tmp_path):
+    paths = []
+    for i in range(40):
+        paths.append(tmp_path / "exc_{:02}.html".format(i))
+        paths[-1].write_text("x" * i)
+    queue = work_queue.WorkQueue(2, max_pending=3)
+    work_queue.use_queue(queue)
+    try:
+        results = work_queue.map_files(extract_length, paths, str(tmp_path), None)
+    finally:
+        work_queue.use_queue(None)
+        queue.close()
+    # In the order given, whichever worker finished first
+    assert results == [(path.name, i) for i, path in enumerate(paths)]
+    assert queue.paths_read == {path_key(path) for path in paths}
+    assert queue.files_done == 40
@@ -91,7 +91,7 @@ def test_excavation_page_write(mock_super_write, mock_update_content, mock_rende
     )
 
 
-    with patch('src.generate_new_site.site_data_structs.excavation.Path.open', mock.mock_open()):
+    with patch.object(Path, 'open', mock.mock_open()):
         page.write()
 
     # Assert that content is updated
@@ -113,7 +113,9 @@ def test_excavation_page_write(mock_super_write, mock_update_content, mock_rende
             'prev_page_href': Path("relpath"),  # TODO as_posix()?
             'this_page_num': page.page_num,
             'next_page_href': Path("relpath")  # TODO as_posix()?
-        }
+        },
+        modal_data_scripts=module.parent.parent.modal_data.scripts,
+        sidebar_html=module.parent.parent.sidebars.render.return_value
     )
 
     # Assert that we call super().write()
@@ -162,3 +164,25 @@ def test_excavation_page_update_href(mock_rel_path):
         figure.update_href.assert_called_once_with(Path("test"))
     for re in related_elements:
         assert re.href == Path("updated").as_posix()
+
+
+#####################################
+# Test description and figure links #
+#####################################
+
+def test_described_element_name():
+    assert excavation.described_element_name("Feature 4 Description") == "Feature 4"
+    assert excavation.described_element_name(" Sq. 8 Description ") == "Sq. 8"
+    # Only the suffix is removed, not any of its characters
+    assert excavation.described_element_name("Structure Description") == "Structure"
+    assert excavation.described_element_name("Posthole Description") == "Posthole"
+
+
+def test_excavation_page_add_figure_once():
+    page = excavation.ExcavationPage(
+        name="Feature 1", path=Path("f1.html"), parent=None,
+        mini_map_orig_path=None, info={})
+    figures = [mock.Mock(), mock.Mock()]
+    for figure in figures + figures:
+        page.add_figure(figure)
+    assert page.figures == figures
@@ -37,6 +37,7 @@ def test_figure_update_href(mock_rel_path):
     # Mock parent
     figures = mock.Mock()
     figures.parent.pathtable.get_path = mock.Mock(return_value=Path("tablepath"))
+    figures.parent.image_derivatives = None
 
     # Instantiate figure
     fig = figure.Figure(
@@ -67,3 +68,41 @@ def test_figure_update_href(mock_rel_path):
     assert fig.img_path == Path("updated").as_posix()
     for ce in clickable_areas:
         assert ce.href == Path("updated").as_posix()
+    assert fig.srcset is None
+    assert fig.thumbnail_path == fig.img_path
+    assert (fig.width, fig.height) == (0, 0)
+
+
+def test_figure_update_href_derivatives():
+    figures = mock.Mock()
+    figures.parent.pathtable.get_path = mock.Mock(
+        return_value=Path("/site/imgs/s1/a.jpg"))
+    figures.parent.image_derivatives.imgs_dir = Path("/site/imgs")
+    figures.parent.image_derivatives.get = mock.Mock(return_value={
+        'path': "s1/a.jpg",
+        'width': 400,
+        'height': 300,
+        'sizes': [["responsive/s1/a-160w.jpg", 160, 120, 1000],
+                  ["responsive/s1/a-320w.jpg", 320, 240, 3000]],
+        'thumbnail': ["responsive/s1/a-thumb.jpg", 120, 90, 500]
+    })
+    fig = figure.Figure(
+        figure_num=1,
+        caption=None,
+        img_orig_path=Path("/dig/html/images/s1/a.jpg"),
+        figure_path=Path("figpath"),
+        path=Path("/site/html/figures/figure_0001.html"),
+        parent=figures,
+        orig_width=200,
+        orig_height=150
+    )
+
+    fig.update_href(Path("/site/html/excavations/page.html"))
+
+    assert fig.img_path == "../../imgs/s1/a.jpg"
+    assert fig.srcset == (
+        "../../imgs/responsive/s1/a-160w.jpg 160w, "
+        "../../imgs/responsive/s1/a-320w.jpg 320w, "
+        "../../imgs/s1/a.jpg 400w")
+    assert fig.thumbnail_path == "../../imgs/responsive/s1/a-thumb.jpg"
+    assert (fig.width, fig.height) == (400, 300)
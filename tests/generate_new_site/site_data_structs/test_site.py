@@ -141,3 +141,62 @@ def test_update_href(mock_rel_path):
                 assert page.href == Path("updated").as_posix()
                 for sub_page in page.children:
                     assert sub_page.href == Path("updated").as_posix()
+
+
+def test_update_href_same_directory():
+    index = site.Index(Path("/out/index.html"))
+    chapter = site.SiteChapter(name="c", parent=index, path=Path("/out/c/c.html"))
+    index.add_child(chapter)
+
+    index.update_href(Path("/out/c/p1.html"))
+    assert chapter.href == "c.html"
+
+    # Pages in the same directory reuse the existing hrefs
+    with patch.object(chapter, 'update_href') as mock_chapter_href:
+        index.update_href(Path("/out/c/p2.html"))
+        mock_chapter_href.assert_not_called()
+
+    # A different directory walks the tree again
+    index.update_href(Path("/out/index.html"))
+    assert chapter.href == "c/c.html"
+
+    # Adding a child invalidates the snapshot
+    index.add_child(site.SiteChapter(name="d", parent=index, path=Path("/out/d.html")))
+    assert index.href_dir is None
+
+    # At any depth of the tree
+    module = site.SiteModule(short_name="m", parent=chapter, path=Path("/out/c/m.html"))
+    page = site.SitePage(name="p", path=Path("/out/c/p.html"), content=[], parent=module)
+    for parent, child in [(chapter, module), (module, page),
+                          (page, site.SitePage(name="s", path=Path("/out/c/s.html"),
+                                               content=[], parent=None))]:
+        index.update_href(Path("/out/index.html"))
+        parent.add_child(child)
+        assert index.href_dir is None
+    index.update_href(Path("/out/index.html"))
+    assert page.children[0].href == "c/s.html"
+
+
+def test_write_tasks():
+    index = site.Index(Path("index.html"))
+    for c in range(2):
+        chapter = site.SiteChapter(name="c{}".format(c), parent=index)
+        index.children.append(chapter)
+        for m in range(2):
+            module = site.SiteModule(
+                short_name="c{}m{}".format(c, m), parent=chapter,
+                path=Path("c{}/m{}.html".format(c, m)))
+            chapter.children.append(module)
+            for p in range(3):
+                module.children.append(site.SitePage(
+                    name="p{}".format(p), path=Path("c{}/m{}p{}.html".format(c, m, p)),
+                    content=None, parent=module, page_num=None))
+
+    tasks = index.write_tasks()
+
+    assert len(tasks) == 12
+    assert tasks[0] == (Path("c0/m0.html"), (0, 0, 0))
+    assert tasks[-1] == (Path("c1/m1.html"), (1, 1, 2))
+    for start_path, page_key in tasks:
+        page = index.get_page(page_key)
+        assert page.parent.path == start_path
@@ -169,7 +169,7 @@ def test_text_page_write(mock_super_write, mock_update_content, mock_render, moc
         page_num="5"
     )
 
-    with patch('src.generate_new_site.site_data_structs.text.Path.open', mock.mock_open()):
+    with patch.object(Path, 'open', mock.mock_open()):
         page.write()
 
         # Assert next and prev paths are made relative
@@ -192,7 +192,9 @@ def test_text_page_write(mock_super_write, mock_update_content, mock_render, moc
                 'prev_page_href': Path("relpath").as_posix(),
                 'this_page_num': page.page_num,
                 'next_page_href': Path("relpath").as_posix()
-            }
+            },
+            modal_data_scripts=module.parent.parent.modal_data.scripts,
+            sidebar_html=module.parent.parent.sidebars.render.return_value
         )
         # Assert that we call super().write()
         mock_super_write.assert_called()
@@ -0,0 +1,86 @@
+from src.generate_new_site.utilities import asset_pipeline
+
+PAGE = """<html><head>
+    <link href="../../assets/css/page.css" rel="stylesheet">
+    <link rel="stylesheet" href="../../assets/css/common.css">
+    <link rel="stylesheet" href="https://example.com/font.css">
+</head><body class="used">
+  <!-- <script src="../../assets/js/commented.js"></script> -->
+  <script src="../../assets/js/first.js"></script>
+  <script src="https://example.com/library.js"></script>
+  <script src="../../assets/js/second.js"></script>
+  <script src="../../assets/data/data.js"></script>
+  <script src="../../assets/js/generated.js"></script>
+</body></html>
+"""
+
+
+def make_assets(assets_in):
+    (assets_in / "css").mkdir(parents=True)
+    (assets_in / "js").mkdir()
+    (assets_in / "img").mkdir()
+    (assets_in / "css/page.css").write_text("body { color: red; }")
+    (assets_in / "css/common.css").write_text(
+        ".used { background: url(../img/used.png); }\n"
+        ".unused { background: url(../img/unused.png); }\n"
+        ".added-by-script { color: blue; }")
+    (assets_in / "js/first.js").write_text("// First\nvar a = 1;\n")
+    (assets_in / "js/second.js").write_text("el.classList.add('added-by-script');")
+    (assets_in / "img/used.png").write_bytes(b"png")
+    (assets_in / "img/unused.png").write_bytes(b"png")
+
+
+def test_asset_pipeline_build(tmp_path):
+    assets_in = tmp_path / "in"
+    make_assets(assets_in)
+    assets_out = tmp_path / "out/assets"
+    (assets_out / "data").mkdir(parents=True)
+    (assets_out / "data/data.js").write_text("window.data = {};")
+    (assets_out / "css").mkdir()
+    (assets_out / "css/stale.css").write_text("")
+    page_path = tmp_path / "out/html/chapter/page.html"
+    page_path.parent.mkdir(parents=True)
+    page_path.write_text(PAGE)
+
+    pipeline = asset_pipeline.AssetPipeline(
+        assets_in, assets_out, {"js/generated.js": "var b = 2;"},
+        kept_dirs=["data"])
+    pipeline.build(tmp_path / "out/html")
+
+    [css_bundle] = [path for path in pipeline.bundles if path.endswith('.css')]
+    first_bundle, last_bundle = [
+        path for path in pipeline.bundles if path.endswith('.js')]
+    assert pipeline.bundles[css_bundle] == ["css/page.css", "css/common.css"]
+    assert pipeline.bundles[first_bundle] == ["js/first.js"]
+    assert pipeline.bundles[last_bundle] == ["js/second.js", "js/generated.js"]
+
+    assert page_path.read_text() == """<html><head>
+    <link rel="stylesheet" href="../../assets/{}">
+    <link rel="stylesheet" href="https://example.com/font.css">
+</head><body class="used">
+  <!-- <script src="../../assets/js/commented.js"></script> -->
+  <script src="../../assets/{}"></script>
+  <script src="https://example.com/library.js"></script>
+  <script src="../../assets/data/data.js"></script>
+  <script src="../../assets/{}"></script>
+</body></html>
+""".format(css_bundle, first_bundle, last_bundle)
+
+    assert (assets_out / css_bundle).read_text() == (
+        "body{color:red}.used{background:url(../img/used.png)}"
+        ".added-by-script{color:blue}")
+    assert (assets_out / last_bundle).read_text() == (
+        "el.classList.add('added-by-script');\n;\nvar b=2;\n")
+    assert sorted(path.relative_to(assets_out).as_posix()
+                  for path in assets_out.rglob('*') if path.is_file()) == sorted(
+        [css_bundle, first_bundle, last_bundle, "data/data.js", "img/used.png"])
+    assert "js/commented.js" not in pipeline.missing
+
+    # Pages already using bundles come out the same
+    rewritten = page_path.read_text()
+    pipeline = asset_pipeline.AssetPipeline(
+        assets_in, assets_out, {"js/generated.js": "var b = 2;"},
+        kept_dirs=["data"])
+    pipeline.build(tmp_path / "out/html")
+    assert page_path.read_text() == rewritten
+    assert (assets_out / css_bundle).is_file()
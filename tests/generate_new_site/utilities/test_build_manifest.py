@@ -0,0 +1,120 @@
+from src.generate_new_site.utilities import build_manifest
+from src.generate_new_site.utilities.image_derivatives import ImageDerivatives
+from src.generate_new_site.site_data_structs import site
+from PIL import Image
+from jinja2 import DictLoader, Environment
+from unittest import mock
+
+
+##############################
+# template_fingerprint tests #
+##############################
+
+
+def test_template_fingerprint_follows_references():
+    templates = {
+        "base.html.jinja": "<html>{% block body %}{% endblock %}</html>",
+        "sidebar.html.jinja": "<nav></nav>",
+        "page.html.jinja": ('{% extends "base.html.jinja" %}{% block body %}'
+                            '{% include "sidebar.html.jinja" %}{% endblock %}'),
+        "other.html.jinja": '{% extends "base.html.jinja" %}'
+    }
+    env = Environment(loader=DictLoader(templates))
+    page = build_manifest.template_fingerprint(env.get_template("page.html.jinja"))
+    other = build_manifest.template_fingerprint(env.get_template("other.html.jinja"))
+
+    templates["sidebar.html.jinja"] = "<nav>changed</nav>"
+    env = Environment(loader=DictLoader(templates))
+    assert build_manifest.template_fingerprint(env.get_template("page.html.jinja")) != page
+    assert build_manifest.template_fingerprint(env.get_template("other.html.jinja")) == other
+
+
+#################
+# to_data tests #
+#################
+
+
+def test_to_data_skips_tree_links():
+    class Node:
+        pass
+
+    module = Node()
+    module.children = []
+    module.path = "module.html"
+    page = Node()
+    page.name = "Page"
+    page.parent = module
+    page.href = "../page.html"
+    page.linked = module
+    page.content = [{'type': 'paragraph', 'content': "text"}]
+
+    assert build_manifest.to_data(page) == {
+        'name': "Page",
+        'linked': "module.html",
+        'content': [[['content', "text"], ['type', 'paragraph']]]
+    }
+    # Equal dicts give the same data, whatever their key order
+    assert build_manifest.to_data({'b': 1, 'a': 2}) == build_manifest.to_data({'a': 2, 'b': 1})
+
+
+#######################
+# BuildManifest tests #
+#######################
+
+
+def test_build_manifest_stale_and_prune(tmp_path):
+    html_dir = tmp_path / "html"
+    html_dir.mkdir()
+    for name in ["a.html", "b.html", "old.html"]:
+        (html_dir / name).write_text(name)
+    manifest = build_manifest.BuildManifest(tmp_path / build_manifest.MANIFEST_FILENAME)
+    manifest.update({html_dir / "a.html": "1", html_dir / "b.html": "2",
+                     html_dir / "old.html": "3"})
+    manifest.write()
+
+    manifest = build_manifest.BuildManifest(tmp_path / build_manifest.MANIFEST_FILENAME)
+    fingerprints = {html_dir / "a.html": "1", html_dir / "b.html": "changed",
+                    html_dir / "new.html": "4"}
+    assert manifest.stale_paths(fingerprints) == {html_dir / "b.html", html_dir / "new.html"}
+
+    assert manifest.prune(fingerprints) == 1
+    assert not (html_dir / "old.html").exists()
+    assert (html_dir / "a.html").exists()
+
+
+def test_page_fingerprint_pagination():
+    pagetable = mock.Mock()
+    pagetable.get_prev_page_path.return_value = "prev.html"
+    pagetable.get_next_page_path.return_value = "next.html"
+    page = mock.Mock(page_num="3", templates=mock.Mock(return_value=[]))
+    page.parent.parent.parent.pagetable = pagetable
+
+    with mock.patch.object(build_manifest, 'to_data', return_value={}):
+        first = build_manifest.page_fingerprint(page, "site", {})
+        pagetable.get_next_page_path.return_value = "other.html"
+        second = build_manifest.page_fingerprint(page, "site", {})
+    assert first != second
+
+
+def test_page_fingerprints_unchanged_build(tmp_path):
+    imgs_dir = tmp_path / "imgs"
+    (imgs_dir / "s1").mkdir(parents=True)
+    Image.linear_gradient('L').resize((400, 200)).save(imgs_dir / "s1/a.jpg", 'JPEG')
+    fingerprints = []
+    made = []
+    # Derivatives made, then read back from their manifest
+    for _ in range(2):
+        index = site.Index(tmp_path / "html/index.html")
+        chapter = site.SiteChapter(name="c", parent=index, path=tmp_path / "html/c.html")
+        index.add_child(chapter)
+        module = site.SiteModule(short_name="m", parent=chapter)
+        chapter.add_child(module)
+        module.add_child(site.SitePage(name="p", path=tmp_path / "html/p.html",
+                                       content=[], parent=module))
+        derivatives = ImageDerivatives(imgs_dir)
+        derivatives.build([imgs_dir / "s1/a.jpg"])
+        index.add_image_derivatives(derivatives)
+        made.append(derivatives.made)
+        fingerprints.append(build_manifest.page_fingerprints(index))
+    assert made == [1, 0]
+    assert fingerprints[0] == fingerprints[1]
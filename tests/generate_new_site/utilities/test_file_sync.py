@@ -0,0 +1,82 @@
+from src.generate_new_site.utilities import file_sync
+import os
+
+
+def make_tree(dir_in):
+    (dir_in / "sub").mkdir(parents=True)
+    (dir_in / "a.txt").write_text("a")
+    (dir_in / "sub/b.txt").write_text("bb")
+    (dir_in / "sub/.DS_Store").write_text("")
+
+
+def set_mtime(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_tree_pairs(tmp_path):
+    make_tree(tmp_path / "in")
+    assert file_sync.tree_pairs(tmp_path / "in", tmp_path / "out") == [
+        (tmp_path / "in/a.txt", tmp_path / "out/a.txt"),
+        (tmp_path / "in/sub/b.txt", tmp_path / "out/sub/b.txt")]
+    assert file_sync.tree_pairs(tmp_path / "in", tmp_path / "out", {".md"}) == []
+
+
+def test_sync_compares_copies(tmp_path):
+    make_tree(tmp_path / "in")
+    pairs = file_sync.tree_pairs(tmp_path / "in", tmp_path / "out")
+    sync = file_sync.FileSync()
+    assert len(sync.sync(pairs)) == 2
+    assert (tmp_path / "out/sub/b.txt").read_text() == "bb"
+    assert sync.sync(pairs) == []
+    assert sync.up_to_date == 2
+
+    (tmp_path / "in/a.txt").write_text("new")
+    assert file_sync.FileSync().sync(pairs) == [tmp_path / "out/a.txt"]
+    assert (tmp_path / "out/a.txt").read_text() == "new"
+
+    # Same contents, different modification time
+    set_mtime(tmp_path / "in/a.txt", 10 ** 18)
+    assert len(file_sync.FileSync().sync(pairs)) == 1
+    set_mtime(tmp_path / "in/a.txt", 2 * 10 ** 18)
+    assert file_sync.FileSync(use_hash=True).sync(pairs) == []
+    assert file_sync.FileSync().sync(pairs) == []
+
+
+def test_sync_replaces_hard_links(tmp_path):
+    make_tree(tmp_path / "in")
+    pairs = file_sync.tree_pairs(tmp_path / "in", tmp_path / "out")
+    sync = file_sync.FileSync(hardlink=True)
+    sync.sync(pairs)
+    assert sync.methods['hardlink'] == 2
+    assert os.path.samefile(tmp_path / "in/a.txt", tmp_path / "out/a.txt")
+
+    # Copying over a hard link doesn't write through to the source
+    (tmp_path / "in/a.txt").unlink()
+    (tmp_path / "in/a.txt").write_text("new")
+    (tmp_path / "other.txt").write_text("other")
+    file_sync.copy_file(tmp_path / "other.txt", tmp_path / "out/a.txt")
+    assert (tmp_path / "in/a.txt").read_text() == "new"
+
+
+def test_sync_with_state(tmp_path):
+    make_tree(tmp_path / "in")
+    pairs = file_sync.tree_pairs(tmp_path / "in", tmp_path / "out")
+    state_path = tmp_path / "out/state.json"
+    assert len(file_sync.FileSync(state_path).sync(pairs)) == 2
+
+    # Copies modified or removed by later stages are left alone...
+    (tmp_path / "out/a.txt").write_text("modified")
+    (tmp_path / "out/sub/b.txt").unlink()
+    assert file_sync.FileSync(state_path).sync(pairs) == []
+    assert (tmp_path / "out/a.txt").read_text() == "modified"
+
+    # ...until their source changes
+    (tmp_path / "in/a.txt").write_text("new")
+    assert file_sync.FileSync(state_path).sync(pairs) == [tmp_path / "out/a.txt"]
+    assert (tmp_path / "out/a.txt").read_text() == "new"
+
+    set_mtime(tmp_path / "in/a.txt", 10 ** 18)
+    assert len(file_sync.FileSync(state_path, use_hash=True).sync(pairs)) == 1
+    set_mtime(tmp_path / "in/a.txt", 2 * 10 ** 18)
+    assert file_sync.FileSync(state_path, use_hash=True).sync(pairs) == []
+    assert file_sync.FileSync(state_path).sync(pairs) == []
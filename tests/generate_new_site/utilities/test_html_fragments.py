@@ -0,0 +1,53 @@
+from src.generate_new_site.utilities import html_fragments
+from bs4 import BeautifulSoup
+import pytest
+
+
+def soup_rewrite(fragment, rewrite):
+    soup = BeautifulSoup(fragment, 'html5lib')
+    for a in soup.find_all('a'):
+        rewrite(a.attrs)
+    return str(soup.body).replace('<body>', '').replace('</body>', '')
+
+
+def rewrite(attrs):
+    attrs['href'] = '#genModal'
+    attrs['class'] = 'a-ref'
+    attrs['data-text'] = '<b>"Quoted" & \'single\'</b>'
+
+
+@pytest.mark.parametrize("fragment", [
+    '',
+    'Text only, with &amp; and &lt;entities&gt;\xa0',
+    'A <a href="/dig/html/part6/ref_ab.html">link</a> and <i>more</i>.',
+    '<a class="x y" href="a.html" title=\'say "hi"\'>a</a><br/><img src="b.gif"/>',
+    '<p><b>One</b></p>\n<ul><li><a href="a.html">a</a></li><li>b</li></ul>',
+    '<table><tbody>\n<tr><td><a href="a.html">1</a></td><td><p>2</p></td></tr></tbody></table>'
+])
+def test_rewrite_anchors_canonical(fragment):
+    assert html_fragments.rewrite_anchors(fragment, rewrite) == soup_rewrite(fragment, rewrite)
+
+
+@pytest.mark.parametrize("fragment", [
+    ' Leading whitespace',
+    'Named &nbsp; entity',
+    'Unescaped > bracket',
+    '<A HREF="a.html">Uppercase</A>',
+    '<a href=a.html>Unquoted</a>',
+    '<a href="a.html" class="x  y">Unnormalized class</a>',
+    '<a id="1" href="a.html">Unsorted attributes</a>',
+    '<br>Unclosed void element',
+    '<p>Unclosed paragraph',
+    '<p>Implicitly <div>closed</div></p>',
+    '<b><i>Misnested</b></i>',
+    '<a href="a.html"><a href="b.html">Nested links</a></a>',
+    '<ul><li>Nested<li>items</li></li></ul>',
+    '<table><tr><td>Missing tbody</td></tr></table>',
+    '<table><tbody>Foster parented text</tbody></table>',
+    '<!-- comment -->',
+    '<pre>\nPreformatted</pre>'
+])
+def test_rewrite_anchors_rejects(fragment):
+    calls = []
+    assert html_fragments.rewrite_anchors(fragment, calls.append) is None
+    assert calls == []
@@ -0,0 +1,72 @@
+from PIL import Image
+from src.generate_new_site.utilities import image_derivatives
+
+
+def make_image(path, size, image_format):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    image = Image.new('RGB', size)
+    # Some detail, so that smaller images are smaller files too
+    for x in range(size[0]):
+        for y in range(0, size[1], 3):
+            image.putpixel((x, y), ((x * 7) % 256, (y * 5) % 256, (x * y) % 256))
+    if image_format == 'GIF':
+        image = image.convert('P', palette=Image.ADAPTIVE)
+    image.save(path, image_format)
+
+
+def test_image_derivatives_build(tmp_path):
+    imgs_dir = tmp_path / "imgs"
+    large = imgs_dir / "s1/large.jpg"
+    small = imgs_dir / "s1/small.gif"
+    make_image(large, (700, 350), 'JPEG')
+    make_image(small, (100, 50), 'GIF')
+    paths = [large, small, imgs_dir / "s1/missing.jpg", tmp_path / "other.jpg"]
+
+    derivatives = image_derivatives.ImageDerivatives(imgs_dir)
+    derivatives.build(paths)
+
+    record = derivatives.get(large)
+    assert (record['width'], record['height']) == (700, 350)
+    assert [size[:3] for size in record['sizes']] == [
+        ["responsive/s1/large-160w.jpg", 160, 80],
+        ["responsive/s1/large-320w.jpg", 320, 160],
+        ["responsive/s1/large-640w.jpg", 640, 320]]
+    assert record['thumbnail'][:3] == ["responsive/s1/large-thumb.jpg", 120, 60]
+    for path in image_derivatives.derivative_paths(record):
+        with Image.open(imgs_dir / path) as image:
+            assert image.format == 'JPEG'
+    # Already small enough for anything but a thumbnail
+    record = derivatives.get(small)
+    assert record['sizes'] == []
+    assert record['thumbnail'] is None or record['thumbnail'][1] <= 120
+    assert derivatives.get(imgs_dir / "s1/missing.jpg") is None
+    assert derivatives.get(tmp_path / "other.jpg") is None
+    assert derivatives.made == 2
+
+    # Unchanged images aren't processed again, changed ones are
+    made_at = (imgs_dir / "responsive/s1/large-160w.jpg").stat().st_mtime_ns
+    made_records = derivatives.records
+    derivatives = image_derivatives.ImageDerivatives(imgs_dir)
+    derivatives.build(paths)
+    assert derivatives.made == 0
+    # Records read back are ordered like those made, keys included
+    assert ([(key, list(record.items())) for key, record in derivatives.records.items()]
+            == [(key, list(record.items())) for key, record in made_records.items()])
+    assert (imgs_dir / "responsive/s1/large-160w.jpg").stat().st_mtime_ns == made_at
+
+    make_image(large, (300, 150), 'JPEG')
+    derivatives = image_derivatives.ImageDerivatives(imgs_dir)
+    derivatives.build(paths)
+    assert derivatives.made == 1
+    assert [size[1] for size in derivatives.get(large)['sizes']] == [160]
+    assert not (imgs_dir / "responsive/s1/large-640w.jpg").exists()
+
+
+def test_srcset():
+    record = {
+        'path': "s1/a.jpg",
+        'width': 400,
+        'sizes': [["responsive/s1/a-160w.jpg", 160, 120, 1000]]
+    }
+    assert image_derivatives.srcset(record, "../../imgs") == (
+        "../../imgs/responsive/s1/a-160w.jpg 160w, ../../imgs/s1/a.jpg 400w")
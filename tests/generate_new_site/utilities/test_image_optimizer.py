@@ -0,0 +1,63 @@
+from PIL import Image
+from src.generate_new_site.utilities import image_optimizer
+from src.generate_new_site.utilities.dig_imgs import image_href
+from src.generate_new_site.site_data_structs.site import Index
+import csv
+import pathlib
+import shutil
+
+
+def make_images(imgs_dir):
+    (imgs_dir / "s1").mkdir(parents=True)
+    gradient = Image.linear_gradient('L').resize((200, 100))
+    Image.merge('RGB', (gradient, gradient, gradient.rotate(180))).save(
+        imgs_dir / "s1/photo.jpg", 'JPEG')
+    # Large flat areas, which PNG compresses better than GIF
+    drawing = Image.new('P', (200, 100))
+    drawing.paste(1, (20, 20, 120, 80))
+    drawing.save(imgs_dir / "s1/drawing.gif", 'GIF')
+
+
+def test_image_optimizer_build(tmp_path):
+    imgs_dir = tmp_path / "site/imgs"
+    make_images(imgs_dir)
+    originals = {name: (imgs_dir / "s1" / name).read_bytes()
+                 for name in ["photo.jpg", "drawing.gif"]}
+    index = Index(tmp_path / "site/html/index.html")
+    for name in originals:
+        index.pathtable.register(pathlib.Path("/dig/html/images/s1") / name,
+                                 imgs_dir / "s1" / name)
+
+    optimizer = image_optimizer.ImageOptimizer(imgs_dir)
+    optimizer.build(index.pathtable)
+    optimizer.write_report()
+
+    assert optimizer.made == 2
+    if shutil.which(image_optimizer.JPEGTRAN) is not None:
+        assert len((imgs_dir / "s1/photo.jpg").read_bytes()) < len(originals["photo.jpg"])
+    else:  # Left as it is
+        assert (imgs_dir / "s1/photo.jpg").read_bytes() == originals["photo.jpg"]
+    assert not (imgs_dir / "s1/drawing.gif").exists()
+    with Image.open(imgs_dir / "s1/drawing.png") as image:
+        assert image.format == 'PNG'
+    assert index.pathtable.get_path(
+        pathlib.Path("/dig/html/images/s1/drawing.gif")) == imgs_dir / "s1/drawing.png"
+    assert image_href("/dig/html/images/s1/drawing.gif", index) == "../../imgs/s1/drawing.png"
+    with optimizer.report_path.open() as f:
+        rows = list(csv.reader(f))
+    assert rows[1][:2] == ["s1/drawing.gif", "s1/drawing.png"]
+    assert rows[-1][0] == "total"
+    assert int(rows[-1][4]) == sum(int(row[4]) for row in rows[1:-1]) > 0
+
+    # Copying the originals again doesn't optimize anything again
+    (imgs_dir / "s1/drawing.gif").write_bytes(originals["drawing.gif"])
+    index = Index(tmp_path / "site/html/index.html")
+    for name in originals:
+        index.pathtable.register(pathlib.Path("/dig/html/images/s1") / name,
+                                 imgs_dir / "s1" / name)
+    optimizer = image_optimizer.ImageOptimizer(imgs_dir)
+    optimizer.build(index.pathtable)
+    assert optimizer.made == 0
+    assert not (imgs_dir / "s1/drawing.gif").exists()
+    assert index.pathtable.get_path(
+        pathlib.Path("/dig/html/images/s1/drawing.gif")) == imgs_dir / "s1/drawing.png"
@@ -0,0 +1,30 @@
+from src.generate_new_site.utilities import jinja_env
+
+
+def test_templates_load_lazily(monkeypatch):
+    monkeypatch.setattr(jinja_env, '_environment', None)
+    env = jinja_env.environment()
+    assert len(env.cache) == 0
+    template = jinja_env.get_template("index.html.jinja")
+    assert template is jinja_env.get_template("index.html.jinja")
+    assert jinja_env.environment() is env
+
+
+def test_bytecode_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(jinja_env, '_environment', None)
+    bytecode_dir = jinja_env.use_bytecode_cache(tmp_path)
+    names = jinja_env.precompile()
+    assert "textpage.html.jinja" in names
+    assert "shared_elements/sidebar.html.jinja" in names
+    assert len(list(bytecode_dir.iterdir())) == len(names)
+
+    # A new environment loads the compiled templates from the cache
+    monkeypatch.setattr(jinja_env, '_environment', None)
+    jinja_env.use_bytecode_cache(tmp_path)
+    env = jinja_env.environment()
+    compiled = []
+    original_compile = env.compile
+    monkeypatch.setattr(env, 'compile', lambda *args, **kwargs: compiled.append(args)
+                        or original_compile(*args, **kwargs))
+    jinja_env.precompile()
+    assert compiled == []
@@ -0,0 +1,101 @@
+from src.generate_new_site.utilities import minify
+
+
+####################
+# Stylesheet tests #
+####################
+
+
+def test_minify_css():
+    css = """/*! License */
+/* Comment */
+.a > .b ,  .c  {
+    color : red ;
+    font-family: "Open  Sans", serif;
+}
+@media (min-width: 576px) {
+    .a:hover { margin: 0 auto; }
+}
+"""
+    assert minify.minify_css(css) == (
+        '/*! License */\n'
+        '.a>.b,.c{color:red;font-family:"Open  Sans",serif}'
+        '@media (min-width:576px){.a:hover{margin:0 auto}}'
+    )
+
+
+def test_prune_css():
+    nodes = minify.parse_css(
+        ".used,.unused{color:red}"
+        ".unused .used{color:blue}"
+        "div:not(.unused),a[class~=unused]{margin:0}"
+        "#used-id{padding:0}"
+        "@media print{.unused{display:none}}"
+        "@font-face{font-family:x}"
+    )
+    pruned = minify.prune_css(nodes, lambda name: name in {'used', 'used-id'})
+    assert minify.serialize_css(pruned) == (
+        ".used{color:red}"
+        "div:not(.unused),a[class~=unused]{margin:0}"
+        "#used-id{padding:0}"
+        "@font-face{font-family:x}"
+    )
+
+
+def test_prune_keyframes():
+    nodes = minify.parse_css(
+        ".a{animation:spin 1s}"
+        "@keyframes spin{to{opacity:1}}"
+        "@-webkit-keyframes unused{to{opacity:1}}"
+    )
+    pruned = minify.prune_keyframes(nodes, lambda name: False)
+    assert minify.serialize_css(pruned) == (
+        ".a{animation:spin 1s}@keyframes spin{to{opacity:1}}")
+
+
+def test_rewrite_css_urls():
+    nodes = minify.parse_css(
+        '.a{background:url("../img/a.png")}.b{background:url(data:x)}')
+    nodes = minify.rewrite_css_urls(nodes, lambda url: "new/" + url)
+    assert minify.css_urls(nodes) == ["new/../img/a.png", "new/data:x"]
+
+
+################
+# Script tests #
+################
+
+
+def test_minify_js():
+    source = """/*! License */
+// Comment
+function f(a, b) {
+    let re = /\\/\\/ not a comment/g;  /* Comment */
+    let s = "// not a comment";
+    let t = `keep
+  this`;
+    return a + +b
+}
+let x = f(1, 2)
+x++
+"""
+    assert minify.minify_js(source) == (
+        "/*! License */\n"
+        "function f(a,b){let re=/\\/\\/ not a comment/g;"
+        "let s=\"// not a comment\";let t=`keep\n  this`;return a+ +b}\n"
+        "let x=f(1,2)\nx++"
+    )
+
+
+def test_js_tokens_regex_or_division():
+    tokens = [token for token in minify.js_tokens("a = b / c / d; e = /x/g")
+              if token[0] not in ('space', 'newline')]
+    assert ('regex', "/x/g") in tokens
+    assert [text for kind, text in tokens if kind == 'punct'].count('/') == 2
+
+
+def test_script_words():
+    source = ('$(".figure-popover").addClass(\'bs-popover-\' + p);'
+              'el.innerHTML = `<span class="text-secondary">${x}</span>`; // "comment"')
+    # Template literals are taken whole, substitutions included
+    assert minify.script_words(source) == {
+        'figure-popover', 'bs-popover-', 'span', 'class', 'text-secondary', 'x'}
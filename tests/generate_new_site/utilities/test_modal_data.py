@@ -0,0 +1,51 @@
+from src.generate_new_site.utilities import modal_data
+from unittest import mock
+
+
+def make_index():
+    index = mock.Mock()
+    index.figuretable.figures = {"12": mock.Mock(caption="A pot.")}
+    index.references.old_reference_letters = {"ab": {}}
+    index.references.get_reference_by_letters.return_value = {
+        'author': "Author", 'reference': "1990 <i>Title</i>."
+    }
+    index.datatables = None
+    return index
+
+
+def test_modal_data_collect_and_write(tmp_path):
+    data = modal_data.ModalData()
+    data.collect(make_index())
+    assert data.payloads['figures'] == {"12": "<b>Figure 12</b>. A pot."}
+    assert data.payloads['references'] == {"ab": {'author': "Author", 'text': "1990 <i>Title</i>."}}
+    assert [name.split('.')[0] for name in data.scripts] == modal_data.KINDS
+
+    (tmp_path / "figures.0123456789ab.js").write_text("old")
+    data.write(tmp_path)
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(data.scripts)
+    source = (tmp_path / data.scripts[0]).read_text()
+    assert source == data.script_source('figures')
+    assert 'window.modalData.figures = {"12":"<b>Figure 12</b>. A pot."};' in source
+
+    # Changed content gives a different file name
+    other = modal_data.ModalData()
+    index = make_index()
+    index.figuretable.figures["12"].caption = "Another pot."
+    other.collect(index)
+    assert other.scripts[0] != data.scripts[0]
+    assert other.scripts[1:] == data.scripts[1:]
+
+
+def test_modal_data_bytes_saved():
+    data = modal_data.ModalData()
+    data.collect(make_index())
+    scripts_size = sum(len(data.script_source(kind)) for kind in modal_data.KINDS)
+    assert data.bytes_saved() == -scripts_size
+
+    for _ in range(100):
+        data.link('references', "ab")
+    inlined = len(' data-author="Author" data-ref-text="1990 &lt;i&gt;Title&lt;/i&gt;."')
+    with_id = len(' data-ref-id="ab"')
+    assert data.bytes_saved() == 100 * (inlined - with_id) - scripts_size
+    assert data.take_links() == {('references', "ab"): 100}
+    assert data.links == {}
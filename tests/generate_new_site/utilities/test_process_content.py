@@ -118,42 +118,25 @@ pathtable = index.pathtable
 
 # Updated Paragraphs
 updated_paragraph_with_slid_link = (
-    '<html><head></head><body>This paragraph has a link to an image: <a class="a-img" data-src="../../imgs/2/210r100.gif" '
-    'data-sub-html="&lt;b&gt;Figure 773&lt;/b&gt;. Sq. 210R100, top of subsoil (view to north)." '
-    'href="../../imgs/2/210r100.gif">Image</a></body></html>'
+    '<html><head></head><body>This paragraph has a link to an image: <a class="a-img" data-figure-id="773" '
+    'data-src="../../imgs/2/210r100.gif" href="../../imgs/2/210r100.gif">Image</a></body></html>'
 )
 
 updated_paragraph_with_ref_link = (
-    'This paragraph has a reference: <a href="#genModal" data-toggle="modal"'
-    'data-target="#genModal" class="a-ref" data-author="Alvord, Clarence W., and Lee Bidgood (editors)"'
-    'data-ref-text="1912  <i>The First Explorations of the Trans-Allegheny Region by the Virginians, 1650</i>-<i>1674</i>.  Arthur H. Clark Co., Cleveland.">'
-    'Reference</a>'
+    'This paragraph has a reference: <a href="#genModal" data-toggle="modal" '
+    'data-target="#genModal" class="a-ref" data-ref-id="ab">Reference</a>'
 )
 
 updated_paragraph_with_table_link = (
-    'We have a table here: <a href="#genModal" data-toggle="modal" data-target="#genModal"'
-    'class="a-table" data-table-header="<b>Table 1</b>. Summary of pottery recovered from the Fredricks site."'
-    'data-table-string="'
-    '==========================================================\n'
-    ' Excavation  Features/                          Total  \n '
-    'Season      Burials  Structures  Plowzone    n        %\n'
-    '==========================================================\n'
-    ' 1983          725         0      2,059    2,784     4.43\n'
-    ' 1984        1,077        28      7,345    8,450    13.47\n'
-    ' 1985        2,620        62     20,926   23,608    37.62\n'
-    ' 1986        3,365         0     24,545   27,910    44.48\n\n'
-    ' Total       7,787        90     54,875   62,752   100.00\n'
-    '=========================================================='
-    '">Table</a>'
+    'We have a table here: <a href="#genModal" data-toggle="modal" data-target="#genModal" '
+    'class="a-table" data-table-id="0">Table</a>'
 )
 
 updated_paragraph_with_table_with_images_link = (
-    'We have a table here: <a href="#genModal" data-toggle="modal" data-target="#genModal"'
-    'class="a-table" data-table-header="<b>Table 3</b>. Formal attributes for whole vessels and reconstructed vessel sections from the Fredricks site."'
-    'data-table-string="">Table</a>'
+    'We have a table here: <a href="#genModal" data-toggle="modal" data-target="#genModal" '
+    'class="a-table" data-table-id="2">Table</a>'
 )
 
-soup = BeautifulSoup(updated_paragraph_with_table_with_images_link, 'html5lib').body
 table_soup = BeautifulSoup((
         "=======================================================================================\n"
         " Vessel No. (click to view pot)\n"
@@ -176,8 +159,7 @@ second_img_a['data-toggle'] = 'modal'
 second_img_a['data-target'] = '#tableImgModal'
 second_img_a['data-figure-caption'] = '<b>Figure 134</b>. Vessel 2, a Fredricks Check Stamped jar from Burial 1 (RLA catalog no. 2351p255/1).'
 second_img_a['data-figure-path'] = '../../imgs/d16/d_3556.jpeg'
-soup.a['data-table-string'] = str(table_soup).replace('<body>', '').replace('</body>', '')
-updated_paragraph_with_table_with_images_link = str(soup).replace('<body>', '').replace('</body>', '')
+updated_table_with_images = str(table_soup).replace('<body>', '').replace('</body>', '')
 
 @pytest.mark.parametrize("paragraph_string,path,expected_result", [
     (raw_paragraph_with_ref_link, pathlib.Path("/"), updated_paragraph_with_ref_link),
@@ -189,3 +171,57 @@ def test_update_text_paragraph(paragraph_string, path, expected_result):
     assert BeautifulSoup(
         process_content.update_text_paragraph(paragraph_string, index, path), 'html5lib'
     ) == BeautifulSoup(expected_result, 'html5lib')
+
+
+def test_table_modal_payload():
+    payload = process_content.table_modal_payload(datatables.get_table_by_num("2"), index)
+    assert payload['header'] == (
+        "<b>Table 3</b>. Formal attributes for whole vessels and reconstructed vessel "
+        "sections from the Fredricks site."
+    )
+    assert BeautifulSoup(payload['html'], 'html5lib') == BeautifulSoup(updated_table_with_images, 'html5lib')
+
+
+@pytest.mark.parametrize("paragraph_string", [
+    raw_paragraph_with_slid_link,
+    raw_paragraph_with_ref_link,
+    raw_paragraph_with_table_link,
+    raw_paragraph_with_table_with_images_link,
+    raw_paragraph_with_excavations_link,
+    # Not in canonical form, goes through html5lib either way
+    'Some <B>uppercase</B> markup: <A HREF="/dig/html/part6/ref_ab.html">Ref</A>'
+])
+def test_update_text_paragraph_fast_path_identical(paragraph_string):
+    pathtable.register("/dig/html/excavations/exc_az.html", pathlib.Path("testdir/exc/az.html"))
+    assert process_content.update_text_paragraph(
+        paragraph_string, index, pathlib.Path("testdir/part0/body0.html"), fast=True
+    ) == process_content.update_text_paragraph(
+        paragraph_string, index, pathlib.Path("testdir/part0/body0.html"), fast=False
+    )
+
+
+@pytest.mark.parametrize("href,kind", [
+    ("/dig/html/excavations/slid_abc.html", 'figure'),
+    ("/dig/html/excavations/slid_mov.html", 'video_figure'),
+    ("/dig/html/part6/ref_ab.html", 'reference'),
+    ("/dig/html/tables/table0.html", 'table'),
+    ("../part2/body0.html", 'page'),
+    ("/dig/html/part6/body0.html", 'site'),
+    ("/dig/html/video/clip.mov", 'video'),
+    ("http://example.com", None)
+])
+def test_classify_href(href, kind):
+    assert process_content.classify_href(href) == kind
+
+
+def test_update_text_paragraph_reuses_table_payload():
+    page_index = Index(pathlib.Path("testdir"))
+    page_index.figuretable = index.figuretable
+    page_index.datatables = index.datatables
+    first = process_content.update_text_paragraph(
+        raw_paragraph_with_table_with_images_link, page_index, pathlib.Path("/"))
+    with mock.patch.object(process_content, 'table_payload', side_effect=AssertionError):
+        second = process_content.update_text_paragraph(
+            raw_paragraph_with_table_with_images_link, page_index, pathlib.Path("/"))
+    assert first == second
+    assert page_index.link_payloads.reused == {'table': 1}
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+from src.generate_new_site.utilities import search_index
+
+
+def make_index(html_dir):
+    chapter = SimpleNamespace(name="Excavations")
+    module = SimpleNamespace(parent=chapter, short_name="Features")
+
+    def page(name, file_name, text):
+        return SimpleNamespace(name=name, path=html_dir / "excavations" / file_name,
+                               parent=module, search_text=lambda: text)
+    pages = [
+        page("Feature 1", "feature_1.html",
+             ["<p>Burials and <i>excavated</i> pits &amp; postholes.</p>"]),
+        page("Feature 2", "feature_2.html", ["A burial pit, excavated in 1986."])
+    ]
+    return SimpleNamespace(pages=lambda: iter(pages))
+
+
+def test_terms():
+    assert search_index.tokenize("The Café's <b> 7 x 1701") == ["cafe", "7", "1701"]
+    assert search_index.terms("Excavations excavated burials buried") == [
+        "excavat", "excavat", "buri", "bury"]
+    assert search_index.stem("hills") == "hill"
+    assert search_index.stem("potter") == "pot"
+
+
+def test_postings_round_trip():
+    occurrences = {0: 1, 3: 2, 40: 1, 1000: 12}
+    encoded = search_index.encode_postings(occurrences)
+    assert encoded == "0,3:2,11,qo:c"
+    assert search_index.decode_postings(encoded) == occurrences
+
+
+def test_search_index(tmp_path):
+    html_dir = tmp_path / "html"
+    index = search_index.SearchIndex()
+    index.build(make_index(html_dir), html_dir)
+    assert index.documents == [["Feature 1", "excavations/feature_1.html", 0],
+                               ["Feature 2", "excavations/feature_2.html", 0]]
+    assert index.modules == [["Excavations", "Features"]]
+    assert index.postings["excavat"] == {0: 1, 1: 1}
+    assert index.postings["featur"] == {0: search_index.TITLE_WEIGHT,
+                                        1: search_index.TITLE_WEIGHT}
+    assert "1986" in index.postings
+
+    assets_dir = tmp_path / "assets" / search_index.DIR_NAME
+    assets_dir.mkdir(parents=True)
+    (assets_dir / "ex.000000000000.js").write_text("old")
+    index.write(assets_dir, html_dir)
+    scripts = {path.name for path in assets_dir.glob('*.js')}
+    index_scripts = {name for name in scripts if name.startswith("index.")}
+    assert len(index_scripts) == 1
+    assert scripts - index_scripts == set(index.shards.values())
+    page = (html_dir / search_index.PAGE_PATH).read_text()
+    assert 'data-search-dir="../../assets/search/"' in page
+    assert '<script src="../../assets/search/index.' in page
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from src.generate_new_site.utilities import sidebars
+from src.generate_new_site.utilities.jinja_env import get_template
+
+
+def make_index():
+    def page(name, children=()):
+        return SimpleNamespace(name=name, href=name + ".html", children=list(children))
+    module = SimpleNamespace(
+        long_name="Module One", short_name="One", author="Author", href="m1.html",
+        children=[page("Intro"), page("Body", [page("Part A"), page("Part B")])])
+    other = SimpleNamespace(long_name="Module Two", short_name="Two", author=None,
+                            href="m2.html", children=[page("Only")])
+    chapter = SimpleNamespace(name="Chapter", href="c.html", children=[module, other])
+    return SimpleNamespace(children=[chapter], href_dir="html/chapter", path=None,
+                           update_href=lambda start_path: None)
+
+
+def test_sidebars_match_rendered_sidebars():
+    index = make_index()
+    cache = sidebars.SidebarCache()
+    for template_name in [sidebars.SIDEBAR_TEMPLATE_FILENAME,
+                          sidebars.COLLAPSED_SIDEBAR_TEMPLATE_FILENAME]:
+        for section_name in ["Intro", "Body", "Part B", None]:
+            expected = get_template(template_name).render(
+                chapters=index.children, this_chapter_name="Chapter",
+                this_module_name="Module One", this_section_name=section_name)
+            assert cache.render(template_name, index, "Chapter", "Module One",
+                                section_name) == expected
+    assert cache.rendered == 2
+    assert cache.reused == 6
+
+
+def test_sidebars_keyed_by_directory():
+    index = make_index()
+    cache = sidebars.SidebarCache()
+    cache.render(sidebars.SIDEBAR_TEMPLATE_FILENAME, index, "Chapter", "Module One", "Intro")
+    index.href_dir = "html/other"
+    index.children[0].href = "../chapter/c.html"
+    html = cache.render(sidebars.SIDEBAR_TEMPLATE_FILENAME, index, "Chapter", "Module One", "Intro")
+    assert 'href="../chapter/c.html"' in html
+    assert cache.rendered == 2
+
+
+def test_shared_nav_sidebars():
+    index = make_index()
+    html = sidebars.SharedNavSidebars().render(
+        sidebars.COLLAPSED_SIDEBAR_TEMPLATE_FILENAME, index, "Chapter", "Module One", None)
+    assert 'class="col-md-3 eot-sidebar collapse"' in html
+    assert 'data-chapter="Chapter" data-module="Module One" data-all-sections>' in html
+    assert '<a href="c.html">Chapter</a>' in html
+    assert "Intro" not in html
+
+
+def test_navigation_tree():
+    assert sidebars.navigation_tree(make_index()) == [
+        ["Chapter", "c.html", [
+            ["Module One", "One", "Author", "m1.html", [
+                ["Intro", "Intro.html", []],
+                ["Body", "Body.html", [["Part A", "Part A.html", []],
+                                       ["Part B", "Part B.html", []]]]]],
+            ["Module Two", "Two", None, "m2.html", [["Only", "Only.html", []]]]]]]
@@ -85,3 +85,17 @@ def test_pagetable_register_and_gets():
     # vi
     assert pagetable.get_prev_page_path("vi") is None
     assert pagetable.get_next_page_path("vi") is None
+
+
+def test_link_payload_table_get_and_counts():
+    link_payloads = tables.LinkPayloadTable()
+    compute = mock.Mock(return_value={'data-src': "../../imgs/a.gif"})
+    for _ in range(3):
+        assert link_payloads.get('figure', "slid_a.html", compute) == {'data-src': "../../imgs/a.gif"}
+    link_payloads.get('table', "slid_a.html", compute)
+    assert compute.call_count == 2
+
+    assert link_payloads.take_counts() == ({'figure': 1, 'table': 1}, {'figure': 2})
+    assert link_payloads.take_counts() == ({}, {})
+    link_payloads.add_counts({'figure': 1}, {'figure': 2})
+    assert link_payloads.summary() == "Link payloads: 1 computed, 2 reused (figure 2 of 3)."